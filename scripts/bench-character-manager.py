@@ -0,0 +1,89 @@
+"""Benchmark CharacterManager lookups as the number of characters grows.
+
+Needs the bot's environment (MONGO_URL, etc.) to import its modules, but
+never touches the database."""
+
+import asyncio
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from models import VChar
+from services import CharacterManager
+
+GUILD_SIZE = 20  # Characters per guild
+CHARS_PER_USER = 3
+
+
+def populate(count: int) -> CharacterManager:
+    """Make a manager holding count bare characters."""
+    rng = random.Random(count)
+    guilds = max(1, count // GUILD_SIZE)
+    chars = []
+    for _ in range(count):
+        guild = rng.randrange(guilds)
+        chars.append(
+            VChar.model_construct(
+                id=ObjectId(),
+                name=f"Character {rng.random():.12f}",
+                guild=guild,
+                user=guild * GUILD_SIZE + rng.randrange(GUILD_SIZE // CHARS_PER_USER),
+            )
+        )
+
+    mgr = CharacterManager()
+    mgr._characters = sorted(chars)
+    mgr._id_cache = {char.id_str: char for char in chars}
+    mgr._build_indexes()
+    mgr._initialized = True
+    return mgr
+
+
+async def bench(mgr: CharacterManager, iterations: int) -> dict[str, float]:
+    """Time each lookup, returning microseconds per call."""
+    sample = random.Random(0).choices(mgr._characters, k=iterations)
+    lookups = {
+        "fetchall": lambda c: mgr.fetchall(c.guild, c.user),
+        "fetchguild": lambda c: mgr.fetchguild(c.guild),
+        "fetchuser": lambda c: mgr.fetchuser(c.user),
+        "countguild": lambda c: mgr.countguild(c.guild),
+    }
+    results = {}
+    for label, lookup in lookups.items():
+        start = time.perf_counter()
+        for char in sample:
+            await lookup(char)
+        results[label] = (time.perf_counter() - start) / iterations * 1e6
+    return results
+
+
+async def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "counts",
+        nargs="*",
+        type=int,
+        default=[10_000, 50_000, 100_000, 500_000],
+        help="Character counts to benchmark",
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'characters':>10}  {'fetchall':>9}  {'fetchguild':>10}  {'fetchuser':>9}  {'countguild':>10}"
+    )
+    for count in args.counts:
+        results = await bench(populate(count), args.iterations)
+        row = "  ".join(f"{results[k]:>{len(k)}.2f}" for k in results)
+        print(f"{count:>10}  {row}")
+    print("(microseconds per call)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Benchmark GuildCache member lookups on a large guild, comparing the
+in-memory index against the SQLite queries it replaced.
+
+Needs the bot's environment (MONGO_URL, etc.) to import its modules, but
+never touches the database."""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from services.guildcache import UPSERT_GUILD, UPSERT_MEMBER, CachedGuild, CachedMember, GuildCache
+
+GUILD = 1
+
+
+async def populate(gc: GuildCache, members: int):
+    """Fill the cache with one guild of the given size."""
+    await gc.db.execute(UPSERT_GUILD, (GUILD, "Camarilla", None))
+    await gc.db.executemany(
+        UPSERT_MEMBER,
+        ((GUILD, n, f"Member {n}", f"https://example.com/{n}.png") for n in range(members)),
+    )
+    await gc.db.commit()
+    await gc._load_index()
+
+
+async def sqlite_fetchmember(gc: GuildCache, guild_id: int, member_id: int) -> CachedMember | None:
+    """fetchmember() as it was: load the whole guild, then query the member."""
+    async with gc.db.execute("SELECT * FROM guilds WHERE id=?", (guild_id,)) as cur:
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        guild = CachedGuild.model_validate(dict(row))
+    async with gc.db.execute("SELECT * FROM members WHERE guild=?", (guild_id,)) as cur:
+        async for row in cur:
+            guild.members.append(CachedMember.model_validate({**dict(row), "guild": guild}))
+    async with gc.db.execute(
+        "SELECT * FROM members WHERE guild=? AND id=?", (guild_id, member_id)
+    ) as cur:
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        return CachedMember.model_validate({**dict(row), "guild": guild})
+
+
+async def timed(lookup, ids: list[int]) -> float:
+    """Milliseconds per lookup."""
+    start = time.perf_counter()
+    for member_id in ids:
+        await lookup(GUILD, member_id)
+    return (time.perf_counter() - start) / len(ids) * 1e3
+
+
+async def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--members", type=int, default=50_000)
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gc = GuildCache(str(Path(tmp) / "cache.db"))
+        await gc.initialize()
+        await populate(gc, args.members)
+
+        ids = random.Random(0).choices(range(args.members), k=args.iterations)
+        old = await timed(lambda g, m: sqlite_fetchmember(gc, g, m), ids)
+        new = await timed(gc.fetchmember, ids * 1000)
+        await gc.close()
+
+    print(f"fetchmember on a {args.members}-member guild")
+    print(f"  SQLite: {old:>10.3f} ms")
+    print(f"  index:  {new:>10.6f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
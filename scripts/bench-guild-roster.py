@@ -0,0 +1,96 @@
+"""Measure the guild roster endpoint, GET /characters/guild/{guild_id}, on a
+large guild.
+
+Needs the bot's environment (MONGO_URL, etc.) to import its modules, and a
+MongoDB server for beanie to initialize against. Nothing is read or written."""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from beanie import PydanticObjectId, init_beanie
+from pymongo import AsyncMongoClient
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import services
+from config import settings
+from models import VChar
+from routes.characters.routes import get_guild_characters
+from services.guildcache import UPSERT_GUILD, UPSERT_MEMBER
+
+GUILD = 1
+
+
+async def populate(characters: int, members: int):
+    """Fill the guild cache and character manager with one guild."""
+    gc = services.guild_cache
+    await gc.db.execute(UPSERT_GUILD, (GUILD, "Camarilla", None))
+    await gc.db.executemany(
+        UPSERT_MEMBER,
+        ((GUILD, n, f"Member {n}", f"https://example.com/{n}.png") for n in range(members)),
+    )
+    await gc.db.commit()
+    await gc._load_index()
+
+    chars = []
+    for n in range(characters):
+        char = VChar(
+            guild=GUILD,
+            user=n % members,
+            name=f"Character {n}",
+            splat="vampire",
+            humanity=7,
+            health="//////",
+            willpower="/////",
+            potency=1,
+            traits=[],
+        )
+        char.id = PydanticObjectId()
+        chars.append(char)
+    chars.sort()
+
+    mgr = services.char_mgr
+    mgr._characters = chars
+    mgr._id_cache = {char.id_str: char for char in chars}
+    mgr._build_indexes()
+    mgr._initialized = True
+
+
+async def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("-c", "--characters", type=int, default=2_000)
+    parser.add_argument("-m", "--members", type=int, default=5_000)
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    # Models need beanie, but nothing is read or written
+    client = AsyncMongoClient(settings.mongo_url)
+    await init_beanie(client.get_database("bench"), document_models=[VChar], skip_indexes=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        services.guild_cache.location = str(Path(tmp) / "cache.db")
+        await services.guild_cache.initialize()
+        try:
+            await populate(args.characters, args.members)
+
+            times = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                await get_guild_characters(GUILD, user_id=0)
+                times.append((time.perf_counter() - start) * 1e3)
+        finally:
+            await services.guild_cache.close()
+
+    p95 = statistics.quantiles(times, n=20)[-1]
+    print(f"{args.characters} characters, {args.members} members")
+    print(f"  median: {statistics.median(times):.2f} ms")
+    print(f"  p95:    {p95:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
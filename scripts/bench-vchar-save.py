@@ -0,0 +1,164 @@
+"""Compare delta saves against full document replacement for a character
+with a long experience log.
+
+Needs the bot's environment (MONGO_URL, etc.) to import its modules, and a
+MongoDB server for the round trips, which use a scratch collection."""
+
+import asyncio
+import sys
+import time
+from argparse import ArgumentParser
+from datetime import UTC, datetime
+from pathlib import Path
+
+import bson
+from beanie import init_beanie
+from bson import ObjectId
+from pymongo import AsyncMongoClient, MongoClient
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from config import settings
+from constants import Damage
+from models.delta import update_operators
+from models.vchar import VChar
+from models.vchardocs import VCharExperienceEntry, VCharMacro, VCharTrait
+
+SCRATCH = "bench_vchar_save"
+
+
+def dump(char: VChar) -> dict:
+    """The character as stored in the database."""
+    return {"_id": char.id, **char.model_dump(by_alias=True, exclude={"id", "revision_id"})}
+
+
+def make_character(log_size: int) -> VChar:
+    """Make a well-used character."""
+    char = VChar.model_construct(
+        id=ObjectId(),
+        guild=1,
+        user=1,
+        raw_name="Nadea Theron",
+        splat="vampire",
+        health=8 * Damage.NONE,
+        willpower=6 * Damage.NONE,
+        raw_humanity=7,
+        stains=0,
+        raw_hunger=1,
+        potency=2,
+        raw_traits=[
+            VCharTrait(name=f"Trait{i}", rating=i % 5 + 1, type=VCharTrait.Type.CUSTOM)
+            for i in range(40)
+        ],
+        macros=[
+            VCharMacro(
+                name=f"macro{i}",
+                pool=["Strength", "+", "Brawl"],
+                hunger=True,
+                difficulty=0,
+                rouses=0,
+                reroll_rouses=False,
+                staining="apply",
+                hunt=False,
+                comment=None,
+            )
+            for i in range(20)
+        ],
+        stat_log={"created": datetime.now(UTC), "rouse": 10},
+    )
+    char.experience.log = [
+        VCharExperienceEntry(event="award_lifetime", amount=1, reason=f"Session {i}", admin=1)
+        for i in range(log_size)
+    ]
+    return char
+
+
+def rouse(char: VChar):
+    char.hunger += 1
+    char.log("rouse")
+
+
+def award(char: VChar):
+    char.apply_experience(2, "lifetime", "Session", 1)
+
+
+def header(char: VChar):
+    char.header.location = "Elysium"
+
+
+COMMANDS = {"rouse": rouse, "xp award": award, "header": header}
+
+
+def measure(char: VChar, command, iterations: int) -> tuple[int, int, float, float]:
+    """Return (replace bytes, delta bytes, replace µs, delta µs) for one command."""
+    saved = dump(char)
+    command(char)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        VChar.model_validate(char.model_dump())  # validate_on_save
+        full = bson.encode(dump(char))
+    replace_time = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        delta = bson.encode(update_operators(saved, dump(char)))
+    delta_time = (time.perf_counter() - start) / iterations * 1e6
+
+    return len(full), len(delta), replace_time, delta_time
+
+
+def round_trips(url: str, char: VChar, command, iterations: int) -> tuple[float, float]:
+    """Time replace_one against update_one on a real server, in ms."""
+    collection = MongoClient(url).get_database("bench")[SCRATCH]
+    try:
+        saved = dump(char)
+        collection.replace_one({"_id": char.id}, saved, upsert=True)
+        command(char)
+        state = dump(char)
+        delta = update_operators(saved, state)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            collection.replace_one({"_id": char.id}, state)
+        replace_time = (time.perf_counter() - start) / iterations * 1e3
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            collection.update_one({"_id": char.id}, delta)
+        delta_time = (time.perf_counter() - start) / iterations * 1e3
+    finally:
+        collection.drop()
+
+    return replace_time, delta_time
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--log-size", type=int, default=500, help="XP log entries")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--mongo", default=settings.mongo_url, help="MongoDB URL")
+    args = parser.parse_args()
+
+    # Models need beanie, but the saves go straight through pymongo
+    client = AsyncMongoClient(args.mongo)
+    asyncio.run(
+        init_beanie(client.get_database("bench"), document_models=[VChar], skip_indexes=True)
+    )
+
+    print(f"Character with {args.log_size} XP log entries")
+    print(f"{'command':>10}  {'replace B':>9}  {'delta B':>7}  {'replace µs':>10}  {'delta µs':>8}")
+    for label, command in COMMANDS.items():
+        char = make_character(args.log_size)
+        full, delta, replace_time, delta_time = measure(char, command, args.iterations)
+        print(f"{label:>10}  {full:>9}  {delta:>7}  {replace_time:>10.0f}  {delta_time:>8.0f}")
+
+    print(f"\n{'command':>10}  {'replace ms':>10}  {'delta ms':>8}")
+    for label, command in COMMANDS.items():
+        char = make_character(args.log_size)
+        replace_time, delta_time = round_trips(args.mongo, char, command, args.iterations)
+        print(f"{label:>10}  {replace_time:>10.2f}  {delta_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Precalculate the /probability table that the bot memory-maps at startup."""
+
+import importlib.util
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Load the odds module directly so the build doesn't need the bot's config
+ODDS_PATH = Path(__file__).parents[1] / "src" / "inconnu" / "roll" / "odds.py"
+_spec = importlib.util.spec_from_file_location("odds", ODDS_PATH)
+assert _spec is not None and _spec.loader is not None
+odds = importlib.util.module_from_spec(_spec)
+sys.modules["odds"] = odds
+_spec.loader.exec_module(odds)
+
+
+def pool_rows(pool: int) -> bytes:
+    """Calculate one pool's table entries."""
+    return odds.table_rows(pool)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "destination",
+        nargs="?",
+        type=Path,
+        default=odds.TABLE_PATH,
+        help="Where to write the table (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes"
+    )
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    pools = range(1, odds.TABLE_POOL + 1)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        # map() yields in submission order, which is the table's pool order
+        odds.write_table(args.destination, executor.map(pool_rows, pools))
+
+    size = args.destination.stat().st_size / 1024 / 1024
+    elapsed = time.monotonic() - start
+    print(f"Wrote {args.destination} ({size:.1f} MiB) in {elapsed:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Rebuild the roll and trait statistics rollups from the roll log.
+
+The bot keeps the rollups up to date as rolls are made, so this is only
+needed once, to fill them from existing rolls, or to repair them. Stop the
+bot first: rolls logged while this runs would be counted twice or not at
+all."""
+
+import os
+import sys
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+
+from pymongo import MongoClient
+
+MONGO_ENV = "INCONNU_MONGO"  # Change if necessary
+MONGO_URL = os.getenv(MONGO_ENV)
+
+COUNTED = {"$match": {"charid": {"$ne": None}, "use_in_stats": True}}
+
+# One bucket per character, UTC day, final outcome, and whether the roll
+# was rerolled. Matches services/rolllog.py.
+ROLL_PIPELINE = [
+    COUNTED,
+    {
+        "$group": {
+            "_id": {
+                "charid": "$charid",
+                "day": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                "outcome": {"$ifNull": ["$reroll.outcome", "$outcome"]},
+                "rerolled": {"$ne": [{"$ifNull": ["$reroll", None]}, None]},
+            },
+            "count": {"$sum": 1},
+        }
+    },
+    {
+        "$project": {
+            "_id": 0,
+            "charid": "$_id.charid",
+            "day": "$_id.day",
+            "outcome": "$_id.outcome",
+            "rerolled": "$_id.rerolled",
+            "count": 1,
+        }
+    },
+    {"$out": "roll_stats"},
+]
+
+# Successes per character, trait key, and UTC day. Rolls logged before trait
+# keys were recorded fall back to the words in their pool string.
+TRAIT_PIPELINE = [
+    COUNTED,
+    {
+        "$project": {
+            "charid": 1,
+            "day": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+            "successes": {"$add": [{"$ifNull": ["$reroll.margin", "$margin"]}, "$difficulty"]},
+            "traits": {
+                "$ifNull": [
+                    "$traits",
+                    {
+                        "$filter": {
+                            "input": {"$split": [{"$ifNull": ["$pool", ""]}, " "]},
+                            "cond": {"$regexMatch": {"input": "$$this", "regex": "^[A-Za-z]"}},
+                        }
+                    },
+                ]
+            },
+        }
+    },
+    {"$unwind": "$traits"},
+    {
+        "$group": {
+            "_id": {"charid": "$charid", "trait": "$traits", "day": "$day"},
+            "successes": {"$sum": "$successes"},
+        }
+    },
+    {
+        "$project": {
+            "_id": 0,
+            "charid": "$_id.charid",
+            "trait": "$_id.trait",
+            "day": "$_id.day",
+            "successes": 1,
+        }
+    },
+    {"$out": "trait_stats"},
+]
+
+
+def main():
+    if not MONGO_URL:
+        sys.exit(f"'{MONGO_ENV}' not set!")
+
+    parser = ArgumentParser(description=__doc__, formatter_class=RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    with MongoClient(MONGO_URL) as client:
+        db = client.get_database()
+
+        # $out replaces the collections wholesale, dropping their indexes
+        db.rolls.aggregate(ROLL_PIPELINE, allowDiskUse=True)
+        db.roll_stats.create_index(
+            [("charid", 1), ("day", 1), ("outcome", 1), ("rerolled", 1)], name="bucket", unique=True
+        )
+        db.rolls.aggregate(TRAIT_PIPELINE, allowDiskUse=True)
+        db.trait_stats.create_index(
+            [("charid", 1), ("day", 1), ("trait", 1)], name="bucket", unique=True
+        )
+
+        rolls = db.roll_stats.estimated_document_count()
+        traits = db.trait_stats.estimated_document_count()
+
+    print(f"Built {rolls} roll statistics buckets and {traits} trait buckets.")
+
+
+if __name__ == "__main__":
+    main()
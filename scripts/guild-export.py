@@ -1,17 +1,29 @@
-"""Export all characters from a guild."""
+"""Export all characters from a guild.
+
+Characters are written as they're read from the database, so memory use
+doesn't grow with the guild. A .json destination gets a JSON array for
+reading; an .ndjson destination gets one character per line, in MongoDB
+extended JSON, which guild-import.py can load back."""
 
 import json
 import os
 import sys
-from argparse import ArgumentParser, ArgumentTypeError
+from argparse import ArgumentParser, ArgumentTypeError, RawDescriptionHelpFormatter
+from collections.abc import Iterable
 from pathlib import Path
-from typing import NamedTuple, Self
+from typing import Any, NamedTuple, Self, TextIO
 
+from bson import json_util
 from pymongo import MongoClient
 
 MONGO_ENV = "INCONNU_MONGO"  # Change if necessary
 MONGO_URL = os.getenv(MONGO_ENV)
 
+# Documents fetched from the server at a time
+BATCH_SIZE = 200
+
+SUFFIXES = (".json", ".ndjson")
+
 
 class Arguments(NamedTuple):
     """Command-line arguments."""
@@ -22,10 +34,12 @@ class Arguments(NamedTuple):
     @classmethod
     def parse(cls) -> Self:
         """Parse CLI arguments."""
-        parser = ArgumentParser(description=__doc__)
+        parser = ArgumentParser(description=__doc__, formatter_class=RawDescriptionHelpFormatter)
         parser.add_argument("guild_id", type=int, help="The ID of the guild to export")
         parser.add_argument(
-            "destination", type=cls._validate_destination, help="Where to save the JSON file"
+            "destination",
+            type=cls._validate_destination,
+            help="Where to save the .json or .ndjson file",
         )
 
         args = parser.parse_args()
@@ -35,8 +49,8 @@ class Arguments(NamedTuple):
     def _validate_destination(destination: str) -> Path:
         """Validates and returns the destination path."""
         p = Path(destination)
-        if p.suffix != ".json":
-            raise ArgumentTypeError(f"Destination must end in .json (got {p.suffix}).")
+        if p.suffix not in SUFFIXES:
+            raise ArgumentTypeError(f"Destination must end in .json or .ndjson (got {p.suffix}).")
         if not p.parent.exists():
             raise ArgumentTypeError(f"'{p.parent}' does not exist!")
         if p.exists():
@@ -45,23 +59,46 @@ class Arguments(NamedTuple):
         return p
 
 
+def write_json(chars: Iterable[dict[str, Any]], f: TextIO) -> int:
+    """Write the characters as an indented JSON array. Returns the count."""
+    count = 0
+    f.write("[")
+    for count, char in enumerate(chars, start=1):
+        if count > 1:
+            f.write(",")
+        f.write("\n  ")
+        f.write(json.dumps(char, default=str, indent=2).replace("\n", "\n  "))
+    f.write("\n]" if count else "]")
+    return count
+
+
+def write_ndjson(chars: Iterable[dict[str, Any]], f: TextIO) -> int:
+    """Write the characters one per line. Returns the count."""
+    count = 0
+    for count, char in enumerate(chars, start=1):
+        f.write(json_util.dumps(char))
+        f.write("\n")
+    return count
+
+
 def main():
     if not MONGO_URL:
         sys.exit(f"'{MONGO_ENV}' not set!")
 
     args = Arguments.parse()
+    write = write_ndjson if args.destination.suffix == ".ndjson" else write_json
 
     with MongoClient(MONGO_URL) as client:
         db = client.get_database()
-        guild_chars = list(db.characters.find({"guild": args.guild_id}))
+        cursor = db.characters.find({"guild": args.guild_id}, batch_size=BATCH_SIZE)
+        with open(args.destination, "w") as f:
+            count = write(cursor, f)
 
-    if not guild_chars:
+    if not count:
+        args.destination.unlink()
         sys.exit(f"No characters found in {args.guild_id}!")
 
-    with open(args.destination, "w") as f:
-        json.dump(guild_chars, f, default=str, indent=2)
-
-    print(f"Exported {len(guild_chars)} characters.")
+    print(f"Exported {count} characters.")
 
 
 if __name__ == "__main__":
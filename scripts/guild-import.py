@@ -0,0 +1,118 @@
+"""Import characters exported by guild-export.py as .ndjson.
+
+Characters are read and written in batches, so memory use doesn't grow
+with the file. Each character replaces any with the same ID, so an
+interrupted import can simply be run again. Characters imported into
+another guild are copies, with IDs derived from the originals.
+
+The bot's character cache doesn't see the import, so stop the bot first.
+Imported characters are marked modified at import time, so that a cache
+snapshot from before the import doesn't override them."""
+
+import hashlib
+import os
+import sys
+from argparse import ArgumentParser, ArgumentTypeError, RawDescriptionHelpFormatter
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime
+from itertools import batched
+from pathlib import Path
+from typing import Any, NamedTuple, Self, TextIO
+
+from bson import ObjectId, json_util
+from pymongo import MongoClient, ReplaceOne
+from pymongo.collection import Collection
+
+MONGO_ENV = "INCONNU_MONGO"  # Change if necessary
+MONGO_URL = os.getenv(MONGO_ENV)
+
+# Characters written at a time
+BATCH_SIZE = 200
+
+
+class Arguments(NamedTuple):
+    """Command-line arguments."""
+
+    source: Path
+    guild: int | None
+
+    @classmethod
+    def parse(cls) -> Self:
+        """Parse CLI arguments."""
+        parser = ArgumentParser(description=__doc__, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument("source", type=cls._validate_source, help="The .ndjson file to import")
+        parser.add_argument(
+            "--guild", type=int, help="Import copies into this guild instead of the original"
+        )
+
+        args = parser.parse_args()
+        return cls(**vars(args))
+
+    @staticmethod
+    def _validate_source(source: str) -> Path:
+        """Validates and returns the source path."""
+        p = Path(source)
+        if p.suffix != ".ndjson":
+            raise ArgumentTypeError(f"Source must end in .ndjson (got {p.suffix}).")
+        if not p.exists():
+            raise ArgumentTypeError(f"'{source}' does not exist!")
+
+        return p
+
+
+def read_ndjson(f: TextIO) -> Iterator[dict[str, Any]]:
+    """Read characters one line at a time, skipping blank lines."""
+    for line in f:
+        if line.strip():
+            yield json_util.loads(line)
+
+
+def copy_id(oid: ObjectId, guild: int) -> ObjectId:
+    """The ID of a character's copy in another guild. The same character and
+    guild always get the same ID, so a copy can be imported again. The
+    original's timestamp is kept."""
+    digest = hashlib.blake2b(oid.binary + guild.to_bytes(8, signed=True), digest_size=8)
+    return ObjectId(oid.binary[:4] + digest.digest())
+
+
+def import_chars(
+    characters: Collection, chars: Iterable[dict[str, Any]], guild: int | None = None
+) -> int:
+    """Upsert the characters in batches, optionally copying them to another
+    guild. Returns the count."""
+    now = datetime.now(UTC)
+    count = 0
+    for batch in batched(chars, BATCH_SIZE):
+        requests = []
+        for char in batch:
+            if guild is not None:
+                char["_id"] = copy_id(char["_id"], guild)
+                char["guild"] = guild
+            char.setdefault("log", {})["modified"] = now
+            requests.append(ReplaceOne({"_id": char["_id"]}, char, upsert=True))
+
+        characters.bulk_write(requests, ordered=False)
+        count += len(requests)
+        print(f"Imported {count} characters...", end="\r")
+
+    return count
+
+
+def main():
+    if not MONGO_URL:
+        sys.exit(f"'{MONGO_ENV}' not set!")
+
+    args = Arguments.parse()
+
+    with MongoClient(MONGO_URL) as client, open(args.source) as f:
+        db = client.get_database()
+        count = import_chars(db.characters, read_ndjson(f), args.guild)
+
+    if not count:
+        sys.exit(f"No characters found in {args.source}!")
+
+    print(f"Imported {count} characters.")
+
+
+if __name__ == "__main__":
+    main()
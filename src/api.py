@@ -75,12 +75,14 @@ async def delete_single_faceclaim(image: str) -> bool:
         raise ApiError(str(err))
 
 
-async def delete_character_faceclaims(character: VChar):
-    """Delete all of a character's faceclaims."""
+async def delete_character_faceclaims(character: VChar, commit=True):
+    """Delete all of a character's faceclaims. If commit is False, the images
+    are only deleted remotely, leaving the character to the caller."""
     try:
         res = await _delete(path=f"/character/{character.id_str}")
-        del character.profile.images[:]
-        await character.save()
+        if commit:
+            del character.profile.images[:]
+            await character.save()
         logger.info("API: {}", res)
     except Exception as err:
         raise ApiError(str(err))
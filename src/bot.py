@@ -283,7 +283,7 @@ class InconnuBot(discord.AutoShardedBot):
             }
             if interaction.data is not None:
                 inter_data.update(cast(dict[str, Any], interaction.data))
-            await db.interactions.insert_one(inter_data)
+            services.telemetry.log("interactions", inter_data)
 
         await self.process_application_commands(interaction)
 
@@ -374,6 +374,7 @@ class InconnuBot(discord.AutoShardedBot):
             # Schedule tasks
             cull_inactive.start()
             check_premium_expiries.start()
+            snapshot_characters.start()
 
             # Display some vanity stats
             guild_count = len(self.guilds)
@@ -484,6 +485,12 @@ async def check_premium_expiries():
     await bot_tasks.premium.remove_expired_images()
 
 
+@tasks.loop(minutes=30)
+async def snapshot_characters():
+    """Write the character cache snapshot for fast restarts."""
+    await services.char_mgr.write_snapshot()
+
+
 # Set up the bot instance
 intents = discord.Intents(guilds=True, members=True, messages=True, webhooks=True)
 bot = InconnuBot(intents=intents, debug_guilds=settings.debug_guilds, cache_app_emojis=True)
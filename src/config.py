@@ -3,6 +3,7 @@ INCONNU_CONFIG_FILE at startup."""
 
 import os
 
+from loguru import logger
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -26,11 +27,19 @@ class Settings(BaseSettings):
     profile_site: str = "http://localhost:5173/"
     app_site: str = "http://localhost:5173"
     guild_cache_loc: str = "file::memory:?cache=shared"
+    spool_loc: str = "inconnu-spool.db"  # Holds non-critical writes while MongoDB is down
+    character_cache_limit: int = 0  # 0 loads every character at startup
+    character_snapshot: str = ""  # Path to the character cache snapshot
+    character_write_delay: float = 0  # Seconds to coalesce saves; 0 saves at once
+    web_workers: int = 0  # API worker processes; 0 serves the API in the bot's loop
+    web_bridge: str = "inconnu-bridge.sock"  # Socket the bot serves API workers on
+    web_worker: bool = False  # Set in the API workers' environment
     show_test_routes: bool = False
     debug: str | None = None
 
     # Database
     mongo_url: str
+    index_dry_run: bool = False  # Log missing indexes at startup instead of creating them
 
     # Channels
     report_channel: int | None = None
@@ -63,3 +72,16 @@ class Settings(BaseSettings):
 
 
 settings = Settings()  # type: ignore[call-arg]
+
+
+def configure_logging():
+    """Configure loguru for production (file sink) or leave defaults for dev.
+    Called by the bot and by each API worker process."""
+    if settings.prod:
+        logger.remove()
+        logger.add(
+            "/var/log/inconnu.log",
+            rotation="0:00",
+            retention=7,
+            level="INFO",
+        )
@@ -1,10 +1,12 @@
 """Shared database instance and collections."""
 
-from typing import Any
+from collections.abc import Mapping
+from typing import Any, NamedTuple
 
 from beanie import Document, init_beanie
 from loguru import logger
-from pymongo import AsyncMongoClient
+from pymongo import AsyncMongoClient, IndexModel
+from pymongo.errors import OperationFailure
 
 from config import settings
 from models import RPPost, VChar, VGuild, VUser
@@ -19,19 +21,112 @@ guilds = _db.guilds
 headers = _db.headers
 interactions = _db.interactions
 log = _db.log
-probabilities = _db.probabilities
+roll_stats = _db.roll_stats
 rolls = _db.rolls
 rp_posts = _db.rp_posts
 supporters = _db.supporters
+trait_stats = _db.trait_stats
 upload_log = _db.upload_log
 users = _db.users
 
 
+# Indexes on the collections that don't have beanie models. The models
+# declare theirs in their Settings.
+INDEXES: dict[str, list[IndexModel]] = {
+    "headers": [IndexModel([("message", 1)], name="message")],
+    "roll_stats": [
+        # Rollups are upserted by bucket, so each bucket must be unique
+        IndexModel(
+            [("charid", 1), ("day", 1), ("outcome", 1), ("rerolled", 1)],
+            name="bucket",
+            unique=True,
+        ),
+    ],
+    "rolls": [
+        IndexModel([("charid", 1), ("use_in_stats", 1), ("date", 1)], name="charid_stats_date"),
+        IndexModel([("message", 1)], name="message"),
+    ],
+    "supporters": [IndexModel([("discontinued", 1)], name="discontinued")],
+    "trait_stats": [
+        IndexModel([("charid", 1), ("day", 1), ("trait", 1)], name="bucket", unique=True),
+    ],
+}
+
+
+class IndexDiff(NamedTuple):
+    """Differences between the declared and existing indexes, by collection."""
+
+    missing: dict[str, list[IndexModel]]
+    undeclared: dict[str, list[str]]
+
+
 def models() -> list[type[Document]]:
     """Beanie database models."""
     return [VChar, RPPost, VGuild, VUser]
 
 
+def declared_indexes() -> dict[str, list[IndexModel]]:
+    """Every declared index, by collection."""
+    declared = {name: list(indexes) for name, indexes in INDEXES.items()}
+    for model in models():
+        if indexes := getattr(model.Settings, "indexes", None):
+            declared.setdefault(model.Settings.name, []).extend(indexes)
+    return declared
+
+
+def _index_key(index: Mapping[str, Any]) -> tuple:
+    """An index's key pattern, which identifies it regardless of its name.
+    The server reports text indexes by their weights rather than their key."""
+    key = list(dict(index["key"]).items())
+    if ("_fts", "text") in key:
+        return tuple((field, "text") for field in sorted(index["weights"]))
+    return tuple(key)
+
+
+async def index_diff() -> IndexDiff:
+    """Compare the declared indexes with the database's."""
+    missing = {}
+    undeclared = {}
+    for name, indexes in declared_indexes().items():
+        existing = await _db[name].index_information()
+        existing_keys = {_index_key(info) for info in existing.values()}
+        declared_keys = {_index_key(index.document) for index in indexes}
+
+        if absent := [i for i in indexes if _index_key(i.document) not in existing_keys]:
+            missing[name] = absent
+        if extra := [
+            index_name
+            for index_name, info in existing.items()
+            if index_name != "_id_" and _index_key(info) not in declared_keys
+        ]:
+            undeclared[name] = extra
+
+    return IndexDiff(missing, undeclared)
+
+
+async def ensure_indexes(dry_run: bool = False) -> IndexDiff:
+    """Create any missing declared indexes. In a dry run, only log them.
+    Undeclared indexes are logged but never dropped. If a collection's
+    indexes conflict with existing ones, they're logged and skipped."""
+    diff = await index_diff()
+    for name, index_names in diff.undeclared.items():
+        logger.info("DB: Undeclared indexes on {}: {}", name, ", ".join(index_names))
+
+    for name, indexes in diff.missing.items():
+        index_names = ", ".join(index.document["name"] for index in indexes)
+        if dry_run:
+            logger.warning("DB: Would create indexes on {}: {}", name, index_names)
+        else:
+            try:
+                await _db[name].create_indexes(indexes)
+            except OperationFailure as err:
+                logger.error("DB: Couldn't create indexes on {}: {}", name, err)
+            else:
+                logger.info("DB: Created indexes on {}: {}", name, index_names)
+
+    return diff
+
+
 async def server_info() -> dict[str, Any]:
     """Run the client server_info() method and return the result."""
     info = await _client.server_info()
@@ -39,11 +134,17 @@ async def server_info() -> dict[str, Any]:
     return info
 
 
-async def init():
-    """Initialize the database."""
-    await init_beanie(_db, document_models=models())
+async def init(indexes: bool = True):
+    """Initialize the database and, unless told not to, its indexes. Only
+    the bot builds indexes; API workers leave them to it."""
+    # Beanie would create the models' indexes itself; they're handled with
+    # the rest so that a dry run can hold them back
+    await init_beanie(_db, document_models=models(), skip_indexes=True)
     logger.info("Initialized beanie. Database: {}", _db.name)
 
+    if indexes:
+        await ensure_indexes(dry_run=settings.index_dry_run)
+
 
 async def close():
     """Close the database connection."""
@@ -29,7 +29,7 @@ async def update_name(character: VChar, new_name: str) -> str:
 
     old_name = character.name
     character.name = new_name
-    await services.char_mgr.sort_chars()
+    await services.char_mgr.sort_chars(character)
 
     return f"Rename `{old_name}` to `{new_name}`."
 
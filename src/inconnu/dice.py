@@ -1,5 +1,7 @@
 """Dice rolling utilities for Vampire: The Masquerade."""
 
+from array import array
+from collections.abc import Iterable
 from typing import overload
 
 import pypcg
@@ -7,6 +9,12 @@ import pypcg
 # PCG32 is better than Mersenne Twister
 RNG = pypcg.PCG32()
 
+# Bulk d10s are made from random bytes: 0-249 map evenly onto 1-10, and the
+# rest are rejected so the faces stay unbiased.
+_FACES = bytes(byte % 10 + 1 for byte in range(256))
+_REJECTED = bytes(range(250, 256))
+_CHUNK = 4096  # getrandbits() is quadratic in its size, so draw in chunks
+
 
 @overload
 def d10(count: None = None) -> int:
@@ -22,7 +30,41 @@ def d10(count: int | None = None) -> list[int] | int:
     """Generate one or a list of d10s."""
     if count is None:
         return RNG.randint(1, 10)
-    return [RNG.randint(1, 10) for _ in range(count)]
+    return list(_d10_bytes(count))
+
+
+def d10_array(count: int) -> array:
+    """Generate a uint8 array of d10s."""
+    buffer = array("B", bytes(count))
+    return fill_d10(buffer)
+
+
+def fill_d10[T](buffer: T) -> T:
+    """Fill a writable uint8 buffer (bytearray, array('B'), etc.) with d10s in
+    a single pass over the RNG stream. Returns the buffer for convenience."""
+    view = memoryview(buffer).cast("B")  # type: ignore[arg-type]
+    view[:] = _d10_bytes(len(view))
+    return buffer
+
+
+def histogram(dice: Iterable[int]) -> list[int]:
+    """Count the faces in a throw. Index 0 holds the ones, index 9 the tens."""
+    faces = bytes(dice)
+    return [faces.count(face) for face in range(1, 11)]
+
+
+def _d10_bytes(count: int) -> bytearray:
+    """Generate count d10s as bytes."""
+    dice = bytearray()
+    while len(dice) < count:
+        # Draw a little extra to cover the rejected bytes
+        needed = count - len(dice)
+        size = min(needed + needed // 16 + 4, _CHUNK)
+        raw = RNG.getrandbits(8 * size).to_bytes(size, "little")
+        dice += raw.translate(_FACES, _REJECTED)
+
+    del dice[count:]
+    return dice
 
 
 def random(ceiling=100) -> int:
@@ -3,8 +3,8 @@
 import discord
 from loguru import logger
 
-import db
 import errors
+import services
 import ui
 from ctx import AppCtx
 from models import VChar
@@ -55,7 +55,7 @@ async def show_header(ctx: AppCtx, character: VChar, **kwargs):
             message = await resp.original_response()
     finally:
         if message is not None:
-            await register_header(ctx, message, character)
+            register_header(ctx, message, character)
         else:
             logger.warning(
                 "Unable to register {}'s header ({}: {})",
@@ -65,9 +65,11 @@ async def show_header(ctx: AppCtx, character: VChar, **kwargs):
             )
 
 
-async def register_header(ctx, message, character):
-    """Register the header in the database."""
-    await db.headers.insert_one(
+def register_header(ctx, message, character):
+    """Register the header in the database. The write is queued, so this
+    doesn't wait on the database."""
+    services.telemetry.log(
+        "headers",
         {
             "character": {
                 "guild": ctx.guild.id,
@@ -78,7 +80,7 @@ async def register_header(ctx, message, character):
             "channel": ctx.channel.id,
             "message": message.id,
             "timestamp": discord.utils.utcnow(),
-        }
+        },
     )
 
 
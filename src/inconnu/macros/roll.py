@@ -9,6 +9,7 @@ from loguru import logger
 
 import errors
 import inconnu
+import services
 import ui
 from ctx import AppCtx
 from inconnu.macros import macro_common
@@ -97,7 +98,7 @@ async def roll(ctx: AppCtx, syntax: str, character=None):
         elif macro.name.lower() == "bol":
             logger.info("VM: {}'s macro mimics Blush of Life", character.name)
             character.set_blush(1)
-            await character.save()
+            await services.char_mgr.save(character)
 
     except (ValueError, SyntaxError):
         err = f"**Unknown syntax:** `{syntax}`"
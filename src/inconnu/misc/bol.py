@@ -2,6 +2,7 @@
 
 import errors
 import inconnu
+import services
 from models import VChar
 from services.haven import haven
 
@@ -44,4 +45,4 @@ async def bol(ctx, character: VChar, ministry_alt):
         await inconnu.misc.rouse(
             ctx, character, count, msg, character.humanity == 8, oblivion=False
         )
-        await character.save()
+        await services.char_mgr.save(character)
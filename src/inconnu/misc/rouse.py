@@ -52,7 +52,7 @@ async def rouse(
         else:
             update_msg += f"__passed__ a Rouse check. Hunger remains `{character.hunger}`."
 
-        await character.save()
+        await services.char_mgr.save(character)
         inter = await __display_outcome(ctx, character, outcome, purpose, oblivion, message)
         msg = await get_message(inter)
 
@@ -74,7 +74,7 @@ async def rouse(
         # within valid boundaries. Unfortunately, __display_outcome() runs
         # VChar.log(), which needs to be saved.
         # TODO: Move logging outside of __display_outcome()
-        await character.save()
+        await services.char_mgr.save(character)
 
 
 def __make_title(outcome):
@@ -158,7 +158,7 @@ async def __damage_ghoul(ctx, ghoul):
         fields=[("Health", inconnu.character.DisplayField.HEALTH)],
         footer="V5 Core, p.234",
     )
-    await ghoul.save()
+    await services.char_mgr.save(ghoul)
 
 
 async def __rouse_roll(guild, character: VChar, rolls: int, reroll: bool):
@@ -53,7 +53,7 @@ async def slake(ctx, character, amount: int, **kwargs):
         )
         msg = await get_message(inter)
         await asyncio.gather(
-            character.save(),
+            services.char_mgr.save(character),
             services.character_update(
                 ctx=ctx,
                 msg=msg,
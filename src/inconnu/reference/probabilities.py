@@ -1,17 +1,15 @@
 """reference/probabilities.py - Calculate the probability of a given roll."""
 
-from collections import defaultdict
 from types import SimpleNamespace as SN
 
 import discord
 
-import db
 import errors
-import inconnu
 import services
 import ui
 from ctx import AppCtx
 from inconnu import vr as roll
+from inconnu.roll import odds
 from services.haven import Haven
 
 __HELP_URL = "https://docs.inconnu.app/command-reference/miscellaneous#probability-calculation"
@@ -47,7 +45,7 @@ async def probability(ctx: AppCtx, syntax: str, strategy=None, character=None):
 
         parser = roll.RollParser(character, syntax)
         params = SN(pool=parser.pool, hunger=parser.hunger, difficulty=parser.difficulty)
-        probabilities = await __get_probabilities(params, strategy)
+        probabilities = __get_probabilities(params, strategy)
 
         await __display_embed(ctx, params, strategy, probabilities)
 
@@ -71,7 +69,7 @@ async def __display_embed(ctx, params, strategy: str, probs: dict):
         colour=0x000000,
     )
     embed.set_author(name="Outcome Probabilities")
-    embed.set_footer(text="Simulated over 10,000 runs")
+    embed.set_footer(text="Exact probabilities")
 
     # Breakdown field
 
@@ -123,69 +121,6 @@ async def __display_embed(ctx, params, strategy: str, probs: dict):
     await ctx.respond(embed=embed)
 
 
-async def __get_probabilities(params, strategy):
-    """Retrieve the probabilities from storage or, if not calculated yet, generate them."""
-    col = db.probabilities
-
-    probs = await col.find_one(
-        {
-            "pool": params.pool,
-            "hunger": params.hunger,
-            "difficulty": params.difficulty,
-            "strategy": strategy,
-        }
-    )
-
-    if probs is None:
-        probs = __simulate(params, strategy)
-
-        # Save the probabilities
-        await col.insert_one(
-            {
-                "pool": params.pool,
-                "hunger": params.hunger,
-                "difficulty": params.difficulty,
-                "strategy": strategy,
-                "probabilities": probs,
-            }
-        )
-    else:
-        probabilities = probs["probabilities"]
-        probs = defaultdict(int)
-        probs.update(probabilities)
-
-    return probs
-
-
-def __simulate(params, strategy):
-    """Simulate 10,000 rolls and calculate the probabilities of each potential outcome."""
-    trials = 10000
-    totals = defaultdict(int)
-    outcomes = defaultdict(int)
-
-    for _ in range(trials):
-        outcome = inconnu.Roll(params.pool, params.hunger, params.difficulty)
-
-        # Check reroll options
-        if strategy is not None:
-            if strategy == "reroll_failures" and outcome.can_reroll_failures:
-                outcome.reroll(strategy)
-            elif strategy == "maximize_criticals" and outcome.can_maximize_criticals:
-                outcome.reroll(strategy)
-            elif strategy == "avoid_messy" and outcome.can_avoid_messy_critical:
-                outcome.reroll(strategy)
-            elif strategy == "risky" and outcome.can_risky_messy_critical:
-                outcome.reroll(strategy)
-
-        totals["total_successes"] += outcome.total_successes
-        totals["margin"] += outcome.margin
-        outcomes[outcome.outcome] += 1
-
-    probabilities = defaultdict(int)
-    probabilities["total_successes"] = totals["total_successes"] / trials
-    probabilities["margin"] = totals["margin"] / trials
-
-    for outcome, frequency in outcomes.items():
-        probabilities[outcome] = frequency / trials
-
-    return probabilities
+def __get_probabilities(params, strategy):
+    """Calculate the exact probabilities of each potential outcome."""
+    return odds.calculate(params.pool, params.hunger, params.difficulty, strategy)
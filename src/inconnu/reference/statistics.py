@@ -4,6 +4,7 @@ from collections import defaultdict
 from datetime import UTC, datetime, timedelta
 
 import discord
+from bson import ObjectId
 
 import constants
 import db
@@ -11,7 +12,9 @@ import services
 import ui
 from ctx import AppCtx
 from models import VChar
+from models.vchardocs import VCharTrait
 from services.haven import haven
+from services.rolllog import ROLLUP_FIELDS, RollTally, day_of
 from utils import get_avatar, player_lookup
 
 __HELP_URL = "https://docs.inconnu.app/command-reference/miscellaneous#statistics"
@@ -74,50 +77,16 @@ async def __traits_statistics(
     player: discord.Member,
 ):
     """View the statistics for all traits since a given date."""
-    pipeline = [
-        {
-            "$match": {
-                "charid": character.id,
-                "use_in_stats": True,
-                "date": {"$gte": date},
-                "pool": {"$ne": None},
-            }
-        },
-        {
-            "$project": {
-                "charid": 1,
-                "pool": {"$split": ["$pool", " "]},
-                "successes": {
-                    "$add": [
-                        {"$cond": [{"$ne": ["$reroll", None]}, "$reroll.margin", "$margin"]},
-                        "$difficulty",
-                    ]
-                },
-            }
-        },
-        {"$unwind": "$pool"},
-        {
-            "$group": {
-                "_id": {"charid": "$charid", "pool": "$pool"},
-                "count": {"$sum": "$successes"},
-            }
-        },
-        {"$group": {"_id": "$_id.charid", "docs": {"$push": {"k": "$_id.pool", "v": "$count"}}}},
-        {"$replaceRoot": {"newRoot": {"_id": "$_id", "traits": {"$arrayToObject": ["$docs"]}}}},
-    ]
-    async with await db.rolls.aggregate(pipeline) as cursor:
-        raw_stats = await cursor.to_list(1)
-
-    if raw_stats:
+    successes = await __tally_successes(character, date)
+
+    if successes:
         stats = {}
 
         for trait in character.traits:
-            # The raw_stats object has a bunch of bogus data, such as
-            # math operators and numbers, that we don't want. So we
-            # get only those traits that the character actually has.
-            # If there aren't any successes, we store a 0, because that
-            # is useful information, too.
-            stats[trait.name] = raw_stats[0]["traits"].get(trait.name, 0)
+            # Only show the traits the character still has. If there aren't
+            # any successes, we store a 0, because that is useful
+            # information, too.
+            stats[trait.name] = successes.get(trait.name, 0)
 
         await __display_trait_statistics(ctx, character, stats, date, player, hidden)
     else:
@@ -135,6 +104,23 @@ async def __traits_statistics(
             )
 
 
+async def __tally_successes(character: VChar, date: datetime) -> dict[str, int]:
+    """Count the character's successes per trait since the date. Specialty
+    successes count toward their trait."""
+    first_day, partial_day = await __partial_day([character.id], date)
+
+    successes = defaultdict(int)
+    for tally in partial_day:
+        for key in tally.traits:
+            successes[__base_trait(key)] += tally.successes
+
+    query = {"charid": character.id, "day": {"$gte": first_day}}
+    async for bucket in db.trait_stats.find(query):
+        successes[__base_trait(bucket["trait"])] += bucket["successes"]
+
+    return successes
+
+
 async def __display_trait_statistics(
     ctx: AppCtx,
     character: VChar,
@@ -178,70 +164,10 @@ async def __display_trait_statistics(
 
 async def __general_statistics(ctx: AppCtx, date: datetime, owner: discord.Member, hidden: bool):
     """View the roll statistics for the user's characters."""
-    col = db.characters
-    pipeline = [
-        {
-            "$match": {
-                "guild": ctx.guild_id,
-                "user": owner.id,
-            }
-        },
-        {
-            "$lookup": {
-                "from": "rolls",
-                "localField": "_id",
-                "foreignField": "charid",
-                "as": "rolls",
-            }
-        },
-        {"$unwind": "$rolls"},
-        {
-            "$match": {
-                "rolls.date": {"$gte": date},
-                "rolls.use_in_stats": True,
-            }
-        },
-        {
-            "$project": {
-                "_id": 1,
-                "name": 1,
-                "rerolled": {"$cond": [{"$ne": ["$rolls.reroll", None]}, 1, 0]},
-                "outcome": {
-                    "$cond": [
-                        {"$ne": ["$rolls.reroll", None]},
-                        "$rolls.reroll.outcome",
-                        "$rolls.outcome",
-                    ]
-                },
-            }
-        },
-        {
-            "$group": {
-                "_id": {"charid": "$_id", "character": "$name", "outcome": "$outcome"},
-                "outcome": {"$addToSet": "$outcome"},
-                "rerolls": {"$sum": "$rerolled"},
-                "count": {"$sum": 1},
-            }
-        },
-        {
-            "$group": {
-                "_id": {"charid": "$_id.charid", "character": "$_id.character"},
-                "rerolls": {"$sum": "$rerolls"},
-                "outcomes": {"$push": {"k": {"$first": "$outcome"}, "v": "$count"}},
-            }
-        },
-        {
-            "$project": {
-                "_id": "$_id.charid",
-                "name": "$$ROOT._id.character",
-                "rerolls": "$rerolls",
-                "outcomes": {"$arrayToObject": "$outcomes"},
-            }
-        },
-        {"$sort": {"name": 1}},
-    ]
-    async with await col.aggregate(pipeline) as cursor:
-        results = await cursor.to_list(length=None)
+    results = await __tally_outcomes(
+        await services.char_mgr.fetchall(ctx.guild_id, owner.id),
+        date,
+    )
 
     if not results:
         if ctx.user == owner:
@@ -258,6 +184,70 @@ async def __general_statistics(ctx: AppCtx, date: datetime, owner: discord.Membe
         await __display_embed(ctx, results, date, owner, hidden)
 
 
+async def __partial_day(
+    charids: list[ObjectId], date: datetime
+) -> tuple[datetime, list[RollTally]]:
+    """The rollups cover whole days. If the date isn't midnight, returns the
+    following midnight and the rolls from the date until then. Otherwise,
+    returns the date and no rolls."""
+    first_day = day_of(date)
+    if first_day == date:
+        return date, []
+
+    first_day += timedelta(days=1)
+    query = {
+        "charid": {"$in": charids},
+        "use_in_stats": True,
+        "date": {"$gte": date, "$lt": first_day},
+    }
+    rolls = await db.rolls.find(query, projection=ROLLUP_FIELDS).to_list(None)
+    return first_day, [RollTally.of(roll) for roll in rolls]
+
+
+def __base_trait(key: str) -> str:
+    """The trait in a trait key, without specialties."""
+    return key.split(VCharTrait.DELIMITER)[0]
+
+
+async def __tally_outcomes(characters: list[VChar], date: datetime) -> list[dict]:
+    """Count the characters' roll outcomes since the date. Whole days are read
+    from the daily rollups; only the rest of the first day, if the date isn't
+    midnight, is counted from the rolls themselves."""
+    if not characters:
+        return []
+
+    names = {char.id: char.raw_name for char in characters}
+    tallies = {charid: {"rerolls": 0, "outcomes": defaultdict(int)} for charid in names}
+
+    def tally(charid, outcome: str, rerolled: bool, count: int = 1):
+        tallies[charid]["outcomes"][outcome] += count
+        if rerolled:
+            tallies[charid]["rerolls"] += count
+
+    first_day, partial_day = await __partial_day(list(names), date)
+    for roll in partial_day:
+        tally(roll.charid, roll.outcome, roll.rerolled)
+
+    query = {"charid": {"$in": list(names)}, "day": {"$gte": first_day}}
+    async for bucket in db.roll_stats.find(query):
+        tally(bucket["charid"], bucket["outcome"], bucket["rerolled"], bucket["count"])
+
+    results = []
+    for charid, stats in tallies.items():
+        outcomes = {outcome: count for outcome, count in stats["outcomes"].items() if count > 0}
+        if outcomes:
+            results.append(
+                {
+                    "_id": charid,
+                    "name": names[charid],
+                    "rerolls": stats["rerolls"],
+                    "outcomes": outcomes,
+                }
+            )
+
+    return sorted(results, key=lambda result: result["name"])
+
+
 async def __display_text(ctx: AppCtx, results: list[dict], date: datetime, hidden: bool):
     """Display the results using plain text."""
     if date.year < 2021:
@@ -225,7 +225,7 @@ class PostModal(discord.ui.Modal):
 
         # Register the messages
         if self.show_header:
-            await inconnu.header.register(interaction, header_message, self.character)
+            inconnu.header.register(interaction, header_message, self.character)
             logger.info("POST: {} registered header", self.character.name)
 
         # Extract the user mentions as pure ints
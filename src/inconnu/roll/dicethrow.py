@@ -1,10 +1,14 @@
 """dicethrow.py - A class for tracking dice throws."""
 
 import inconnu
+from inconnu.dice import histogram
 
 
 class DiceThrow:
-    """Roll a specified number of dice and allow the user to query its statistics."""
+    """Roll a specified number of dice and allow the user to query its statistics.
+
+    The throw keeps the dice in rolled order for display, plus a 10-bin face
+    histogram that answers every statistic without rescanning the dice."""
 
     def __init__(self, dice):
         if isinstance(dice, int):
@@ -12,36 +16,39 @@ class DiceThrow:
         else:
             self.dice = dice
 
+    @property
+    def dice(self) -> list[int]:
+        """The dice, in the order they were rolled."""
+        return self._dice
+
+    @dice.setter
+    def dice(self, dice: list[int]):
+        self._dice = dice
+        self.histogram = tuple(histogram(dice))
+        self._failures = sum(self.histogram[:5])
+        self._successes = len(dice) - self._failures
+
     @property
     def count(self):
         """The number of rolled dice."""
-        return len(self.dice)
+        return len(self._dice)
 
     @property
     def ones(self):
         """Retrieve the number of ones in the dice."""
-        return self.dice.count(1)
+        return self.histogram[0]
 
     @property
     def failures(self):
         """Retrieve the number of unsuccessful dice."""
-        return self.__count_in_range(1, 5)
+        return self._failures
 
     @property
     def successes(self):
         """Retrieve the number of dice with 6 or higher."""
-        return self.__count_in_range(6, 10)
+        return self._successes
 
     @property
     def tens(self):
         """Retrieve the number of rolled tens."""
-        return self.dice.count(10)
-
-    def __count_in_range(self, minimum, maximum):
-        """Return the number of dice within the specified range. (Inclusive.)"""
-        count = 0
-        for die in self.dice:
-            if minimum <= die <= maximum:
-                count += 1
-
-        return count
+        return self.histogram[9]
@@ -0,0 +1,405 @@
+"""odds.py - Exact outcome probabilities for a roll."""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from math import comb
+from pathlib import Path
+from typing import Self
+
+from loguru import logger
+
+# For the purposes of outcome classification, every d10 falls into one of four
+# buckets: a one (only meaningful on Hunger dice), a plain failure, a plain
+# success, and a ten. Normal dice don't care about ones, so ones fold into the
+# failures.
+_ONE = 0.1
+_FAIL = 0.4
+_SUCCESS = 0.4
+_TEN = 0.1
+
+__MAX_REROLL = 3
+
+OUTCOMES = ("critical", "messy", "success", "fail", "total_fail", "bestial")
+STRATEGIES = ("reroll_failures", "maximize_criticals", "avoid_messy", "risky")
+
+# The precalculated table covers every pool, the largest Hunger a guild can
+# allow, and a difficulty range that covers nearly all real rolls. Anything
+# outside of it falls back to calculating on the fly.
+TABLE_PATH = Path(__file__).with_name("odds.bin")
+TABLE_POOL = 100
+TABLE_HUNGER = 10
+TABLE_DIFFICULTY = 20
+
+_TABLE_FIELDS = (*OUTCOMES, "total_successes")
+_TABLE_SLOTS = (None, *STRATEGIES)
+_TABLE_HEADER = struct.Struct("<8s3H")  # Magic, max pool, max Hunger, max difficulty
+_TABLE_MAGIC = b"INCODDS1"
+
+# A reroll rule takes a normal throw's (failures, successes, tens) and returns
+# the (successes, tens) that are kept plus the number of dice that get re-thrown.
+Reroll = Callable[[int, int, int], tuple[int, int, int]]
+
+
+def calculate(
+    pool: int, hunger: int, difficulty: int, strategy: str | None = None, max_hunger=5
+) -> dict[str, float]:
+    """Calculate the exact probability of each roll outcome, plus the expected
+    total successes and margin. The keys match Roll.outcome.
+
+    Args:
+        pool (int): The pool's total size, including hunger
+        hunger (int): The rolled hunger dice
+        difficulty (int): The target number of successes
+        strategy (Optional[str]): The Willpower reroll strategy to apply, if able
+        max_hunger (int): The maximum allowed Hunger
+    """
+    # Mirror Roll's validation so both give the same errors for the same input
+    if not 0 <= hunger <= max_hunger:
+        raise ValueError(f"Hunger must be between 0 and {max_hunger}. (Got `{hunger}`.)")
+
+    if difficulty < 0:
+        raise ValueError(f"Difficulty cannot be less than 0. (Got `{difficulty}`.)")
+
+    pool = max(1, pool)
+    if pool > 100:
+        raise ValueError(f"Pool cannot exceed 100. (Got `{pool}`.)")
+
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reroll strategy: `{strategy}`.")
+
+    if _table is not None and (probs := _table.get(pool, hunger, difficulty, strategy)):
+        return probs
+
+    normal_dice = max(0, pool - hunger)
+    hunger = min(pool, hunger)
+
+    return dict(_calculate(normal_dice, hunger, difficulty, strategy))
+
+
+class OddsTable:
+    """A memory-mapped table of precalculated outcome probabilities. Entries are
+    little-endian float32s, indexed by pool, Hunger, difficulty, and strategy."""
+
+    def __init__(self, buffer: mmap.mmap):
+        magic, max_pool, max_hunger, max_difficulty = _TABLE_HEADER.unpack_from(buffer)
+        if magic != _TABLE_MAGIC:
+            raise ValueError("Not a probability table.")
+
+        self.max_pool = max_pool
+        self.max_hunger = max_hunger
+        self.max_difficulty = max_difficulty
+
+        self._buffer = buffer
+        self._values = memoryview(buffer)[_TABLE_HEADER.size :].cast("f")
+
+        expected = max_pool * (max_hunger + 1) * (max_difficulty + 1) * len(_TABLE_SLOTS)
+        if len(self._values) != expected * len(_TABLE_FIELDS):
+            self.close()
+            raise ValueError("Probability table is truncated.")
+
+    @classmethod
+    def load(cls, path: Path) -> Self:
+        """Memory-map a table file."""
+        if sys.byteorder != "little":
+            raise ValueError("Probability tables require a little-endian host.")
+
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def __len__(self) -> int:
+        return len(self._values) // len(_TABLE_FIELDS)
+
+    def get(self, pool: int, hunger: int, difficulty: int, strategy: str | None):
+        """Look up a validated roll's probabilities. Returns None if the table
+        doesn't cover the roll."""
+        if pool > self.max_pool or hunger > self.max_hunger or difficulty > self.max_difficulty:
+            return None
+
+        index = (pool - 1) * (self.max_hunger + 1) + hunger
+        index = index * (self.max_difficulty + 1) + difficulty
+        index = (index * len(_TABLE_SLOTS) + _TABLE_SLOTS.index(strategy)) * len(_TABLE_FIELDS)
+
+        probs = dict(zip(_TABLE_FIELDS, self._values[index : index + len(_TABLE_FIELDS)]))
+        probs["margin"] = probs["total_successes"] - difficulty
+        return probs
+
+    def close(self):
+        """Release the memory map."""
+        self._values.release()
+        self._buffer.close()
+
+
+_table: OddsTable | None = None
+
+
+def load_table(path: Path = TABLE_PATH) -> bool:
+    """Memory-map the precalculated table, if it exists. Returns True if the
+    table was loaded; otherwise, calculate() works without it."""
+    global _table
+
+    try:
+        table = OddsTable.load(path)
+    except FileNotFoundError:
+        logger.warning("ODDS: No probability table at {}; calculating on demand", path)
+        return False
+    except (ValueError, struct.error) as err:
+        logger.warning("ODDS: Unable to use {}: {}", path, err)
+        return False
+
+    if _table is not None:
+        _table.close()
+    _table = table
+    logger.info("ODDS: Loaded {} precalculated probabilities", len(table))
+    return True
+
+
+def table_rows(pool: int, max_hunger=TABLE_HUNGER, max_difficulty=TABLE_DIFFICULTY) -> bytes:
+    """Calculate every table entry for a pool. Pools are independent, so the
+    build can calculate them in parallel."""
+    values = array("f")
+    for hunger in range(max_hunger + 1):
+        normal_dice = max(0, pool - hunger)
+        hunger_dice = min(pool, hunger)
+
+        for difficulty in range(max_difficulty + 1):
+            for strategy in _TABLE_SLOTS:
+                probs = dict(_calculate(normal_dice, hunger_dice, difficulty, strategy))
+                values.extend(probs[field] for field in _TABLE_FIELDS)
+
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_table(
+    path: Path,
+    rows: Iterable[bytes],
+    max_pool=TABLE_POOL,
+    max_hunger=TABLE_HUNGER,
+    max_difficulty=TABLE_DIFFICULTY,
+):
+    """Write a table file from each pool's rows, in pool order."""
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as file:
+        file.write(_TABLE_HEADER.pack(_TABLE_MAGIC, max_pool, max_hunger, max_difficulty))
+        file.writelines(rows)
+
+    # Don't leave a half-written table behind if we're interrupted
+    tmp.replace(path)
+
+
+@lru_cache(maxsize=1024)
+def _calculate(
+    normal_dice: int, hunger_dice: int, difficulty: int, strategy: str | None
+) -> tuple[tuple[str, float], ...]:
+    """Calculate the probabilities for a validated roll. Returns a tuple of
+    pairs so the cached value can't be mutated by callers."""
+    probs = dict.fromkeys(OUTCOMES, 0.0)
+    expected_successes = 0.0
+    target = max(difficulty, 1)  # A roll with zero successes never succeeds
+
+    for (ones, h_successes, h_tens), chance in _hunger_throw(hunger_dice).items():
+        # Most strategies don't care what the Hunger dice did, so we only
+        # rebuild the normal dice's distribution when they do
+        context = _reroll_context(strategy, normal_dice, hunger_dice, h_successes, h_tens, target)
+        normal = _summary(normal_dice, context)
+
+        # Total successes are successes + 2 * tens - (tens % 2). Tracking the
+        # weight (successes + 2 * tens) and the parity of the tens separately
+        # lets us combine normal and Hunger dice by simple addition.
+        h_weight = h_successes + 2 * h_tens
+        h_parity = h_tens & 1
+
+        for (capped_tens, parity), suffix in normal.groups.items():
+            threshold = target - h_weight + (parity ^ h_parity)
+            successes = _at_least(suffix, threshold)
+            failures = suffix[0] - successes
+
+            if capped_tens + h_tens >= 2:
+                probs["critical" if h_tens == 0 else "messy"] += chance * successes
+            else:
+                probs["success"] += chance * successes
+
+            if ones:
+                probs["bestial"] += chance * failures
+            elif h_weight == 0 and (capped_tens, parity) == (0, 0):
+                # Only a throw with no successes or tens at all is a total failure
+                probs["total_fail"] += chance * (suffix[0] - _at_least(suffix, 1))
+                probs["fail"] += chance * (_at_least(suffix, 1) - successes)
+            else:
+                probs["fail"] += chance * failures
+
+        tens_odd = normal.odd_tens if h_parity == 0 else 1 - normal.odd_tens
+        expected_successes += chance * (normal.mean_weight + h_weight - tens_odd)
+
+    probs["total_successes"] = expected_successes
+    probs["margin"] = expected_successes - difficulty
+
+    return tuple(probs.items())
+
+
+class _Summary:
+    """The distribution of a normal throw, reduced to what outcome
+    classification needs: for each (min(tens, 2), tens % 2) group, the suffix
+    sums of the probability of reaching a given weight."""
+
+    def __init__(self, distribution: dict[tuple[int, int], float]):
+        max_weight = max(successes + 2 * tens for successes, tens in distribution)
+        groups = defaultdict(lambda: [0.0] * (max_weight + 2))
+        self.mean_weight = 0.0
+        self.odd_tens = 0.0
+
+        for (successes, tens), chance in distribution.items():
+            weight = successes + 2 * tens
+            groups[(min(tens, 2), tens & 1)][weight] += chance
+            self.mean_weight += chance * weight
+            if tens & 1:
+                self.odd_tens += chance
+
+        for weights in groups.values():
+            for weight in range(max_weight - 1, -1, -1):
+                weights[weight] += weights[weight + 1]
+
+        self.groups = dict(groups)
+
+
+def _at_least(suffix: list[float], weight: int) -> float:
+    """The probability of a group reaching at least the given weight."""
+    if weight >= len(suffix):
+        return 0.0
+    return suffix[max(weight, 0)]
+
+
+@lru_cache(maxsize=128)
+def _throw(count: int) -> dict[tuple[int, int], float]:
+    """The distribution of (successes, tens) when throwing normal dice."""
+    distribution = {}
+    for tens in range(count + 1):
+        for successes in range(count - tens + 1):
+            failures = count - tens - successes
+            ways = comb(count, tens) * comb(count - tens, successes)
+            distribution[(successes, tens)] = (
+                ways * _TEN**tens * _SUCCESS**successes * (_ONE + _FAIL) ** failures
+            )
+
+    return distribution
+
+
+@lru_cache(maxsize=16)
+def _hunger_throw(count: int) -> dict[tuple[bool, int, int], float]:
+    """The distribution of (any ones, successes, tens) when throwing Hunger dice."""
+    distribution = {}
+    for tens in range(count + 1):
+        for successes in range(count - tens + 1):
+            failures = count - tens - successes
+            ways = comb(count, tens) * comb(count - tens, successes)
+            chance = ways * _TEN**tens * _SUCCESS**successes
+
+            # Any failures that aren't all plain failures contain at least one 1
+            distribution[(False, successes, tens)] = chance * _FAIL**failures
+            if failures:
+                any_ones = (_ONE + _FAIL) ** failures - _FAIL**failures
+                distribution[(True, successes, tens)] = chance * any_ones
+
+    return distribution
+
+
+@lru_cache(maxsize=512)
+def _summary(count: int, context: tuple) -> "_Summary":
+    """Summarize the normal dice's distribution after any rerolls."""
+    return _Summary(_rethrow(count, _reroll_rule(context)))
+
+
+def _rethrow(count: int, rule: Reroll | None) -> dict[tuple[int, int], float]:
+    """The distribution of (successes, tens) after applying a reroll rule."""
+    if rule is None:
+        return _throw(count)
+
+    distribution = defaultdict(float)
+    for (successes, tens), chance in _throw(count).items():
+        kept_successes, kept_tens, rerolled = rule(count - successes - tens, successes, tens)
+        if rerolled == 0:
+            distribution[(successes, tens)] += chance
+            continue
+
+        for (new_successes, new_tens), new_chance in _throw(rerolled).items():
+            final = (kept_successes + new_successes, kept_tens + new_tens)
+            distribution[final] += chance * new_chance
+
+    return dict(distribution)
+
+
+def _reroll_context(
+    strategy: str | None,
+    normal_dice: int,
+    hunger_dice: int,
+    h_successes: int,
+    h_tens: int,
+    target: int,
+) -> tuple:
+    """Reduce a roll to just the parameters a strategy's reroll decision depends
+    on, so that rolls which reroll identically share one normal distribution."""
+    if strategy == "reroll_failures":
+        return (strategy,)
+
+    if strategy == "maximize_criticals":
+        return (strategy, normal_dice, normal_dice + hunger_dice >= 2, h_tens > 0)
+
+    if strategy in ("avoid_messy", "risky") and h_tens == 1:
+        # Only the successes still needed from the normal dice matter
+        return (strategy, max(target - h_successes, 0))
+
+    # No strategy, or one that can't apply to these Hunger dice
+    return (None,)
+
+
+def _reroll_rule(context: tuple) -> Reroll | None:
+    """Build the reroll rule for a context. Each rule mirrors both the Roll.can_*
+    check and the reroll helper in roll.py for the corresponding strategy."""
+    match context:
+        case ("reroll_failures",):
+
+            def reroll_failures(failures, successes, tens):
+                return successes, tens, min(failures, __MAX_REROLL)
+
+            return reroll_failures
+
+        case ("maximize_criticals", normal_dice, enough_dice, hunger_tens):
+
+            def maximize_criticals(failures, successes, tens):
+                if not enough_dice:
+                    return successes, tens, 0
+                if normal_dice == 1 and not (tens == 0 and hunger_tens):
+                    return successes, tens, 0
+
+                # Failures go first, then non-critical successes fill any remaining slots
+                converted = min(successes, max(0, __MAX_REROLL - failures))
+                return successes - converted, tens, min(failures + converted, __MAX_REROLL)
+
+            return maximize_criticals
+
+        case ("avoid_messy" | "risky" as strategy, needed):
+            risky = strategy == "risky"
+
+            def avoid_messy(failures, successes, tens):
+                # The Hunger dice hold exactly one ten
+                total_tens = tens + 1
+                messy = total_tens >= 2 and successes + 2 * total_tens - (total_tens & 1) >= needed
+
+                if not messy or tens > __MAX_REROLL or (risky and failures == 0):
+                    return successes, tens, 0
+
+                rerolled = tens
+                if risky:
+                    rerolled += min(__MAX_REROLL - tens, failures)
+                return successes, 0, rerolled
+
+            return avoid_messy
+
+    return None
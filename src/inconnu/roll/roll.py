@@ -1,5 +1,8 @@
 """rollresult.py - Class for calculating the results of a roll."""
 
+from datetime import UTC, datetime
+from typing import NamedTuple
+
 from bson import ObjectId
 
 import inconnu
@@ -8,19 +11,48 @@ from inconnu.roll.dicethrow import DiceThrow
 
 __MAX_REROLL = 3
 
+_EMBED_COLORS = {
+    "critical": 0x00FF00,  # Green
+    "messy": 0xEA3323,  # Red-orange
+    "success": 0x7777FF,  # Blurple-ish
+    "fail": 0x808080,  # Gray
+    "total_fail": 0x000000,  # Black
+    "bestial": 0x5C0700,  # Dark red
+}
+_TAKEAWAYS = {
+    "critical": "Critical",
+    "messy": "Messy Critical",
+    "success": "Success",
+    "fail": "Failure",
+    "total_fail": "Total Failure",
+    "bestial": "Bestial Failure",
+}
+
+
+class _Result(NamedTuple):
+    """A roll's cached classification."""
+
+    key: tuple
+    total_successes: int
+    outcome: str
+
 
 class Roll:
     """A container class that determines the result of a roll."""
 
-    def __init__(self, pool, hunger, difficulty, max_hunger=5, pool_str=None, syntax=None):
+    def __init__(
+        self, pool, hunger, difficulty, max_hunger=5, pool_str=None, syntax=None, traits=None
+    ):
         """
         Args:
             pool (int): The pool's total size, including hunger
             hunger (int): The rolled hunger dice
             difficulty (int): The target number of successes
             pool_str (Optional[int]): The pool's attribute + skill representation
+            traits (Optional[list[str]]): The keys of the traits in the pool
         """
         self.id = ObjectId()
+        self.date = datetime.now(UTC)
         self.hunger_rating = hunger
 
         if not 0 <= hunger <= max_hunger:
@@ -39,9 +71,11 @@ class Roll:
         self.normal = DiceThrow(normal_dice)
         self.hunger = DiceThrow(hunger)
         self.difficulty = difficulty
+        self._result: _Result | None = None
         self.strategy = None
         self.descriptor = None
         self.pool_str = pool_str
+        self.traits = traits or []
 
         if syntax is None:
             self.syntax = None
@@ -58,62 +92,55 @@ class Roll:
             if not elements.intersection(ATTRIBUTES_AND_SKILLS):
                 self.can_reroll = False
 
-    # We could technically do this with stored properties, but the math is extremely
-    # fast, so we will do it this way for legibility. This will also more easily let
-    # us perform Willpower re-rolls.
+    # Classifying a roll takes a single pass over the two throws' histograms.
+    # The result is cached until the dice or difficulty change, as every embed
+    # property below queries it several times.
+
+    def _classify(self) -> "_Result":
+        """Determine the roll's total successes and outcome."""
+        key = (self.normal.histogram, self.hunger.histogram, self.difficulty)
+        if self._result is not None and self._result.key == key:
+            return self._result
+
+        normal_tens = self.normal.tens
+        hunger_tens = self.hunger.tens
+        total_tens = normal_tens + hunger_tens
+        crits = total_tens - (total_tens % 2)
+        total_successes = self.normal.successes + self.hunger.successes + crits
+
+        if total_successes >= self.difficulty and total_successes > 0:
+            if normal_tens >= 2 and hunger_tens == 0:
+                outcome = "critical"
+            elif total_tens >= 2 and hunger_tens > 0:
+                outcome = "messy"
+            else:
+                outcome = "success"
+        elif self.hunger.ones > 0:
+            outcome = "bestial"
+        elif total_successes == 0:
+            outcome = "total_fail"
+        else:
+            outcome = "fail"
+
+        self._result = _Result(key, total_successes, outcome)
+        return self._result
 
     # Embed data
 
     @property
     def embed_color(self):
         """Determine the Discord embed color based on the result of the roll."""
-        if self.is_critical:
-            return 0x00FF00  # Green
-        if self.is_messy:
-            return 0xEA3323  # Red-orange
-        if self.is_successful:
-            return 0x7777FF  # Blurple-ish
-        if self.is_failure:
-            return 0x808080  # Gray
-        if self.is_total_failure:
-            return 0x000000  # Black
-
-        # Bestial failure
-        return 0x5C0700  # Dark red
+        return _EMBED_COLORS[self.outcome]
 
     @property
     def main_takeaway(self):
         """The roll's main takeaway--i.e. "SUCCESS", "FAILURE", etc."""
-        if self.is_critical:
-            return "Critical"
-        if self.is_messy:
-            return "Messy Critical"
-        if self.is_successful:
-            return "Success"
-        if self.is_failure:
-            return "Failure"
-        if self.is_total_failure:
-            return "Total Failure"
-
-        # Bestial failure
-        return "Bestial Failure"
+        return _TAKEAWAYS[self.outcome]
 
     @property
     def outcome(self):
         """Simplified version of main_takeaway. Used in logs."""
-        if self.is_critical:
-            return "critical"
-        if self.is_messy:
-            return "messy"
-        if self.is_successful:
-            return "success"
-        if self.is_failure:
-            return "fail"
-        if self.is_total_failure:
-            return "total_fail"
-
-        # Bestial failure
-        return "bestial"
+        return self._classify().outcome
 
     # Roll Reflection
 
@@ -125,10 +152,7 @@ class Roll:
     @property
     def total_successes(self):
         """The total number of successes."""
-        total_tens = self.normal.tens + self.hunger.tens
-        crits = total_tens - (total_tens % 2)
-
-        return self.normal.successes + self.hunger.successes + crits
+        return self._classify().total_successes
 
     @property
     def margin(self):
@@ -138,35 +162,32 @@ class Roll:
     @property
     def is_critical(self):
         """Return true if the roll is a critical, but not messy, success."""
-        critical = self.normal.tens >= 2 and self.hunger.tens == 0
-        return critical and self.is_successful
+        return self.outcome == "critical"
 
     @property
     def is_messy(self):
         """Return true if the roll is a messy critical."""
-        messy = (self.normal.tens + self.hunger.tens) >= 2 and self.hunger.tens > 0
-        return messy and self.is_successful
+        return self.outcome == "messy"
 
     @property
     def is_successful(self):
         """Return true if the roll meets or exceeds its target."""
-        return self.total_successes >= self.difficulty and self.total_successes > 0
+        return self.outcome in ("critical", "messy", "success")
 
     @property
     def is_failure(self):
         """Return true if the target successes weren't achieved, but it isn't bestial."""
-        return (self.hunger.ones == 0 and self.total_successes > 0) and not self.is_successful
+        return self.outcome == "fail"
 
     @property
     def is_total_failure(self):
         """Return true if no successes were rolled, and no ones on hunger dice."""
-        return self.total_successes == 0 and self.hunger.ones == 0
+        return self.outcome == "total_fail"
 
     @property
     def is_bestial(self):
         """Return true if the roll is a bestial failure."""
-        bestial = self.hunger.ones > 0
-        return bestial and not self.is_successful
+        return self.outcome == "bestial"
 
     # Re-roll strategies. None take into account whether you have an attribute
     # in the pool! Use can_reroll for that.
@@ -223,6 +244,7 @@ class Roll:
 
         new_throw = DiceThrow(new_dice)
         self.normal = new_throw
+        self._result = None
 
 
 def _reroll_failures(dice: list) -> list:
@@ -256,6 +278,7 @@ def _maximize_criticals(dice: list) -> list:
     # them to be.
 
     # Thus, we use this ugly method.
+    dice = list(dice)  # Don't disturb the throw we were given
     total_failures = len([die for die in dice if die < 6])
     if total_failures < __MAX_REROLL:
         for index, die in enumerate(dice):
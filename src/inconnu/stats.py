@@ -1,15 +1,17 @@
 """stats.py - Various packages for user statistics."""
 
-from datetime import UTC, datetime
+from collections import Counter
 
 import discord
-from pymongo import ReturnDocument, UpdateOne
+from pymongo import ReturnDocument
 
 import db
+import services
 from models import VChar, VGuild
+from services.rolllog import ROLLUP_FIELDS, RollTally, update_rollups
 
 
-async def log_roll(
+def log_roll(
     guild: int,
     channel: int,
     user: int,
@@ -20,47 +22,49 @@ async def log_roll(
 ):
     """
     Log a roll and its outcome. If the roll is a reroll, simply replace it.
+    The write is queued, so this doesn't wait on the database.
     Args:
         guild (int): The Discord ID of the guild where the roll was made
         user (int): The Discord ID of the user making the roll
         charid (VChar): The character that made the roll (optional)
         outcome (Roll): The roll's parameters and outcome
     """
-    rolls = db.rolls
-
-    if await rolls.find_one({"_id": outcome.id}) is None:
-        roll = _gen_roll(guild, channel, user, message, char, outcome, comment)
-        await rolls.insert_one(roll)
+    if outcome.strategy is not None:
+        services.roll_log.reroll(outcome.id, _gen_reroll(outcome))
     else:
-        reroll = _gen_reroll(outcome)
-        await rolls.update_one({"_id": outcome.id}, reroll)
+        services.roll_log.insert(_gen_roll(guild, channel, user, message, char, outcome, comment))
 
 
 async def toggle_roll_stats(message: int) -> bool | None:
     """Toggle whether a roll should be used in statistics."""
+    await services.roll_log.flush()
     ret = await db.rolls.find_one_and_update(
         {"message": message},
         [{"$set": {"use_in_stats": {"$not": "$use_in_stats"}}}],
+        projection=ROLLUP_FIELDS,
         return_document=ReturnDocument.AFTER,
     )
 
     if ret:
+        if (tally := RollTally.of(ret | {"use_in_stats": True})) is not None:
+            delta = Counter()
+            if ret["use_in_stats"]:
+                delta.update(tally.counts())
+            else:
+                delta.subtract(tally.counts())
+            await update_rollups(delta)
         return ret["use_in_stats"]
     return None
 
 
 async def roll_message_deleted(*message_ids):
     """Remove a set of rolls from stats calculation."""
-    updates = []
-    for message_id in message_ids:
-        updates.append(UpdateOne({"message": message_id}, {"$set": {"use_in_stats": False}}))
-
-    await db.rolls.bulk_write(updates)
+    await _remove_from_stats({"message": {"$in": list(message_ids)}})
 
 
 async def delete_rolls_in_channel(channel):
     """Delete all rolls in a channel."""
-    await db.rolls.update_many({"channel": channel.id}, {"$set": {"use_in_stats": False}})
+    await _remove_from_stats({"channel": channel.id})
 
 
 async def guild_joined(guild: discord.Guild):
@@ -90,6 +94,24 @@ async def guild_renamed(guild: discord.Guild, new_name: str):
 # Roll logging helpers
 
 
+async def _remove_from_stats(query: dict):
+    """Stop using the matching rolls in statistics, and take them out of the
+    rollups."""
+    await services.roll_log.flush()
+
+    query |= {"use_in_stats": True}
+    removed = Counter()
+    ids = []
+    async for roll in db.rolls.find(query, projection=ROLLUP_FIELDS):
+        ids.append(roll["_id"])
+        if (tally := RollTally.of(roll)) is not None:
+            removed.subtract(tally.counts())
+
+    if ids:
+        await db.rolls.update_many({"_id": {"$in": ids}}, {"$set": {"use_in_stats": False}})
+        await update_rollups(removed)
+
+
 def _gen_roll(
     guild: int,
     channel: int,
@@ -102,7 +124,7 @@ def _gen_roll(
     """Add a new roll outcome entry to the database."""
     return {
         "_id": outcome.id,
-        "date": datetime.now(UTC),
+        "date": outcome.date,
         "guild": guild,  # We use the guild and user keys for easier lookups
         "channel": channel,
         "user": user,
@@ -115,6 +137,7 @@ def _gen_roll(
         "margin": outcome.margin,
         "outcome": outcome.outcome,
         "pool": outcome.pool_str,
+        "traits": outcome.traits,
         "comment": comment,
         "reroll": None,
         "use_in_stats": True,
@@ -123,18 +146,13 @@ def _gen_roll(
 
 def _gen_reroll(outcome):
     """
-    Update a roll entry.
+    The reroll entry for a roll.
     Args:
-        ident (ObjectId): The entry's identifier
         outcome (Roll): The new outcome
     """
     return {
-        "$set": {
-            "reroll": {
-                "strategy": outcome.strategy,
-                "dice": outcome.normal.dice,
-                "margin": outcome.margin,
-                "outcome": outcome.outcome,
-            }
-        },
+        "strategy": outcome.strategy,
+        "dice": outcome.normal.dice,
+        "margin": outcome.margin,
+        "outcome": outcome.outcome,
     }
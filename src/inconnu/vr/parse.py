@@ -171,7 +171,15 @@ async def display_outcome(
 async def perform_roll(character: VChar, syntax, max_hunger=5):
     """Public interface for __evaluate_syntax() that returns a Roll."""
     parser = RollParser(character, syntax)
-    return Roll(parser.pool, parser.hunger, parser.difficulty, max_hunger, parser.pool_str, syntax)
+    return Roll(
+        parser.pool,
+        parser.hunger,
+        parser.difficulty,
+        max_hunger,
+        parser.pool_str,
+        syntax,
+        parser.pool_traits,
+    )
 
 
 def needs_character(syntax: str):
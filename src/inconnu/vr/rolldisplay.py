@@ -168,7 +168,7 @@ class RollDisplay:
             else:
                 msg_id = None
 
-            await inconnu.stats.log_roll(
+            inconnu.stats.log_roll(
                 ctx.guild.id,
                 ctx.channel.id,
                 self.owner.id,
@@ -180,7 +180,7 @@ class RollDisplay:
         else:
             # If this is a DM roll, we don't keep stats, so we don't need to
             # get the message ID
-            await inconnu.stats.log_roll(
+            inconnu.stats.log_roll(
                 None, None, self.owner.id, None, self.character, self.outcome, self.comment
             )
 
@@ -192,7 +192,7 @@ class RollDisplay:
             if self.character is not None:
                 sup_wp = self.character.superficial_wp + 1
                 self.character.set_superficial_wp(sup_wp)
-                await self.character.save()
+                await services.char_mgr.save(self.character)
 
             await inconnu.character.display(
                 btn,
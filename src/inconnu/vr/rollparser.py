@@ -1,9 +1,8 @@
 """vr/rollparser.py - Define a class for parsing user roll input."""
 
-import ast
-import operator as op
 import re
-from typing import cast
+from functools import lru_cache
+from typing import NamedTuple
 
 from loguru import logger
 
@@ -20,25 +19,15 @@ class RollParser:
         self.expand_only = expand_only
         self.power_bonus = power_bonus
 
-        # Convert the syntax into tokens, if necessary
+        # Tokenizing and splitting the syntax doesn't depend on the character,
+        # so it's compiled once and shared by every parser for the same syntax
         if isinstance(raw_syntax, str):
-            if self.has_invalid_characters(raw_syntax):
-                raise SyntaxError("Invalid syntax.")
-
-            # Fix spacing
-            if VCharTrait.DELIMITER == ".":
-                # Period matches any character in regex, so we have to escape it
-                pat = r"\s*\.\s*"
-            else:
-                pat = r"\s*" + VCharTrait.DELIMITER + r"\s*"
-            syntax = re.sub(pat, VCharTrait.DELIMITER, raw_syntax)
-            syntax = re.sub(r"\s*([+-])\s*", r" \g<1> ", syntax)
-
-            self.tokens = syntax.split()
+            plan = compile_syntax(raw_syntax)
         else:
-            self.tokens = map(str, raw_syntax)
+            plan = compile_tokens(tuple(map(str, raw_syntax)))
+        self.tokens = plan.tokens
 
-        self._create_stacks()
+        self._create_stacks(plan)
         self._evaluate_stacks()
 
     @property
@@ -69,6 +58,11 @@ class RollParser:
 
         return string
 
+    @property
+    def pool_traits(self) -> list[str]:
+        """The keys of the traits in the pool, without repeats."""
+        return self._parameters["pool_traits"]
+
     @property
     def hunger(self):
         """The int value of the roll's hunger."""
@@ -81,7 +75,7 @@ class RollParser:
         """The int value of the roll's difficulty."""
         return self._parameters["eval_difficulty"]
 
-    def _create_stacks(self):
+    def _create_stacks(self, plan: "RollPlan"):
         """Create both the fully qualified stacks and the interpolated stacks."""
         using_discipline = False
 
@@ -93,61 +87,53 @@ class RollParser:
 
         qualified_stacks = []
         interpolated_stacks = []
-
-        # When we encounter two operands in a row, the user has switched
-        # parameter types (e.g. pool -> hunger -> difficulty). When this
-        # happens, we wrap up the current stack and start a new one.
-
-        current_qualified = []
-        current_interpolated = []
-        expecting_operand = True
-
-        for token in self.tokens:
-            if token in "+-":
-                # We don't prevent anyone from using multiple operators in a
-                # row, so they could technically write 3 + - + - 2, and it will
-                # work despite being somewhat nonsensical.
-                current_qualified.append(token)
-                current_interpolated.append(token)
-                expecting_operand = True
-                continue
-
-            if not expecting_operand:
-                # We expected +/-. Since we didn't get one, we're looking at the
-                # next parameter type. Start up and begin processing the next
-                # stack.
-                qualified_stacks.append(current_qualified)
-                interpolated_stacks.append(current_interpolated)
-
-                current_qualified = []
-                current_interpolated = []
-
-            if token == "current_hunger":
-                token = "hunger" if self.character.is_vampire else "0"
-
-            if token.isdigit():
-                # Digits require no interpolation, so just add it to the stacks
-                current_qualified.append(token)
-                current_interpolated.append(token)
-            else:
-                # We have a character trait, which needs to be qualified and
-                # interpolated before adding it to the stacks
-                trait = self.character.find_trait(token)
-                if self.expand_only:
-                    current_qualified.append(trait.key)
+        pool_traits = []
+
+        # The plan has already split the tokens into stacks: whenever two
+        # operands appear in a row, the user has switched parameter types
+        # (e.g. pool -> hunger -> difficulty).
+
+        for stack in plan.stacks:
+            current_qualified = []
+            current_interpolated = []
+
+            for token in stack:
+                if token in "+-":
+                    # We don't prevent anyone from using multiple operators in a
+                    # row, so they could technically write 3 + - + - 2, and it will
+                    # work despite being somewhat nonsensical.
+                    current_qualified.append(token)
+                    current_interpolated.append(token)
+                    continue
+
+                if token == "current_hunger":
+                    token = "hunger" if self.character.is_vampire else "0"
+
+                if token.isdigit():
+                    # Digits require no interpolation, so just add it to the stacks
+                    current_qualified.append(token)
+                    current_interpolated.append(token)
                 else:
-                    current_qualified.append(trait.name)
+                    # We have a character trait, which needs to be qualified and
+                    # interpolated before adding it to the stacks
+                    trait = self.character.find_trait(token)
+                    if self.expand_only:
+                        current_qualified.append(trait.key)
+                    else:
+                        current_qualified.append(trait.name)
 
-                current_interpolated.append(str(trait.rating))
+                    current_interpolated.append(str(trait.rating))
 
-                if trait.discipline:
-                    logger.debug("ROLLPARSER: Discipline detected")
-                    using_discipline = True
+                    if not qualified_stacks and trait.key not in pool_traits:
+                        # This is the pool stack
+                        pool_traits.append(trait.key)
 
-            expecting_operand = False
+                    if trait.discipline:
+                        logger.debug("ROLLPARSER: Discipline detected")
+                        using_discipline = True
 
-        qualified_stacks.append(current_qualified)
-        interpolated_stacks.append(current_interpolated)
+            qualified_stacks.append(current_qualified)
+            interpolated_stacks.append(current_interpolated)
 
         # Determine which stack is which. Order goes pool, hunger, difficulty.
 
@@ -157,6 +143,7 @@ class RollParser:
 
         self._parameters["q_pool_stack"] = qualified_stacks.pop(0)
         self._parameters["i_pool_stack"] = interpolated_stacks.pop(0)
+        self._parameters["pool_traits"] = pool_traits
 
         if self.power_bonus and using_discipline and self.character.power_bonus > 0:
             logger.debug("ROLLPARSER: Adding power bonus")
@@ -227,15 +214,14 @@ class RollParser:
 
     def _evaluate_stacks(self):
         """Convert the pool, hunger, and difficulty into values."""
-        pool = " ".join(self._parameters["i_pool_stack"])
-        hunger = " ".join(self._parameters["i_hunger_stack"])
-        difficulty = " ".join(self._parameters["i_difficulty_stack"])
+        pool = self._parameters["i_pool_stack"]
+        hunger = self._parameters["i_hunger_stack"]
+        difficulty = self._parameters["i_difficulty_stack"]
 
-        # We can just use eval for this rather than looping through
         try:
-            self._parameters["eval_pool"] = eval_expr(pool)
-            self._parameters["eval_hunger"] = eval_expr(hunger)
-            self._parameters["eval_difficulty"] = eval_expr(difficulty)
+            self._parameters["eval_pool"] = eval_stack(pool)
+            self._parameters["eval_hunger"] = eval_stack(hunger)
+            self._parameters["eval_difficulty"] = eval_stack(difficulty)
         except SyntaxError as err:
             raise SyntaxError("Invalid syntax!") from err
 
@@ -250,28 +236,89 @@ class RollParser:
         return re.search(r"\(.*\)", syntax) is not None
 
 
-# Math Helpers
+class RollPlan(NamedTuple):
+    """The character-independent structure of some roll syntax: its normalized
+    tokens, split into the operand stacks that become pool, Hunger, and
+    difficulty."""
+
+    tokens: tuple[str, ...]
+    stacks: tuple[tuple[str, ...], ...]
+
+
+@lru_cache(maxsize=1024)
+def compile_syntax(raw_syntax: str) -> RollPlan:
+    """Normalize and tokenize user roll syntax."""
+    if RollParser.has_invalid_characters(raw_syntax):
+        raise SyntaxError("Invalid syntax.")
+
+    # Fix spacing
+    if VCharTrait.DELIMITER == ".":
+        # Period matches any character in regex, so we have to escape it
+        pat = r"\s*\.\s*"
+    else:
+        pat = r"\s*" + VCharTrait.DELIMITER + r"\s*"
+    syntax = re.sub(pat, VCharTrait.DELIMITER, raw_syntax)
+    syntax = re.sub(r"\s*([+-])\s*", r" \g<1> ", syntax)
+
+    return compile_tokens(tuple(syntax.split()))
 
-# We could use pandas for this, but this is built-in and considerably faster,
-# which makes a difference when calculating probabilities.
 
-OPERATORS = {ast.Add: op.add, ast.Sub: op.sub, ast.UAdd: op.pos, ast.USub: op.neg}
+@lru_cache(maxsize=1024)
+def compile_tokens(tokens: tuple[str, ...]) -> RollPlan:
+    """Split already-tokenized syntax into its operand stacks."""
+    stacks = []
+    current = []
+    expecting_operand = True
+
+    for token in tokens:
+        if token in "+-":
+            current.append(token)
+            expecting_operand = True
+            continue
+
+        if not expecting_operand:
+            # We expected +/-. Since we didn't get one, we're looking at the
+            # next parameter type, so start a new stack.
+            stacks.append(tuple(current))
+            current = []
+
+        current.append(token)
+        expecting_operand = False
+
+    stacks.append(tuple(current))
+
+    return RollPlan(tokens, tuple(stacks))
+
+
+# Math Helpers
+
+_INTEGER = re.compile(r"-?(?:0+|[1-9][0-9]*)")
 
 
-def eval_expr(expr: str) -> int:
-    """Evaluate a mathematical string expression. Safer than using eval."""
-    return eval_(ast.parse(expr, mode="eval").body)
+def eval_stack(stack: list[str]) -> int:
+    """Evaluate an interpolated stack of integers and +/- operators, following
+    Python's rules for unary and binary +/-."""
+    total = 0
+    sign = 1
+    expecting_operand = True
 
+    for token in stack:
+        if token in "+-":
+            # Runs of operators act as unary operators on the next operand
+            if token.count("-") % 2:
+                sign = -sign
+            expecting_operand = True
+            continue
 
-def eval_(node: ast.expr) -> int:
-    """Recursively evaluate a mathematical expression. Only handles +/-."""
-    if isinstance(node, ast.Constant):
-        return cast(int, node.value)
+        if not expecting_operand or _INTEGER.fullmatch(token) is None:
+            raise SyntaxError(f"Invalid operand: {token}")
 
-    if isinstance(node, ast.BinOp):
-        return OPERATORS[type(node.op)](eval_(node.left), eval_(node.right))
+        total += sign * int(token)
+        sign = 1
+        expecting_operand = False
 
-    if isinstance(node, ast.UnaryOp):
-        return OPERATORS[type(node.op)](eval_(node.operand))
+    if expecting_operand:
+        # Empty stack or a dangling operator
+        raise SyntaxError("Expected an operand")
 
-    raise TypeError(node)
+    return total
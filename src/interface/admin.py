@@ -98,6 +98,22 @@ class AdminCog(commands.Cog):
         """Show the number of character wizards running."""
         await ctx.respond(f"**Wizards running:** {services.wizard_cache.count}", ephemeral=True)
 
+    @discord.slash_command(guild_ids=[settings.admin_server])
+    @discord.default_permissions(administrator=True)
+    @commands.is_owner()
+    async def spool(self, ctx: AppCtx):
+        """Show the writes waiting for the database."""
+        lines = [f"**Spooled writes:** {services.spool.size}"]
+        for name, size in services.spool.sizes().items():
+            lines.append(f"- {name.title()}: {size}")
+
+        for writer in (services.roll_log, services.telemetry):
+            lines.append(
+                f"**{writer.label.title()}:** {writer.pending} queued, "
+                f"{writer.dropped} dropped, {writer.failed} failed"
+            )
+        await ctx.respond("\n".join(lines), ephemeral=True)
+
     @discord.slash_command(guild_ids=[settings.admin_server])
     @discord.default_permissions(administrator=True)
     @commands.is_owner()
@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING
 from discord.ext import commands
 from loguru import logger
 
-import db
+import services
 from utils import command_options
 
 if TYPE_CHECKING:
@@ -35,7 +35,8 @@ class LoggingCog(commands.Cog):
         )
 
         # Log to the database
-        await db.command_log.insert_one(
+        services.telemetry.log(
+            "command_log",
             {
                 "guild": ctx.guild_id,
                 "user": ctx.user.id,
@@ -47,7 +48,7 @@ class LoggingCog(commands.Cog):
                     for o in ctx.interaction.data.get("options", [])
                 ],
                 "date": datetime.now(UTC),
-            }
+            },
         )
 
 
@@ -1,36 +1,88 @@
 """Web interface."""
 
 import asyncio
+import os
+import sys
+from pathlib import Path
 
 import uvicorn
 from discord.ext import commands
 from loguru import logger
 
 import bot
+from config import settings
+from services.bridge import BridgeServer
+
+HOST = "127.0.0.1"
+PORT = 8000
 
 
 class WebCog(commands.Cog):
-    """Starts the FastAPI web server."""
+    """Starts the FastAPI web server.
+
+    By default, the server runs in the bot's event loop. With web_workers
+    set, it runs in that many separate processes instead, so slow requests
+    can't hold up the gateway. The workers reach the bot's data through a
+    bridge socket."""
 
     def __init__(self, bot: bot.InconnuBot):
         self.bot = bot
         self.server_task: asyncio.Task | None = None
+        self.bridge: BridgeServer | None = None
+        self.workers: asyncio.subprocess.Process | None = None
 
     @commands.Cog.listener()
     async def on_connect(self):
-        if self.server_task is None:
-            # Lazy import to avoid circular dependency with server.py
-            from server import app
+        if self.server_task is not None or self.workers is not None:
+            return
+
+        # Lazy import to avoid circular dependency with server.py. Importing it
+        # also registers the bridged functions the workers call.
+        from server import app
 
-            config = uvicorn.Config(app, host="127.0.0.1", port=8000, loop="asyncio")
+        if settings.web_workers > 0:
+            await self._start_workers(settings.web_workers)
+        else:
+            config = uvicorn.Config(app, host=HOST, port=PORT, loop="asyncio")
             server = uvicorn.Server(config)
             self.server_task = asyncio.create_task(server.serve())
             logger.info("API server started")
 
+    async def _start_workers(self, count: int):
+        """Serve the bridge and start the worker processes."""
+        bridge_path = str(Path(settings.web_bridge).resolve())
+        self.bridge = BridgeServer(bridge_path)
+        await self.bridge.start()
+
+        # The workers keep the bot's working directory, so they find the same
+        # config file and relative paths
+        env = os.environ | {"WEB_WORKER": "1", "WEB_BRIDGE": bridge_path}
+        self.workers = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server:app",
+            "--app-dir",
+            str(Path(__file__).parents[1]),
+            "--host",
+            HOST,
+            "--port",
+            str(PORT),
+            "--workers",
+            str(count),
+            env=env,
+        )
+        logger.info("API server started with {} workers (pid {})", count, self.workers.pid)
+
     def cog_unload(self):
         if self.server_task:
             self.server_task.cancel()
             logger.info("API server stopped")
+        if self.workers and self.workers.returncode is None:
+            self.workers.terminate()
+            logger.info("API workers stopped")
+        if self.bridge:
+            asyncio.create_task(self.bridge.close())
 
 
 def setup(bot: bot.InconnuBot):
@@ -12,12 +12,15 @@ from loguru import logger
 import db
 import services
 from bot import bot
-from config import settings
+from config import configure_logging, settings
+from inconnu.roll import odds
 
 
 async def startup():
     """Initialize the database connection and start the bot."""
+    odds.load_table()
     await db.init()
+    await services.spool.initialize()
     await services.char_mgr.initialize()
     await services.guild_cache.initialize()
     try:
@@ -27,6 +30,11 @@ async def startup():
         logger.info("Received shutdown signal")
     finally:
         logger.info("Cleaning up resources...")
+        await services.char_mgr.flush()
+        await services.roll_log.close()
+        await services.telemetry.close()
+        await services.spool.close()
+        await services.char_mgr.write_snapshot()
         await services.guild_cache.close()
         await db.close()
 
@@ -42,18 +50,6 @@ def handle_signal(signum: int, _):
         task.cancel()
 
 
-def configure_logging():
-    """Configure loguru for production (file sink) or leave defaults for dev."""
-    if settings.prod:
-        logger.remove()
-        logger.add(
-            "/var/log/inconnu.log",
-            rotation="0:00",
-            retention=7,
-            level="INFO",
-        )
-
-
 def main():
     uvloop.install()
     configure_logging()
@@ -0,0 +1,82 @@
+"""models/delta.py - Compute minimal MongoDB updates between document states."""
+
+import copy
+from typing import Any
+
+type Document = dict[str, Any]
+
+# Numeric changes under these paths are sent as $inc, so concurrent counters
+# don't clobber each other
+INCREMENTED = ("log",)
+
+
+def update_operators(old: Document, new: Document) -> Document:
+    """Build the $set/$unset/$inc/$push operators that turn the old state into
+    the new one. Both states are BSON-ready dicts, as from beanie's get_dict().
+    Returns an empty dict if nothing changed."""
+    ops: dict[str, Document] = {}
+    _diff(ops, "", old, new)
+    return ops
+
+
+def apply_operators(doc: Document, ops: Document) -> Document:
+    """Apply operators from update_operators() to a copy of a document, giving
+    the document as the database has it after the update."""
+    doc, ops = copy.deepcopy((doc, ops))
+    for op, fields in ops.items():
+        for path, value in fields.items():
+            *parents, key = path.split(".")
+            target = doc
+            for parent in parents:
+                target = target.setdefault(parent, {})
+
+            if op == "$set":
+                target[key] = value
+            elif op == "$unset":
+                target.pop(key, None)
+            elif op == "$inc":
+                target[key] = target.get(key, 0) + value
+            elif op == "$push":
+                target.setdefault(key, []).extend(value["$each"])
+    return doc
+
+
+def _diff(ops: dict[str, Document], prefix: str, old: Document, new: Document):
+    """Recursively diff two subdocuments into ops."""
+    for key, value in new.items():
+        if key == "_id" and not prefix:
+            continue
+        path = prefix + key
+
+        if key not in old:
+            ops.setdefault("$set", {})[path] = value
+            continue
+
+        previous = old[key]
+        if value == previous:
+            continue
+
+        if isinstance(value, dict) and isinstance(previous, dict):
+            _diff(ops, path + ".", previous, value)
+        elif isinstance(value, list) and isinstance(previous, list) and _appended(previous, value):
+            ops.setdefault("$push", {})[path] = {"$each": value[len(previous) :]}
+        elif _is_counter(path, previous, value):
+            ops.setdefault("$inc", {})[path] = value - previous
+        else:
+            ops.setdefault("$set", {})[path] = value
+
+    for key in old.keys() - new.keys():
+        ops.setdefault("$unset", {})[prefix + key] = ""
+
+
+def _appended(old: list, new: list) -> bool:
+    """Whether new is old with items added to the end."""
+    return len(new) > len(old) and new[: len(old)] == old
+
+
+def _is_counter(path: str, old: Any, new: Any) -> bool:
+    """Whether a change should be sent as an increment."""
+    if not path.startswith(tuple(p + "." for p in INCREMENTED)):
+        return False
+    # bool is an int, but it isn't a counter
+    return all(type(v) in (int, float) for v in (old, new))
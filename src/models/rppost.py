@@ -1,11 +1,12 @@
 """Rolepost models."""
 
 from datetime import UTC, datetime, timezone
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 import discord
 from beanie import Document
 from pydantic import AnyUrl, BaseModel, Field
+from pymongo import DESCENDING, TEXT, IndexModel
 
 from models.rpheader import HeaderSubdoc
 
@@ -54,6 +55,17 @@ class RPPost(Document):
         name = "rp_posts"
         use_state_management = True
         validate_on_save = True
+        indexes: ClassVar[list[IndexModel]] = [
+            # Searches, tags, and bookmarks
+            IndexModel(
+                [("guild", 1), ("user", 1), ("deleted", 1), ("date", DESCENDING)],
+                name="guild_user_deleted_date",
+            ),
+            IndexModel([("content", TEXT)], name="content_text"),
+            # Deletion and editing
+            IndexModel([("message_id", 1)], name="message_id"),
+            IndexModel([("id_chain", 1)], name="id_chain"),
+        ]
 
     @classmethod
     def new(
@@ -5,18 +5,22 @@ import copy
 import math
 import random
 from collections import Counter
+from collections.abc import Sequence
 from datetime import UTC, datetime
 from enum import StrEnum
 from functools import total_ordering
 from types import SimpleNamespace
-from typing import Any, Callable, ClassVar
+from typing import Any, Callable, ClassVar, Self
 
 from beanie import Document, Insert, Replace, Save, SaveChanges, before_event
+from beanie.odm.actions import ActionDirections, ActionRegistry, EventTypes
+from beanie.odm.utils.dump import get_dict
 from loguru import logger
-from pydantic import ConfigDict, Field
+from pydantic import ConfigDict, Field, PrivateAttr
 
 import errors
 from constants import ATTRIBUTES, DISCIPLINES, SKILLS, UNIVERSAL_TRAITS, Damage
+from models.delta import apply_operators, update_operators
 from models.vchardocs import (
     VCharExperience,
     VCharExperienceEntry,
@@ -75,10 +79,24 @@ class VChar(Document):
     experience: VCharExperience = Field(default_factory=VCharExperience)
     stat_log: dict[str, Any] = Field(alias="log", default_factory=dict)
 
+    # Incremented on every update, so clients can tell whether they have the
+    # current version of the character
+    revision: int = 0
+
+    # Sorted (casefolded name, position) pairs over raw_traits, plus the list
+    # and trait version they were built from. Built on demand. Anything that
+    # changes raw_traits in place must call _traits_changed() so the index
+    # isn't reused.
+    _trait_index: tuple[list[tuple[str, int]], list[VCharTrait], int] | None = PrivateAttr(
+        default=None
+    )
+    _trait_version: int = PrivateAttr(default=0)
+
     @before_event(Insert)
     def pre_insert(self):
         """Last-minute prep."""
         self.stat_log["created"] = datetime.now(UTC)
+        self.stat_log["modified"] = self.stat_log["created"]
 
         if self.splat == "thinblood":
             self.splat = "thin-blood"
@@ -106,8 +124,73 @@ class VChar(Document):
         if self.splat == "thinblood":
             self.splat = "thin-blood"
 
+        # Lets the character cache snapshot find what changed since it was made
+        self.stat_log["modified"] = datetime.now(UTC)
+        self.revision += 1
+
         logger.info("VCHAR: {} will update", self.name)
 
+    async def save(self, *args, **kwargs) -> Self:
+        """Save the character. If it's already in the database, only the
+        changed fields are sent, as $set/$unset/$inc/$push operators, rather
+        than replacing the whole document."""
+        saved_state = self.get_saved_state()
+        if args or kwargs or self.id is None or saved_state is None:
+            return await super().save(*args, **kwargs)
+
+        await ActionRegistry.run_actions(self, EventTypes.SAVE, ActionDirections.BEFORE, [])
+
+        # The state is committed before the write, so that an overlapping
+        # save sends only what changed after this one
+        state = self._validated_state()
+        self._saved_state = state
+        if update := update_operators(saved_state, state):
+            try:
+                await self.get_pymongo_collection().update_one({"_id": self.id}, update)
+            except Exception:
+                self._saved_state = saved_state
+                raise
+
+        await ActionRegistry.run_actions(self, EventTypes.SAVE, ActionDirections.AFTER, [])
+        return self
+
+    def stage(self, mutate: Callable[["VChar"], Any]) -> tuple["VChar", dict[str, Any]]:
+        """Apply a mutation to a copy of the character. Returns the copy and
+        the update that would persist it; call adopt() once the update has
+        been written."""
+        draft = self.model_copy(deep=True)
+        mutate(draft)
+        draft.pre_update()
+
+        state = draft._validated_state()
+        if (saved_state := self.get_saved_state()) is None:
+            update = {"$set": {k: v for k, v in state.items() if k != "_id"}}
+        else:
+            update = update_operators(saved_state, state)
+        draft._saved_state = state
+
+        return draft, update
+
+    def _validated_state(self) -> dict[str, Any]:
+        """The document as it will be saved. Assignments are validated as
+        they happen, but in-place changes to nested fields, such as appending
+        a trait, aren't; so the document is validated here, as beanie does
+        for a full save. Raises ValidationError if it's invalid."""
+        state = get_dict(self, to_db=True, exclude={"revision_id"})
+        if self.get_settings().validate_on_save:
+            type(self).model_validate(state)
+        return state
+
+    def adopt(self, draft: "VChar", update: dict[str, Any], mutate: Callable[["VChar"], Any]):
+        """Re-apply a mutation staged by stage() once its update has been
+        written. Changes made to the character since it was staged stand, and
+        only the fields the update wrote are marked as saved."""
+        mutate(self)
+        self.stat_log["modified"] = draft.stat_log["modified"]
+        self.revision += 1
+        self._saved_state = apply_operators(self.get_saved_state() or {}, update)
+        self._traits_changed()
+
     # Comparators
 
     def __lt__(self, other):
@@ -162,14 +245,15 @@ class VChar(Document):
         self.stains = 0
 
     @property
-    def traits(self) -> list[VCharTrait]:
-        """A copy of the character's traits."""
-        return copy.deepcopy(self.raw_traits)
+    def traits(self) -> "TraitsView":
+        """A read-only view of the character's traits."""
+        return TraitsView(self.raw_traits)
 
     @traits.setter
     def traits(self, value: list[VCharTrait]):
         """Set the character's traits (used by beanie rollback)."""
         self.raw_traits = value
+        self._traits_changed()
 
     @property
     def has_biography(self) -> bool:
@@ -356,33 +440,65 @@ class VChar(Document):
 
     # Traits
 
-    @property
-    def _inherent_traits(self) -> list[VCharTrait]:
-        """Get this character's inherent traits."""
+    def _traits_changed(self):
+        """Invalidate the trait index after raw_traits or a trait's name changes."""
+        self._trait_version += 1
+        self._trait_index = None
+
+    def _trait_candidates(self, identifier: str, exact: bool) -> list[VCharTrait]:
+        """The traits whose names could match an identifier, in storage order,
+        followed by any matching inherent traits. Matching the subtraits is
+        left to VCharTrait.matching()."""
+        token = identifier.split(VCharTrait.DELIMITER)[0].casefold()
+
+        index = self._trait_index
+        if (
+            index is None
+            or index[1] is not self.raw_traits
+            or index[2] != self._trait_version
+            or len(index[0]) != len(index[1])
+        ):
+            entries = sorted(
+                (trait.name.casefold(), pos) for pos, trait in enumerate(self.raw_traits)
+            )
+            index = self._trait_index = (entries, self.raw_traits, self._trait_version)
+
+        entries = index[0]
+        positions = []
+        for key, position in entries[bisect.bisect_left(entries, (token, -1)) :]:
+            if key == token or (not exact and key.startswith(token)):
+                positions.append(position)
+            else:
+                break
+
+        candidates = [self.raw_traits[position] for position in sorted(positions)]
+
+        # Inherent traits are cheap to make but depend on current ratings, so
+        # we only make the ones that could match
         if self.is_vampire:
             inherents = UNIVERSAL_TRAITS
         else:
             inherents = (t for t in UNIVERSAL_TRAITS if t not in VChar.VAMPIRE_TRAITS)
 
-        traits = []
         for inherent in inherents:
-            rating = getattr(self, inherent.lower())
-            if isinstance(rating, str):
-                # Tracker string, so get the undamaged count
-                rating = rating.count(Damage.NONE)
-            traits.append(VCharTrait(name=inherent, rating=rating, type=VCharTrait.Type.INHERENT))
+            key = inherent.casefold()
+            if key == token or (not exact and key.startswith(token)):
+                candidates.append(self._inherent_trait(inherent))
 
-        return traits
+        return candidates
 
-    @property
-    def _all_traits(self) -> list[VCharTrait]:
-        """A copy of all the character's traits, including inherent traits."""
-        return self.traits + self._inherent_traits
+    def _inherent_trait(self, inherent: str) -> VCharTrait:
+        """Make an inherent trait from the character's current rating."""
+        rating = getattr(self, inherent.lower())
+        if isinstance(rating, str):
+            # Tracker string, so get the undamaged count
+            rating = rating.count(Damage.NONE)
+        return VCharTrait(name=inherent, rating=rating, type=VCharTrait.Type.INHERENT)
 
     def has_trait(self, name: str) -> bool:
         """Determine whether a character has a given trait."""
-        for trait in self.raw_traits:
-            if trait.matching(name, True):
+        for trait in self._trait_candidates(name, True):
+            if not trait.is_inherent and trait.matching(name, True):
                 return True
         return False
 
@@ -393,7 +509,7 @@ class VChar(Document):
         """
         found = []
 
-        for trait in self._all_traits:
+        for trait in self._trait_candidates(name, exact):
             if matches := trait.matching(name, exact):
                 for match in matches:
                     if match.exact:
@@ -423,8 +539,8 @@ class VChar(Document):
 
         for input_name, input_rating in traits.items():
             updated = False
-            for trait in self.raw_traits:
-                if trait.matching(input_name, True):
+            for trait in self._trait_candidates(input_name, True):
+                if not trait.is_inherent and trait.matching(input_name, True):
                     if trait.name in ("Resolve", "Composure"):
                         counter["willpower"] += input_rating - trait.rating
                     elif trait.name == "Stamina":
@@ -451,6 +567,7 @@ class VChar(Document):
                     type=assigned_category.value,
                 )
                 bisect.insort(self.raw_traits, new_trait, key=lambda t: t.name.casefold())
+                self._traits_changed()
                 assignments[input_name] = input_rating
 
         # Traits added; now adjust HP/WP
@@ -473,9 +590,10 @@ class VChar(Document):
 
     def delete_trait(self, name: str) -> str:
         """Delete a trait. Raises TraitNotFound if the trait doesn't exist."""
-        for index, trait in enumerate(self.raw_traits):
-            if trait.matching(name, True):
-                del self.raw_traits[index]
+        for trait in self._trait_candidates(name, True):
+            if not trait.is_inherent and trait.matching(name, True):
+                self.raw_traits.remove(trait)
+                self._traits_changed()
                 return trait.name
 
         raise errors.TraitNotFound(self, name)
@@ -497,8 +615,8 @@ class VChar(Document):
         action: Callable,
     ) -> tuple[VCharTrait, list[str]]:
         """The actual work of adding subtraits."""
-        for trait in self.raw_traits:
-            if trait.matching(trait_name, True):
+        for trait in self._trait_candidates(trait_name, True):
+            if not trait.is_inherent and trait.matching(trait_name, True):
                 before = set(trait.specialties)
                 action(trait, specialties)
                 after = set(trait.specialties)
@@ -512,8 +630,8 @@ class VChar(Document):
         self, trait_name: str, specialties: list[str] | str
     ) -> tuple[VCharTrait, list[str]]:
         """Remove specialties from a trait."""
-        for trait in self.raw_traits:
-            if trait.matching(trait_name, True):
+        for trait in self._trait_candidates(trait_name, True):
+            if not trait.is_inherent and trait.matching(trait_name, True):
                 before = set(trait.specialties)
                 trait.remove_specialties(specialties)
                 after = set(trait.specialties)
@@ -758,3 +876,27 @@ class VChar(Document):
                 self.stat_log[key] += delta
             else:
                 self.stat_log[key] = delta
+
+
+class TraitsView(Sequence[VCharTrait]):
+    """A read-only view of a character's traits. Each trait is copied only
+    when accessed, so changes to it won't affect the character."""
+
+    def __init__(self, traits: list[VCharTrait]):
+        self._traits = traits
+
+    def __len__(self) -> int:
+        return len(self._traits)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [trait.model_copy(deep=True) for trait in self._traits[index]]
+        return self._traits[index].model_copy(deep=True)
+
+    def __add__(self, other: Sequence[VCharTrait]) -> list[VCharTrait]:
+        return list(self) + list(other)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TraitsView):
+            return self._traits == other._traits
+        return list(self) == other
@@ -186,7 +186,7 @@ class VCharTrait(BaseModel):
             # that to match our input for testing exactness
             tokens = identifier.split(VCharTrait.DELIMITER)
             tokens = [tokens[0]] + sorted(tokens[1:])
-            normalized = VCharTrait.DELIMITER.join(tokens).lower()
+            normalized = VCharTrait.DELIMITER.join(tokens).casefold()
 
             for expanded in groups:
                 full_name = self.name
@@ -203,7 +203,7 @@ class VCharTrait(BaseModel):
                     SN(
                         name=full_name,
                         rating=rating,
-                        exact=normalized == key.lower(),
+                        exact=normalized == key.casefold(),
                         key=key,
                         type=self.type,
                         discipline=self.is_discipline,
@@ -235,17 +235,17 @@ class VCharTrait(BaseModel):
         Returns:
             Empty list on no match. Otherwise, all matching expansions.
         """
-        tokens = [token.lower() for token in identifier.split(VCharTrait.DELIMITER)]
+        tokens = [token.casefold() for token in identifier.split(VCharTrait.DELIMITER)]
 
         # The comparison function takes a token and an instance var
         if exact:
 
             def comp(t: str, i: str) -> bool:
-                return t == i.lower()
+                return t == i.casefold()
         else:
 
             def comp(t: str, i: str) -> bool:
-                return i.lower().startswith(t)
+                return i.casefold().startswith(t)
 
         if comp(tokens[0], self.name):
             # A token might match multiple specs in the same skill. Therefore,
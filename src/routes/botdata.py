@@ -0,0 +1,274 @@
+"""Data the web routes need from the bot process.
+
+Characters, the guild cache, wizards, and Discord itself live in the bot.
+Each function here is bridged, so when the API runs in separate worker
+processes, it runs in the bot and only its result crosses over."""
+
+import hashlib
+import secrets
+from typing import Any
+
+import discord
+from beanie import PydanticObjectId
+from loguru import logger
+
+import inconnu
+import services
+from config import settings
+from models import VChar
+from routes.characters.models import OwnerData
+from services.bridge import bridged
+from services.wizard import CharacterGuild, WizardData
+from utils.discord_helpers import get_avatar
+
+# Characters
+
+
+@bridged
+async def character(oid: PydanticObjectId) -> VChar | None:
+    """Fetch a character by ID."""
+    return await services.char_mgr.fetchid(oid)
+
+
+@bridged
+async def user_roster(user_id: int) -> list[str]:
+    """The IDs of the user's characters. Full characters can be large, so
+    they're fetched a page at a time, with user_character_page()."""
+    return [char.id_str for char in await services.char_mgr.fetchuser(user_id)]
+
+
+@bridged
+async def user_character_page(user_id: int, ids: list[str]) -> list[VChar]:
+    """The user's characters with the given IDs. Characters that have since
+    been deleted or transferred are skipped."""
+    owned = {char.id_str: char for char in await services.char_mgr.fetchuser(user_id)}
+    return [owned[oid] for oid in ids if oid in owned]
+
+
+@bridged
+async def guild_roster(guild_id: int) -> list[str]:
+    """The IDs of the guild's characters, in roster order. Rosters are built
+    from this snapshot a page at a time, with guild_profile_page(), so that
+    characters added or removed meanwhile can't shift the pages."""
+    return [char.id_str for char in await services.char_mgr.fetchguild(guild_id)]
+
+
+@bridged
+async def guild_profile_page(guild_id: int, ids: list[str]) -> list[dict[str, Any]]:
+    """Profile documents for the guild's characters with the given IDs.
+    Characters that have since left the guild or been deleted are skipped,
+    as are those whose owners have left."""
+    chars = []
+    for oid in ids:
+        char = await services.char_mgr.fetchid(oid)
+        if char is not None and char.guild == guild_id:
+            chars.append(char)
+    return _profile_docs(chars)
+
+
+def _profile_docs(chars: list[VChar]) -> list[dict[str, Any]]:
+    """The public fields of the characters whose owners haven't left, plus
+    whether each is an SPC. Only the fields are copied here; the API builds
+    the profiles, so that large rosters don't tie up the bot's loop."""
+    return [
+        {
+            "id": char.id_str,
+            "user": str(char.user),
+            "name": char.raw_name,
+            "splat": char.splat,
+            "profile": char.profile.model_dump(),
+            "spc": char.is_spc,
+        }
+        for char in chars
+        if char.stat_log.get("left") is None
+    ]
+
+
+@bridged
+async def register(character: VChar) -> VChar:
+    """Register a new character, returning it as saved."""
+    await services.char_mgr.register(character)
+    return character
+
+
+# Guilds and members
+
+
+@bridged
+async def cache_ready() -> bool:
+    """Whether the guild cache is ready to serve."""
+    return await services.guild_cache.ready()
+
+
+@bridged
+async def guild(guild_id: int) -> CharacterGuild | None:
+    """Fetch a cached guild."""
+    cached = await services.guild_cache.fetchguild(guild_id, members=False)
+    return CharacterGuild.create(cached) if cached is not None else None
+
+
+@bridged
+async def character_guild(guild_id: int) -> CharacterGuild:
+    """Fetch a character's guild, or placeholder data if it's unknown."""
+    return await CharacterGuild.fetch(guild_id)
+
+
+@bridged
+async def user_guilds(user_id: int) -> list[CharacterGuild]:
+    """Fetch the guilds a user belongs to, with their character counts."""
+    guilds = await services.guild_cache.fetchguilds(user_id)
+    counts = await services.char_mgr.countguilds(guild.id for guild in guilds)
+    return [CharacterGuild.create(guild, counts[guild.id]) for guild in guilds]
+
+
+@bridged
+async def is_member(guild_id: int, user_id: int) -> bool:
+    """Whether the user belongs to the guild."""
+    return await services.guild_cache.fetchmember(guild_id, user_id) is not None
+
+
+@bridged
+async def is_admin(guild_id: int, user_id: int) -> bool:
+    """Whether the user is an admin on the guild. Needs Discord's role data."""
+    discord_guild = inconnu.bot.get_guild(guild_id)
+    member = discord_guild.get_member(user_id) if discord_guild else None
+    return member is not None and services.char_mgr.is_admin(member)
+
+
+@bridged
+async def owner(guild_id: int, user_id: int) -> OwnerData | None:
+    """Fetch a character owner's data."""
+    return await OwnerData.fetch(guild_id, user_id)
+
+
+@bridged
+async def owners(guild_id: int, user_ids: list[int]) -> dict[int, OwnerData]:
+    """Fetch many character owners' data, keyed by user ID."""
+    return await OwnerData.fetch_many(guild_id, user_ids)
+
+
+# Wizards
+
+
+@bridged
+async def wizard(token: str) -> WizardData | None:
+    """Fetch a character wizard."""
+    return services.wizard_cache.get(token)
+
+
+@bridged
+async def delete_wizard(token: str) -> None:
+    """Delete a finished character wizard."""
+    services.wizard_cache.delete(token)
+
+
+@bridged
+async def has_premium(user_id: int) -> bool:
+    """Whether the user is a supporter. We can't use is_supporter(), because
+    that function requires an AppCtx, which we don't have."""
+    supporter_guild = await inconnu.bot.get_or_fetch_guild(settings.supporter_guild)
+    if supporter_guild is None:
+        logger.warning("Supporter guild not found")
+        return False
+
+    user = await supporter_guild.get_or_fetch(discord.Member, user_id)
+    return user is not None and user.get_role(settings.supporter_role) is not None
+
+
+# Roleposts
+
+
+@bridged
+async def rolepost_origin(
+    guild_id: int, channel_id: int, user_id: int
+) -> tuple[CharacterGuild | None, str | None, OwnerData | None]:
+    """The guild, channel name, and poster of a rolepost. Whatever follows
+    a missing guild or channel is None, as is the poster if they've left."""
+    discord_guild = await inconnu.bot.get_or_fetch_guild(guild_id)
+    if discord_guild is None:
+        return None, None, None
+
+    guild = CharacterGuild.create(discord_guild)
+    channel = await discord_guild.get_or_fetch(discord.TextChannel, channel_id)
+    if channel is None:
+        return guild, None, None
+
+    if (user := discord_guild.get_member(user_id)) is not None:
+        poster = OwnerData(id=str(user.id), name=user.display_name, icon=get_avatar(user).url)
+    else:
+        poster = None
+
+    return guild, channel.name, poster
+
+
+# Response tags
+#
+# A tag changes whenever the response it stands for would. Guild cache and
+# roster revisions restart with the bot, so tags include the process's epoch.
+
+_EPOCH = secrets.token_hex(4)
+
+
+def _tag(*parts) -> str:
+    """A short, opaque tag for the given parts."""
+    return hashlib.blake2b(repr((_EPOCH, parts)).encode(), digest_size=12).hexdigest()
+
+
+def _guild_revisions(guild_id: int) -> tuple[int, int, int]:
+    """The guild's ID and its cache and roster revisions."""
+    gc_revision = services.guild_cache.revision(guild_id)
+    return guild_id, gc_revision, services.char_mgr.roster_revision(guild_id)
+
+
+def _revisions(chars: list[VChar]) -> list[tuple[str, int]]:
+    """The characters' IDs and revisions."""
+    return [(char.id_str, char.revision) for char in chars]
+
+
+@bridged
+async def characters_tag(user_id: int) -> str | None:
+    """The tag for a user's character list, or None if it can't be served."""
+    if not await services.guild_cache.ready():
+        return None
+
+    guilds = await services.guild_cache.fetchguilds(user_id)
+    chars = await services.char_mgr.fetchuser(user_id)
+    return _tag(
+        "characters",
+        user_id,
+        sorted(_guild_revisions(guild.id) for guild in guilds),
+        _revisions(chars),
+    )
+
+
+@bridged
+async def character_tag(oid: PydanticObjectId, user_id: int) -> str | None:
+    """The tag for a character as the user sees it, or None if the user
+    can't see it."""
+    if not await services.guild_cache.ready():
+        return None
+    if (char := await services.char_mgr.fetchid(oid)) is None:
+        return None
+    if await services.guild_cache.fetchmember(char.guild, user_id) is None:
+        return None
+
+    full = user_id == char.user or await is_admin(char.guild, user_id)
+    return _tag(
+        "character",
+        char.id_str,
+        char.revision,
+        services.guild_cache.revision(char.guild),
+        full,
+    )
+
+
+@bridged
+async def roster_tag(guild_id: int, user_id: int) -> str | None:
+    """The tag for a guild's roster, or None if the user can't see it."""
+    if not await services.guild_cache.ready():
+        return None
+    if await services.guild_cache.fetchmember(guild_id, user_id) is None:
+        return None
+
+    chars = await services.char_mgr.fetchguild(guild_id)
+    return _tag("roster", _guild_revisions(guild_id), _revisions(chars))
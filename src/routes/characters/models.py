@@ -1,5 +1,6 @@
 """Pydantic models for character API endpoints."""
 
+from collections.abc import Iterable
 from typing import Literal, Self
 
 from beanie import PydanticObjectId
@@ -42,6 +43,13 @@ class OwnerData(BaseModel):
 
         return cls.from_user(user)
 
+    @classmethod
+    async def fetch_many(cls, guild_id: int, user_ids: Iterable[int]) -> dict[int, Self]:
+        """Create CharacterOwner objects for many users at once, keyed by user
+        ID. Users not in the guild are left out."""
+        users = await guild_cache.fetchmembers_by_ids(guild_id, user_ids)
+        return {user_id: cls.from_user(user) for user_id, user in users.items()}
+
 
 class PublicCharacter(BaseModel):
     """Public character data without sensitive information, such as trait ratings."""
@@ -1,69 +1,78 @@
 """Character API routes."""
 
-import discord
+from collections.abc import AsyncIterator
+
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.exceptions import HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
-from loguru import logger
 
 import errors
-import inconnu
-from config import settings
 from constants import Damage
 from models import VChar
+from routes import botdata, conditional
 from routes.auth import get_authenticated_user, verify_api_key
 from routes.characters.models import (
     CharData,
     CreationBody,
     CreationSuccess,
     GuildChars,
-    OwnerData,
     PublicCharacter,
     UserCharData,
     WizardSchema,
 )
-from services import char_mgr, guild_cache, wizard_cache
 from services.wizard import CharacterGuild
 
 router = APIRouter()
 
+# Characters fetched from the bot at a time when building a roster
+ROSTER_PAGE_SIZE = 100
+# Full characters fetched from the bot at a time
+CHARACTER_PAGE_SIZE = 20
+
 
 # Getters
 
 
-@router.get("/characters")
+@router.get("/characters", response_model=UserCharData)
 async def get_character_list(
+    request: Request,
     user_id: int = Depends(get_authenticated_user),
-) -> UserCharData:
+) -> Response:
     """Get all of the user's characters and the guilds they belong to."""
-    if not await guild_cache.ready():
-        raise HTTPException(503, detail="Bot is still starting up")
+    tag = await botdata.characters_tag(user_id)
+    return await conditional.respond(request, tag, lambda: _character_list(user_id))
 
-    user_guilds = await guild_cache.fetchguilds(user_id)
 
-    guilds = {}
-    for guild in user_guilds:
-        char_count = await char_mgr.countguild(guild.id)
-        guilds[guild.id] = CharacterGuild.create(guild, char_count)
+async def _character_list(user_id: int) -> UserCharData:
+    """Build the user's character list."""
+    if not await botdata.cache_ready():
+        raise HTTPException(503, detail="Bot is still starting up")
+
+    guilds = {int(guild.id): guild for guild in await botdata.user_guilds(user_id)}
 
     chars = []
-    for char in await char_mgr.fetchuser(user_id):
-        if char.stat_log.get("left") is not None:
-            continue
-        if char.guild in guilds:
-            guild = guilds[char.guild]
-            authed = CharData(guild=guild, owner=None, character=char, spc=char.is_spc)
-            chars.append(authed)
+    ids = await botdata.user_roster(user_id)
+    for start in range(0, len(ids), CHARACTER_PAGE_SIZE):
+        page = await botdata.user_character_page(user_id, ids[start : start + CHARACTER_PAGE_SIZE])
+        for char in page:
+            if char.stat_log.get("left") is not None:
+                continue
+            if char.guild in guilds:
+                guild = guilds[char.guild]
+                authed = CharData(guild=guild, owner=None, character=char, spc=char.is_spc)
+                chars.append(authed)
 
     return UserCharData(guilds=list(guilds.values()), characters=chars)
 
 
-@router.get("/characters/{oid}")
+@router.get("/characters/{oid}", response_model=CharData)
 async def get_character(
+    request: Request,
     oid: PydanticObjectId,
     user_id: int = Depends(get_authenticated_user),
-) -> CharData:
+) -> Response:
     """Fetch a character.
 
     Args:
@@ -77,29 +86,30 @@ async def get_character(
 
     The CharData also contains guild and owner information. If the
     character is an SPC, then owner information is not returned."""
-    if not await guild_cache.ready():
+    tag = await botdata.character_tag(oid, user_id)
+    return await conditional.respond(request, tag, lambda: _character(oid, user_id))
+
+
+async def _character(oid: PydanticObjectId, user_id: int) -> CharData:
+    """Build the character as the user may see it."""
+    if not await botdata.cache_ready():
         raise HTTPException(503, detail="Bot is still starting up")
 
-    char = await char_mgr.fetchid(oid)
+    char = await botdata.character(oid)
     if char is None:
         raise HTTPException(404, detail="Character not found")
 
     # Get cached guild (primary data source for web routes)
-    guild = await guild_cache.fetchguild(char.guild)
+    guild = await botdata.guild(char.guild)
     if guild is None:
         raise HTTPException(404, detail="Guild not found")
 
     # Verify user is a member
-    cached_user = await guild_cache.fetchmember(char.guild, user_id)
-    if cached_user is None:
+    if not await botdata.is_member(char.guild, user_id):
         raise HTTPException(404, detail="User not in character's guild")
 
-    # For admin check, need Discord member (has role data)
-    discord_guild = inconnu.bot.get_guild(char.guild)
-    discord_member = discord_guild.get_member(user_id) if discord_guild else None
-
-    # Permission check (requires Discord member for role checking)
-    if user_id == char.user or (discord_member and char_mgr.is_admin(discord_member)):
+    # Permission check (the admin check needs Discord's role data)
+    if user_id == char.user or await botdata.is_admin(char.guild, user_id):
         character = char
     else:
         character = PublicCharacter.create(char)
@@ -107,59 +117,111 @@ async def get_character(
     if char.is_spc:
         owner_data = None
     else:
-        owner_data = await OwnerData.fetch(char.guild, char.user)
+        owner_data = await botdata.owner(char.guild, char.user)
 
     return CharData(
-        guild=CharacterGuild.create(guild),
+        guild=guild,
         owner=owner_data,
         character=character,
         spc=char.is_spc,
     )
 
 
-@router.get("/characters/guild/{guild_id}")
+@router.get("/characters/guild/{guild_id}", response_model=GuildChars)
 async def get_guild_characters(
+    request: Request,
     guild_id: int,
     user_id: int = Depends(get_authenticated_user),
-) -> GuildChars:
+) -> Response:
     """Get all character base profiles belonging to the guild. Excludes
     characters whose owners have left the server."""
-    if not await guild_cache.ready():
+    tag = await botdata.roster_tag(guild_id, user_id)
+    return await conditional.respond(request, tag, lambda: _roster(guild_id, user_id))
+
+
+async def _roster(guild_id: int, user_id: int) -> GuildChars:
+    """Build the guild's roster."""
+    char_guild = await _roster_guild(guild_id, user_id)
+    entries = []
+    async for chars in _profile_pages(guild_id):
+        entries.extend(await _roster_entries(guild_id, char_guild, chars))
+    return GuildChars(guild=char_guild, characters=entries)
+
+
+@router.get("/characters/guild/{guild_id}/stream")
+async def stream_guild_characters(
+    guild_id: int,
+    user_id: int = Depends(get_authenticated_user),
+) -> StreamingResponse:
+    """Stream the guild's roster as NDJSON: one CharData per line, with the
+    same characters as get_guild_characters(). The roster is fetched and
+    sent a page at a time, so large guilds don't have to be held in memory
+    or wait to be fully built. Pages follow the roster as it was when the
+    stream began, so no character is sent twice or skipped for another's
+    arrival or removal."""
+    char_guild = await _roster_guild(guild_id, user_id)
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for chars in _profile_pages(guild_id):
+            for entry in await _roster_entries(guild_id, char_guild, chars):
+                yield entry.model_dump_json(by_alias=True).encode() + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def _roster_guild(guild_id: int, user_id: int) -> CharacterGuild:
+    """The guild whose roster is requested, if the user may see it."""
+    if not await botdata.cache_ready():
         raise HTTPException(503, detail="Bot is still starting up")
 
-    guild = await guild_cache.fetchguild(guild_id)
-    if guild is None:
+    char_guild = await botdata.guild(guild_id)
+    if char_guild is None:
         raise HTTPException(404, detail="Guild not found")
 
-    member = await guild_cache.fetchmember(guild_id, user_id)
-    if member is None:
+    if not await botdata.is_member(guild_id, user_id):
         raise HTTPException(403, detail="User does not belong to guild")
 
-    char_guild = CharacterGuild.create(guild)
-    profiles: list[CharData] = []
-    for char in await char_mgr.fetchguild(guild_id):
-        if char.stat_log.get("left") is not None:
-            continue
+    return char_guild
 
-        if char.is_spc:
+
+async def _profile_pages(guild_id: int) -> AsyncIterator[list[tuple[PublicCharacter, bool]]]:
+    """The guild's public profiles, each with whether it's an SPC, a page at
+    a time. The pages follow a snapshot of the roster taken up front. The bot
+    only sends the profiles' fields; they're built here, so that large
+    rosters don't tie up the bot's loop."""
+    ids = await botdata.guild_roster(guild_id)
+    for start in range(0, len(ids), ROSTER_PAGE_SIZE):
+        docs = await botdata.guild_profile_page(guild_id, ids[start : start + ROSTER_PAGE_SIZE])
+        yield [(PublicCharacter.model_validate(doc), doc["spc"]) for doc in docs]
+
+
+async def _roster_entries(
+    guild_id: int, char_guild: CharacterGuild, chars: list[tuple[PublicCharacter, bool]]
+) -> list[CharData]:
+    """Roster entries for the profiles, leaving out characters whose owners
+    can't be found."""
+    owners = await botdata.owners(guild_id, [int(char.user) for char, spc in chars if not spc])
+
+    profiles: list[CharData] = []
+    for char, spc in chars:
+        if spc:
             owner_data = None
         else:
-            owner_data = await OwnerData.fetch(char.guild, char.user)
+            owner_data = owners.get(int(char.user))
             if owner_data is None:
                 # We couldn't find them; maybe Discord is throwing a fit.
                 # Without owner data, however, we won't return this character.
                 continue
 
-        base_profile = PublicCharacter.create(char)
         guild_profile = CharData(
             guild=char_guild,
             owner=owner_data,
-            character=base_profile,
-            spc=char.is_spc,
+            character=char,
+            spc=spc,
         )
         profiles.append(guild_profile)
 
-    return GuildChars(guild=char_guild, characters=profiles)
+    return profiles
 
 
 @router.get("/characters/profile/{oid}")
@@ -169,18 +231,18 @@ async def get_character_profile(
 ) -> CharData:
     """Fetch a character profile. This endpoint returns a non-sensitive character
     model with only name, ownership data, and public profile data."""
-    if not await guild_cache.ready():
+    if not await botdata.cache_ready():
         raise HTTPException(503, detail="Bot is still starting up")
 
-    char = await char_mgr.fetchid(oid)
+    char = await botdata.character(oid)
     if char is None:
         raise HTTPException(404, detail="Character not found")
 
-    guild = await CharacterGuild.fetch(char.guild)
+    guild = await botdata.character_guild(char.guild)
     if char.is_spc:
         owner = None
     else:
-        owner = await OwnerData.fetch(char.guild, char.user)
+        owner = await botdata.owner(char.guild, char.user)
 
     return CharData(
         guild=guild,
@@ -199,7 +261,7 @@ async def get_wizard(
     _: HTTPAuthorizationCredentials = Depends(verify_api_key),
 ) -> WizardSchema:
     """Get the character wizard schema."""
-    wizard = wizard_cache.get(token)
+    wizard = await botdata.wizard(token)
     if wizard is None:
         raise HTTPException(404, detail="Unknown token. It may have expired.")
 
@@ -216,7 +278,7 @@ async def create_character(
     _: HTTPAuthorizationCredentials = Depends(verify_api_key),
 ) -> CreationSuccess:
     """Create the character and insert it into the database."""
-    wizard = wizard_cache.get(token)
+    wizard = await botdata.wizard(token)
     if wizard is None:
         raise HTTPException(404, detail="Unknown token. It may have expired.")
     # We need to sort the traits before setting them
@@ -239,27 +301,15 @@ async def create_character(
     character.convictions = data.convictions
 
     try:
-        await char_mgr.register(character)
+        character = await botdata.register(character)
     except errors.DuplicateCharacterError as err:
         raise HTTPException(422, detail=str(err)) from err
 
-    wizard_cache.delete(token)
-
-    # Figure out if the user has premium. We can't use is_supporter(), because
-    # that function requires an AppCtx, which we don't have. (Good candidate
-    # for a future refactor ...)
-    premium = False
-    guild = await inconnu.bot.get_or_fetch_guild(settings.supporter_guild)
-    if guild is not None:
-        user = await guild.get_or_fetch(discord.Member, wizard.user)
-        if user is not None and user.get_role(settings.supporter_role) is not None:
-            premium = True
-    else:
-        logger.warning("Supporter guild not found")
+    await botdata.delete_wizard(token)
 
     return CreationSuccess(
         guild=wizard.guild,
         character_id=character.id_str,
         character_name=character.name,
-        has_premium=premium,
+        has_premium=await botdata.has_premium(wizard.user),
     )
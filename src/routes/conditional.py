@@ -0,0 +1,59 @@
+"""Conditional GET responses for polled routes.
+
+Routes get a tag from the bot that changes whenever their response would.
+The tag is sent as a strong ETag; a client that already has it gets a 304
+without the response being built, and recently built bodies are reused
+for everyone whose request has the same tag."""
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+# Serialized bodies kept, across all routes
+MEMO_SIZE = 256
+
+_bodies: OrderedDict[str, bytes] = OrderedDict()
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match includes the ETag. Per RFC 9110,
+    the comparison is weak, so W/ prefixes are ignored."""
+    header = request.headers.get("If-None-Match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+async def respond(
+    request: Request,
+    tag: str | None,
+    build: Callable[[], Awaitable[BaseModel]],
+) -> Response:
+    """Respond to a GET. If there's no tag, the response is built as usual;
+    build() raises for requests that can't be served."""
+    if tag is None:
+        return _json(await build())
+
+    etag = f'"{tag}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if (body := _bodies.get(etag)) is not None:
+        _bodies.move_to_end(etag)
+    else:
+        body = (await build()).model_dump_json(by_alias=True).encode()
+        _bodies[etag] = body
+        if len(_bodies) > MEMO_SIZE:
+            _bodies.popitem(last=False)
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _json(model: BaseModel) -> Response:
+    """A plain JSON response."""
+    return Response(model.model_dump_json(by_alias=True), media_type="application/json")
@@ -2,20 +2,18 @@
 
 from datetime import datetime
 
-import discord
 from beanie import PydanticObjectId
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import AnyUrl, BaseModel
 
-import inconnu
 from models import RPPost
 from models.rppost import PostHistoryEntry
+from routes import botdata
 from routes.auth import verify_api_key
 from routes.characters.models import OwnerData
 from services.wizard import CharacterGuild
-from utils.discord_helpers import get_avatar
 
 router = APIRouter()
 
@@ -48,24 +46,14 @@ async def get_rolepost(
     if rolepost is None:
         raise HTTPException(404, detail="Rolepost not found")
 
-    guild = await inconnu.bot.get_or_fetch_guild(rolepost.guild)
+    guild, channel, owner_data = await botdata.rolepost_origin(
+        rolepost.guild, rolepost.channel, rolepost.user
+    )
     if guild is None:
         raise HTTPException(410, detail="Inconnu is not in this guild.")
-
-    channel = await guild.get_or_fetch(discord.TextChannel, rolepost.channel)
     if channel is None:
         raise HTTPException(410, detail="This post's channel was deleted.")
 
-    user = guild.get_member(rolepost.user)
-    if user is not None:
-        owner_data = OwnerData(
-            id=str(user.id),
-            name=user.display_name,
-            icon=get_avatar(user).url,
-        )
-    else:
-        owner_data = None
-
     char_data = CharData(id=rolepost.header.charid, name=rolepost.header.char_name)
 
     # The RPPost's history doesn't contain the current content
@@ -76,9 +64,9 @@ async def get_rolepost(
     history = [current] + rolepost.history
 
     return Changelog(
-        guild=CharacterGuild.create(guild),
+        guild=guild,
         poster=owner_data,
-        channel=channel.name,
+        channel=channel,
         character=char_data,
         url=rolepost.url,
         history=history,
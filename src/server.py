@@ -1,9 +1,31 @@
 """FastAPI server."""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+import db
+from config import configure_logging, settings
 from routes import characters, roleposts
+from services import bridge
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """In an API worker process, connect to the database and the bot. In the
+    bot's own loop, both are already there. The bot builds the indexes."""
+    if settings.web_worker:
+        await db.init(indexes=False)
+        await bridge.connect(settings.web_bridge)
+    yield
+    if settings.web_worker:
+        await bridge.disconnect()
+        await db.close()
+
+
+if settings.web_worker:
+    configure_logging()
 
-app = FastAPI(openapi_url=None)
+app = FastAPI(openapi_url=None, lifespan=lifespan)
 app.include_router(characters.router)
 app.include_router(roleposts.router)
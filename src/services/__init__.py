@@ -6,6 +6,9 @@ from services.emoji import emojis
 from services.guildcache import guild_cache
 from services.log import report_database_error
 from services.reporter import ErrorReporter, character_update
+from services.rolllog import roll_log
+from services.spool import spool
+from services.telemetry import telemetry
 from services.webhooks import WebhookCache
 
 wizard_cache = wizard.WizardCache()
@@ -19,7 +22,10 @@ __all__ = (
     "emojis",
     "guild_cache",
     "report_database_error",
+    "roll_log",
     "settings",
+    "spool",
+    "telemetry",
     "wizard",
     "wizard_cache",
 )
@@ -0,0 +1,144 @@
+"""services/batchwriter.py - Shared machinery for write-behind database writers."""
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+import pymongo
+from loguru import logger
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+if TYPE_CHECKING:
+    from services.spool import Spool
+
+# MongoDB's duplicate key error, raised when a document is inserted twice
+DUPLICATE_KEY = 11000
+
+
+def unavailable(err: PyMongoError) -> bool:
+    """Whether an error means the database is unreachable or too slow, rather
+    than that it rejected the write."""
+    return isinstance(err, ConnectionFailure) or err.timeout
+
+
+class BatchWriter:
+    """Queues database writes and sends them in batches, so that callers don't
+    wait on the database. Subclasses hold the queue and send the batches.
+
+    A batch is written once max_batch writes are waiting or interval seconds
+    after the first one arrived, whichever is sooner. If the database falls
+    behind, writes beyond max_pending are dropped and counted.
+
+    With a spool, a batch the database can't take within timeout seconds is
+    spooled and replayed later, so subclasses' writes must be idempotent.
+    Without one, it's counted as failed."""
+
+    label = "BATCH WRITER"  # Log prefix and spool name
+
+    def __init__(
+        self,
+        max_batch: int = 100,
+        interval: float = 2,
+        max_pending: int = 10_000,
+        timeout: float = 5,
+        spool: "Spool | None" = None,
+    ):
+        self.max_batch = max_batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.spool = spool
+        self.dropped = 0  # Writes dropped because too many were waiting
+        self.failed = 0  # Writes the database rejected or never received
+
+        if spool is not None:
+            spool.register(self.label, self)
+
+        self._batch_ready = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        """The number of writes waiting to be sent."""
+        raise NotImplementedError
+
+    async def flush(self):
+        """Write everything that's waiting."""
+        async with self._write_lock:
+            while self.pending:
+                await self._write_batch(self._take())
+
+    async def send(self, items: list[dict[str, Any]]):
+        """Send a batch of writes. Writes the database rejects are counted as
+        failed. Raises PyMongoError if the database is unavailable."""
+        try:
+            with pymongo.timeout(self.timeout):
+                await self._send(items)
+        except PyMongoError as err:
+            if unavailable(err):
+                raise
+            self.failed += len(items)
+            logger.exception("{}: Lost {} writes", self.label, len(items))
+
+    async def close(self):
+        """Write everything that's waiting and stop the background writer."""
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        logger.info("{}: Closed ({} dropped, {} failed)", self.label, self.dropped, self.failed)
+
+    def _take(self) -> list[dict[str, Any]]:
+        """Remove up to max_batch waiting writes. They must be BSON-encodable,
+        so that they can be spooled."""
+        raise NotImplementedError
+
+    async def _send(self, items: list[dict[str, Any]]):
+        """Write a batch to the database."""
+        raise NotImplementedError
+
+    async def _write_batch(self, items: list[dict[str, Any]]):
+        """Send a batch, or spool it if the database is unavailable. While
+        earlier batches are spooled, new ones join them to stay in order."""
+        spooling = self.spool is not None and self.spool.initialized
+        if spooling and self.spool.holding(self.label):
+            await self.spool.append(self.label, items)
+            return
+
+        try:
+            await self.send(items)
+        except PyMongoError:
+            if not spooling:
+                self.failed += len(items)
+                logger.exception("{}: Lost {} writes", self.label, len(items))
+                return
+
+            logger.warning("{}: Database unavailable; spooling {} writes", self.label, len(items))
+            await self.spool.append(self.label, items)
+
+    def _full(self) -> bool:
+        """Whether the queue is full. Counts the write as dropped if so."""
+        if self.pending < self.max_pending:
+            return False
+
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 1000 == 0:
+            logger.warning("{}: Queue full; {} writes dropped so far", self.label, self.dropped)
+        return True
+
+    def _schedule(self):
+        """Make sure the waiting writes will be sent."""
+        if self.pending >= self.max_batch:
+            self._batch_ready.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        """Write batches as they fill or time out, until nothing is waiting."""
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
@@ -0,0 +1,302 @@
+"""services/bridge.py - Local IPC between the bot and out-of-process web workers.
+
+Web workers don't hold characters or guilds; they call bridged functions,
+which run in the bot process. The bot serves them over a Unix socket with
+newline-delimited JSON. Outside a worker, bridged functions run locally."""
+
+import asyncio
+import functools
+import inspect
+import json
+import re
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any, get_type_hints
+
+import discord
+from loguru import logger
+from pydantic import TypeAdapter
+from pymongo.errors import PyMongoError
+
+import errors
+
+# The largest message either side accepts. Rosters and character lists
+# cross a page at a time, so they stay well under it.
+MESSAGE_LIMIT = 8 * 1024 * 1024
+
+# Responses are written with their ID first, so an oversized one can still be
+# matched to its call
+RESPONSE_ID = re.compile(rb'^\{"id": (\d+)')
+
+type Handler = Callable[..., Awaitable[Any]]
+
+
+class RemoteError(Exception):
+    """An error raised in the bot while serving a bridged call."""
+
+
+class ResponseTooLarge(RemoteError):
+    """A bridged call's response was over MESSAGE_LIMIT."""
+
+
+class Bridged:
+    """A bridged function and the adapters for its arguments and result."""
+
+    def __init__(self, func: Handler):
+        hints = get_type_hints(func)
+        params = inspect.signature(func).parameters
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.params = [TypeAdapter(hints.get(p, Any)) for p in params]
+        self.returns = TypeAdapter(hints.get("return", Any))
+
+    def dump_args(self, args: tuple) -> list:
+        return [a.dump_python(arg, mode="json") for a, arg in zip(self.params, args, strict=True)]
+
+    def load_args(self, args: list) -> list:
+        return [a.validate_python(arg) for a, arg in zip(self.params, args, strict=True)]
+
+
+_functions: dict[str, Bridged] = {}
+_client: "BridgeClient | None" = None
+
+
+def bridged[**P, R](func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """Serve an async function from the bot. In a connected web worker, calls
+    run in the bot and the result is copied back. Arguments and results
+    must be serializable by pydantic, and arguments are positional."""
+    bridged_func = Bridged(func)
+    _functions[bridged_func.name] = bridged_func
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        if _client is None:
+            return await func(*args, **kwargs)
+        result = await _client.call(bridged_func.name, bridged_func.dump_args(args))
+        return bridged_func.returns.validate_python(result)
+
+    return wrapper
+
+
+async def connect(path: str):
+    """Send bridged calls to the bot listening at path."""
+    global _client
+    client = BridgeClient(path)
+    await client.connect()
+    _client = client
+
+
+async def disconnect():
+    """Run bridged calls locally again."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _error(err: Exception) -> dict[str, str]:
+    """Describe an exception for the worker."""
+    return {"type": type(err).__name__, "message": str(err)}
+
+
+def _exception(error: dict[str, str]) -> Exception:
+    """Rebuild a bot-side exception. Inconnu errors keep their type so routes
+    can handle them as usual."""
+    cls = getattr(errors, error["type"], None)
+    if isinstance(cls, type) and issubclass(cls, errors.InconnuError):
+        try:
+            return cls(error["message"])
+        except TypeError:
+            pass
+    return RemoteError(f"{error['type']}: {error['message']}")
+
+
+class BridgeServer:
+    """Serves bridged functions to web workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        """Listen for workers."""
+        Path(self.path).unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, self.path, limit=MESSAGE_LIMIT)
+        logger.info("BRIDGE: Listening on {}", self.path)
+
+    async def close(self):
+        """Stop listening and drop the workers' connections."""
+        if self._server is not None:
+            self._server.close()
+            for writer in self._writers:
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        Path(self.path).unlink(missing_ok=True)
+        logger.info("BRIDGE: Closed {}", self.path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer a worker's calls concurrently, in whatever order they finish."""
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._answer(json.loads(line), writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _answer(request: dict[str, Any], writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        """Run one call and write its response. Errors the bot doesn't expect
+        from a call still propagate, after the worker is told it failed."""
+        method = request["method"]
+        response: dict[str, Any] = {"id": request["id"]}
+        try:
+            func = _functions[method]
+            result = await func.func(*func.load_args(request["args"]))
+            response["result"] = func.returns.dump_python(result, mode="json")
+        except errors.InconnuError as err:
+            response["error"] = _error(err)
+        except (LookupError, ValueError, PyMongoError, discord.DiscordException) as err:
+            # ValueError includes pydantic's ValidationError
+            logger.exception("BRIDGE: {} failed", method)
+            response["error"] = _error(err)
+        finally:
+            if not writer.is_closing():
+                # Otherwise the worker went away, and the call was cancelled
+                if "result" not in response:
+                    response.setdefault("error", _error(RemoteError(f"{method} failed")))
+                data = json.dumps(response).encode() + b"\n"
+                if len(data) > MESSAGE_LIMIT:
+                    logger.error("BRIDGE: {} returned {} bytes, over the limit", method, len(data))
+                    response = {
+                        "id": request["id"],
+                        "error": _error(ResponseTooLarge(f"{method}'s response is too large")),
+                    }
+                    data = json.dumps(response).encode() + b"\n"
+                async with lock:
+                    writer.write(data)
+                    await writer.drain()
+
+
+class BridgeClient:
+    """A worker's connection to the bot. Calls may be made concurrently. If
+    the connection is lost, the next call reconnects."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._listener: asyncio.Task | None = None
+        self._closed = False
+        self._connecting = asyncio.Lock()
+
+    async def connect(self):
+        """Connect to the bot."""
+        self._reader, self._writer = await asyncio.open_unix_connection(
+            self.path, limit=MESSAGE_LIMIT
+        )
+        self._listener = asyncio.create_task(self._listen())
+        logger.info("BRIDGE: Connected to {}", self.path)
+
+    async def close(self):
+        """Disconnect. Calls still waiting fail."""
+        self._closed = True
+        self._writer.close()
+        if self._listener is not None:
+            await self._listener
+
+    async def _reconnect(self):
+        """Connect again after the connection was lost. Concurrent calls
+        share one attempt."""
+        async with self._connecting:
+            if self._listener is not None and not self._listener.done():
+                return
+            logger.warning("BRIDGE: Reconnecting to {}", self.path)
+            try:
+                await self.connect()
+            except OSError as err:
+                raise ConnectionError("Can't reach the bot") from err
+
+    async def call(self, method: str, args: list) -> Any:
+        """Call a bridged function in the bot and return its JSON result."""
+        if self._listener is None or self._closed:
+            raise ConnectionError("Not connected to the bot")
+        if self._listener.done():
+            await self._reconnect()
+
+        self._next_id += 1
+        call_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            request = {"id": call_id, "method": method, "args": args}
+            self._writer.write(json.dumps(request).encode() + b"\n")
+            await self._writer.drain()
+            response = await future
+        finally:
+            del self._pending[call_id]
+
+        if "error" in response:
+            raise _exception(response["error"])
+        return response["result"]
+
+    async def _listen(self):
+        """Hand responses to their callers."""
+        try:
+            while line := await self._readline():
+                response = json.loads(line)
+                self._answer(response["id"], response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost the connection to the bot"))
+
+    async def _readline(self) -> bytes:
+        """Read a response. One over MESSAGE_LIMIT is skipped, and only its
+        call fails. Returns an empty line once the bot hangs up."""
+        while True:
+            try:
+                return await self._reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError:
+                return b""
+            except asyncio.LimitOverrunError as err:
+                head = await self._reader.readexactly(err.consumed)
+                await self._skip_line()
+
+            logger.error("BRIDGE: Skipped a response over {} bytes", MESSAGE_LIMIT)
+            if match := RESPONSE_ID.match(head):
+                self._answer(
+                    int(match[1]), ResponseTooLarge(f"The response was over {MESSAGE_LIMIT} bytes")
+                )
+
+    async def _skip_line(self):
+        """Discard the rest of an oversized line."""
+        while True:
+            try:
+                await self._reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as err:
+                await self._reader.readexactly(err.consumed)
+
+    def _answer(self, call_id: int, response: dict[str, Any] | Exception):
+        """Resolve a waiting call with its response or an error."""
+        future = self._pending.get(call_id)
+        if future is None or future.done():
+            return
+        if isinstance(response, Exception):
+            future.set_exception(response)
+        else:
+            future.set_result(response)
@@ -2,52 +2,235 @@
 
 import asyncio
 import bisect
-from datetime import UTC, datetime
+import functools
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncIterator, Callable, Hashable, Iterable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
 
 import discord
 from beanie import PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+from beanie.odm.utils.parsing import parse_obj
 from bson import ObjectId
 from loguru import logger
+from pydantic import ValidationError
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 import errors
+from config import settings
 from models.vchar import VChar
+from services import snapshot
 from utils.text import clean_text, pluralize
 
 
+class StripedLock:
+    """A fixed table of locks. Keys hash onto the table, so unrelated keys
+    rarely wait on each other while memory stays bounded."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+        self.contention = 0  # How many acquisitions had to wait
+
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable) -> AsyncIterator[None]:
+        """Hold the locks for every key. Locks are always taken in table order,
+        so holders of overlapping keys can't deadlock."""
+        stripes = sorted({hash(key) % len(self._locks) for key in keys})
+        acquired = []
+        try:
+            for stripe in stripes:
+                lock = self._locks[stripe]
+                if lock.locked():
+                    self.contention += 1
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
 class CharacterManager:
-    """A class for maintaining a local copy of characters."""
+    """A class for maintaining a local copy of characters.
+
+    Besides the master list, characters are indexed by (guild, user), guild,
+    and user. Every list is kept sorted by name, so lookups cost the size of
+    the result rather than the number of characters.
+
+    With a cache limit, characters are instead loaded one guild at a time on
+    first access, and the least recently used guilds are dropped once more
+    than cache_limit characters are held. A limit of 0 loads everything at
+    startup.
+
+    With a snapshot path, the eager cache is written there periodically and
+    on shutdown, and startup loads it and fetches only the characters that
+    have changed since.
 
-    def __init__(self):
+    With a write delay, save() is write-behind: a character's saves within
+    the delay are coalesced into a single write. Use flush() when a write
+    must be confirmed."""
+
+    # Documents modified this long before the snapshot watermark are refetched
+    # too, in case the bot's and another writer's clocks disagree
+    SNAPSHOT_SKEW = timedelta(minutes=5)
+
+    def __init__(self, cache_limit: int = 0, snapshot_path: str = "", write_delay: float = 0):
         self._characters: list[VChar] = []
         self._id_cache: dict[str, VChar] = {}
+        self._by_owner: defaultdict[tuple[int, int], list[VChar]] = defaultdict(list)
+        self._by_guild: defaultdict[int, list[VChar]] = defaultdict(list)
+        self._by_user: defaultdict[int, list[VChar]] = defaultdict(list)
         self._initialized = False
-        self._lock = asyncio.Lock()
+
+        # Writes lock the characters' owners, and lazy loads lock the guild
+        self._owner_locks = StripedLock()
+        self._guild_locks = StripedLock()
+
+        # Lazy loading: the loaded guilds, least recently used first
+        self._cache_limit = cache_limit
+        self._loaded: OrderedDict[int, None] = OrderedDict()
+
+        self._snapshot_path = snapshot_path
+
+        # Write-behind: characters waiting to be saved, keyed by ID
+        self._write_delay = write_delay
+        self._pending: dict[str, tuple[VChar, asyncio.Task]] = {}
+
+        # Each guild's roster revision is the clock reading at the last time
+        # a character joined or left its roster
+        self._roster_clock = 0
+        self._rosters: dict[int, int] = {}
 
     @property
     def initialized(self) -> bool:
         """Whether the bot has been initialized."""
         return self._initialized
 
+    @property
+    def lock_contention(self) -> int:
+        """How many times a lock had to be waited on."""
+        return self._owner_locks.contention + self._guild_locks.contention
+
+    @property
+    def lazy(self) -> bool:
+        """Whether characters are loaded per guild on demand."""
+        return self._cache_limit > 0
+
     async def initialize(self):
         """Load the characters from the database."""
         if not self._initialized:
-            self._characters = await VChar.find_all().to_list()
-            self._characters.sort()
+            if self.lazy:
+                self._initialized = True
+                logger.info("Initialized lazily with a limit of {} characters", self._cache_limit)
+                return
+
+            chars = await self._read_snapshot() if self._snapshot_path else None
+            if chars is None:
+                chars = await VChar.find_all().to_list()
+
+            self._characters = sorted(chars)
             self._id_cache = {char.id_str: char for char in self._characters}
+            self._build_indexes()
             self._initialized = True
 
             logger.info("Initialized with {} characters", len(self._characters))
 
+    async def _read_snapshot(self) -> list[VChar] | None:
+        """Load the snapshot and bring it up to date with the database."""
+        loaded = await asyncio.to_thread(snapshot.read, self._snapshot_path)
+        if loaded is None:
+            return None
+        watermark, docs = loaded
+
+        changed = await VChar.find(
+            {"log.modified": {"$gte": watermark - self.SNAPSHOT_SKEW}}
+        ).to_list()
+        live = set(await VChar.distinct("_id"))
+
+        # Anything the snapshot lacks that isn't marked as changed (e.g. it was
+        # inserted outside the bot) is fetched as well
+        stale = {char.id for char in changed}
+        snapshotted = {doc["_id"] for doc in docs}
+        if missing := live - stale - snapshotted:
+            changed.extend(await VChar.find({"_id": {"$in": list(missing)}}).to_list())
+
+        fresh = live - stale
+        chars = [parse_obj(VChar, doc) for doc in docs if doc["_id"] in fresh]
+        logger.info(
+            "Loaded {} characters from the snapshot, fetched {}, and dropped {} deleted",
+            len(chars),
+            len(changed),
+            len(snapshotted - live),
+        )
+        return chars + changed  # type: ignore[operator]
+
+    async def write_snapshot(self):
+        """Write the character cache to the snapshot file. Does nothing if
+        there's no snapshot path or the cache is lazy."""
+        if not self._snapshot_path or self.lazy or not self._initialized:
+            return
+
+        # Characters saved while we work are newer than the watermark, so
+        # they'll be refetched on load
+        watermark = datetime.now(UTC)
+        docs = []
+        for i, char in enumerate(list(self._characters)):
+            docs.append(get_dict(char, to_db=True))
+            if i % 1000 == 999:
+                await asyncio.sleep(0)
+
+        await asyncio.to_thread(snapshot.write, self._snapshot_path, watermark, docs)
+
+    async def save(self, character: VChar):
+        """Save the character, or schedule a save if writes are delayed."""
+        if self._write_delay <= 0:
+            await character.save()
+        elif character.id_str not in self._pending:
+            task = asyncio.create_task(self._save_later(character))
+            self._pending[character.id_str] = (character, task)
+
+    async def flush(self, character: VChar | None = None):
+        """Write a character's pending changes now. Without a character, all
+        pending writes are flushed."""
+        if character is None:
+            keys = list(self._pending)
+        elif character.id_str in self._pending:
+            keys = [character.id_str]
+        else:
+            keys = []
+
+        chars = []
+        for key in keys:
+            char, task = self._pending.pop(key)
+            task.cancel()
+            chars.append(char)
+
+        if chars:
+            await asyncio.gather(*(char.save() for char in chars))
+        elif character is not None:
+            # It may have unsaved changes without having been queued
+            await character.save()
+
+    async def _save_later(self, character: VChar):
+        """Save the character once the write delay elapses."""
+        await asyncio.sleep(self._write_delay)
+
+        # Leave the queue first, so changes made during the write get queued
+        del self._pending[character.id_str]
+        try:
+            await character.save()
+        except (PyMongoError, ValidationError):
+            logger.exception("Delayed save of {} failed", character.name)
+
     async def fetchall(self, guild: discord.Guild | int, user: discord.Member | int) -> list[VChar]:
         """Fetch all characters. Parameters given act as a filter."""
-        await self.initialize()
-
         guild_id = guild.id if isinstance(guild, discord.Guild) else guild
         user_id = user.id if isinstance(user, discord.Member) else user
+        await self._load_guild(guild_id)
 
-        return [
-            char for char in self._characters if char.guild == guild_id and char.user == user_id
-        ]
+        return list(self._by_owner.get((guild_id, user_id), ()))
 
     async def fetchone(
         self,
@@ -77,7 +260,7 @@ class CharacterManager:
             name = name.strip()
 
         if name and ObjectId.is_valid(name):
-            if char := self._id_cache.get(name):
+            if char := await self.fetchid(name):
                 self._validate(guild, user, char)
                 return char
 
@@ -107,27 +290,82 @@ class CharacterManager:
     async def fetchid(self, oid: PydanticObjectId | str) -> VChar | None:
         """Fetch the character by ID, if it exists."""
         await self.initialize()
-        return self._id_cache.get(str(oid))
+        if char := self._id_cache.get(str(oid)):
+            return char
+        if not self.lazy:
+            return None
+
+        # Its guild may not be loaded yet; the document tells us which it is
+        if (char := await VChar.get(oid)) is None:
+            return None
+        await self._load_guild(char.guild)
+        return self._id_cache.get(str(oid), char)
 
     async def fetchuser(self, user: int) -> list[VChar]:
         """Fetch all the user's characters."""
         await self.initialize()
-        return [c for c in self._characters if c.user == user]
+        if not self.lazy:
+            return list(self._by_user.get(user, ()))
+
+        # Take each guild's characters as it loads, in case loading the next
+        # one evicts it
+        chars = []
+        for guild_id in await VChar.distinct("guild", {"user": user}):
+            await self._load_guild(guild_id)
+            chars.extend(self._by_owner.get((guild_id, user), ()))
+        return sorted(chars)
 
     async def fetchguild(self, guild: int) -> list[VChar]:
-        """Fetch all the user's characters."""
-        await self.initialize()
-        return [c for c in self._characters if c.guild == guild]
+        """Fetch all the guild's characters."""
+        await self._load_guild(guild)
+        return list(self._by_guild.get(guild, ()))
 
     async def character_count(self, guild: discord.Guild, user: discord.Member) -> int:
         """Get a count of the user's characters in the server."""
-        chars = await self.fetchall(guild, user)
-        return len(chars)
+        guild_id = guild.id if isinstance(guild, discord.Guild) else guild
+        user_id = user.id if isinstance(user, discord.Member) else user
+        await self._load_guild(guild_id)
+        return len(self._by_owner.get((guild_id, user_id), ()))
 
     async def countguild(self, guild_id: int) -> int:
         """Get the number of characters in the guild."""
-        chars = await self.fetchguild(guild_id)
-        return len(chars)
+        await self._load_guild(guild_id)
+        return len(self._by_guild.get(guild_id, ()))
+
+    async def countguilds(self, guild_ids: Iterable[int]) -> dict[int, int]:
+        """Get the number of characters in each guild. In lazy mode, guilds
+        that aren't loaded are counted with one query instead of loaded."""
+        await self.initialize()
+        guild_ids = set(guild_ids)
+        counts = {}
+        missing = []
+        for guild_id in guild_ids:
+            if not self.lazy or guild_id in self._loaded:
+                counts[guild_id] = len(self._by_guild.get(guild_id, ()))
+            else:
+                missing.append(guild_id)
+
+        if missing:
+            counts.update(dict.fromkeys(missing, 0))
+            cursor = VChar.get_pymongo_collection().find(
+                {"guild": {"$in": missing}}, {"_id": 0, "guild": 1}
+            )
+            async for doc in cursor:
+                counts[doc["guild"]] += 1
+
+        return counts
+
+    def roster_revision(self, guild_id: int) -> int:
+        """A number that changes whenever a character is added to or removed
+        from the guild. Changes to the characters themselves are tracked by
+        their own revisions. Roster revisions are only comparable within a
+        process."""
+        return self._rosters.get(guild_id, 0)
+
+    def _touch_roster(self, guild_id: int):
+        """Mark a guild's roster as changed."""
+        self._roster_clock += 1
+        self._rosters[guild_id] = self._roster_clock
 
     async def has_character(
         self,
@@ -149,15 +387,20 @@ class CharacterManager:
         """Insert the character into the database and the cache."""
         await self.initialize()
 
-        async with self._lock:
+        async with self._owner_locks.hold((character.guild, character.user)):
             if await self.has_character(character.guild, character.user, character.raw_name):
                 raise errors.DuplicateCharacterError(
                     f"Character '{character.name}' already exists for this user in this guild."
                 )
 
             await character.insert()
-            self._id_cache[character.id_str] = character
-            bisect.insort(self._characters, character)
+            self._touch_roster(character.guild)
+            if not self.lazy or character.guild in self._loaded:
+                # Otherwise, the guild was evicted, and the character will be
+                # loaded with it next time
+                self._id_cache[character.id_str] = character
+                bisect.insort(self._characters, character)
+                self._index(character)
 
             logger.info(
                 "Registered {} to {} on {}", character.name, character.user, character.guild
@@ -165,15 +408,15 @@ class CharacterManager:
 
     async def remove(self, character: VChar) -> bool:
         """Delete the character from the database and the cache."""
-        await self.initialize()
+        await self._load_guild(character.guild)
 
-        # Acquire global lock to prevent race conditions on shared data structures
-        async with self._lock:
+        async with self._owner_locks.hold((character.guild, character.user)):
+            if pending := self._pending.pop(character.id_str, None):
+                pending[1].cancel()
             deletion = await character.delete()
 
             if deletion is not None and deletion.deleted_count == 1:
-                self._characters.remove(character)
-                del self._id_cache[character.id_str]
+                self._forget(character)
 
                 logger.info("Removed {} from {}", character.name, character.guild)
                 return True
@@ -185,9 +428,11 @@ class CharacterManager:
         self, character: VChar, current_owner: discord.Member, new_owner: discord.Member
     ):
         """Transfer character ownership."""
-        await self.initialize()
+        await self._load_guild(character.guild)
 
-        async with self._lock:
+        async with self._owner_locks.hold(
+            (character.guild, character.user), (new_owner.guild.id, new_owner.id)
+        ):
             if character.user != current_owner.id:
                 raise errors.WrongOwner(
                     f"{current_owner.display_name} does not own {character.name}!"
@@ -201,7 +446,12 @@ class CharacterManager:
                     f"{new_owner.display_name} already has a character named {character.raw_name}"
                 )
 
+            cached = character.id_str in self._id_cache
+            if cached:
+                self._unindex(character)
             character.user = new_owner.id
+            if cached:
+                self._index(character)
             await character.save()
 
             logger.info(
@@ -217,55 +467,196 @@ class CharacterManager:
         When a player leaves a guild, mark their characters as inactive. They
         will then be culled after 30 days if they haven't returned before then.
         """
-        await self.initialize()
+        await self._load_guild(player.guild.id)
 
-        async with self._lock:
-            tasks = []
-            for char in self._characters:
-                if char.user == player.id and char.guild == player.guild.id:
-                    char.stat_log["left"] = datetime.now(UTC)
-                    tasks.append(char.save())
-
-            if tasks:
-                logger.info(
-                    "{}: {} left. Marked {} inactive.",
-                    player.guild.name,
-                    player.name,
-                    pluralize(len(tasks), "character"),
-                )
-                await asyncio.gather(*tasks)
+        left = datetime.now(UTC)
+        chars = self._by_owner.get((player.guild.id, player.id), [])
+        if count := await self.bulk_write(chars, lambda c: c.stat_log.update(left=left)):
+            logger.info(
+                "{}: {} left. Marked {} inactive.",
+                player.guild.name,
+                player.name,
+                pluralize(count, "character"),
+            )
 
     async def mark_active(self, player: discord.Member):
         """
         When a player returns to the guild, we mark their characters as active
         so long as they haven't already been culled.
         """
-        await self.initialize()
+        await self._load_guild(player.guild.id)
 
-        async with self._lock:
-            tasks = []
-            for char in self._characters:
-                if (
-                    char.user == player.id
-                    and char.guild == player.guild.id
-                    and "left" in char.stat_log
-                ):
-                    del char.stat_log["left"]
-                    tasks.append(char.save())
-
-            if tasks:
-                logger.info(
-                    "{}: {} returned. Marked {} active.",
-                    player.guild.name,
-                    player.name,
-                    pluralize(len(tasks), "character"),
-                )
-                await asyncio.gather(*tasks)
+        chars = [
+            char
+            for char in self._by_owner.get((player.guild.id, player.id), ())
+            if "left" in char.stat_log
+        ]
+        if count := await self.bulk_write(chars, lambda c: c.stat_log.pop("left", None)):
+            logger.info(
+                "{}: {} returned. Marked {} active.",
+                player.guild.name,
+                player.name,
+                pluralize(count, "character"),
+            )
 
-    async def sort_chars(self):
-        """Sort characters after a rename."""
-        async with self._lock:
+    async def bulk_write(
+        self,
+        update: Iterable[VChar] = (),
+        mutate: Callable[[VChar], object] | None = None,
+        delete: Iterable[VChar] = (),
+    ) -> int:
+        """Apply mutate to every character in update and delete every
+        character in delete, in a single bulk write. The cached characters
+        only change once their writes succeed: mutate is applied to a copy
+        to build the write, then again to the cached character, so it must
+        be safe to repeat. Returns how many characters were written."""
+        update, delete = list(update), list(delete)
+        if update and mutate is None:
+            raise ValueError("Updating characters requires a mutation")
+
+        owners = [(char.guild, char.user) for char in update + delete]
+        async with self._owner_locks.hold(*owners):
+            requests = []
+            commits: list[Callable[[], None]] = []
+
+            for char in update:
+                draft, ops = char.stage(mutate)  # type: ignore[arg-type]
+                if ops:
+                    requests.append(UpdateOne({"_id": char.id}, ops))
+                    commits.append(functools.partial(char.adopt, draft, ops, mutate))
+
+            for char in delete:
+                if pending := self._pending.pop(char.id_str, None):
+                    pending[1].cancel()
+                requests.append(DeleteOne({"_id": char.id}))
+                commits.append(lambda char=char: self._forget(char))
+
+            if not requests:
+                return 0
+
+            failed = set()
+            try:
+                await VChar.get_pymongo_collection().bulk_write(requests, ordered=False)
+            except BulkWriteError as err:
+                failed = {error["index"] for error in err.details["writeErrors"]}
+                logger.warning("Bulk write failed for {} of {}", len(failed), len(requests))
+
+            for index, commit in enumerate(commits):
+                if index not in failed:
+                    commit()
+
+            return len(commits) - len(failed)
+
+    async def sort_chars(self, character: VChar | None = None):
+        """Sort characters after a rename. If the renamed character is given,
+        only the lists holding it are re-sorted."""
+        # Sorting never yields to the event loop, so it needs no lock
+        self._characters.sort()
+        if character is None:
+            self._build_indexes()
+        elif character.id_str in self._id_cache:
+            for chars in self._index_lists(character):
+                chars.sort()
+
+    async def _load_guild(self, guild_id: int):
+        """In lazy mode, make sure a guild's characters are loaded and mark
+        the guild as recently used."""
+        await self.initialize()
+        if not self.lazy:
+            return
+        if guild_id in self._loaded:
+            self._loaded.move_to_end(guild_id)
+            return
+
+        async with self._guild_locks.hold(guild_id):
+            if guild_id in self._loaded:
+                self._loaded.move_to_end(guild_id)
+                return
+
+            chars = await VChar.find(VChar.guild == guild_id).to_list()
+            chars.sort()
+
+            # The guild had nothing loaded, so its lists can be built in order
+            for char in chars:
+                self._id_cache[char.id_str] = char
+                self._by_owner[(char.guild, char.user)].append(char)
+                self._by_guild[char.guild].append(char)
+                bisect.insort(self._by_user[char.user], char)
+            self._characters.extend(chars)
             self._characters.sort()
+            self._loaded[guild_id] = None
+            self._touch_roster(guild_id)
+
+            logger.debug("Loaded {} characters on {}", len(chars), guild_id)
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used guilds until the cache is within its
+        limit. The most recent guild is always kept, as are guilds with
+        delayed saves pending, since reloading them would fetch stale copies."""
+        pending = {char.guild for char, _ in self._pending.values()}
+        evicted = set()
+        for guild_id in list(self._loaded)[:-1]:
+            if len(self._id_cache) <= self._cache_limit:
+                break
+            if guild_id in pending:
+                continue
+
+            del self._loaded[guild_id]
+            for char in self._by_guild.get(guild_id, []).copy():
+                del self._id_cache[char.id_str]
+                self._unindex(char)
+            evicted.add(guild_id)
+
+        if evicted:
+            self._characters = [c for c in self._characters if c.guild not in evicted]
+            logger.debug("Evicted {} guilds", len(evicted))
+
+    def _forget(self, character: VChar):
+        """Drop a character from the cache, if it's there."""
+        if (cached := self._id_cache.pop(character.id_str, None)) is not None:
+            self._characters.remove(cached)
+            self._unindex(cached)
+
+    def _build_indexes(self):
+        """Rebuild the indexes from the (sorted) master list."""
+        self._by_owner.clear()
+        self._by_guild.clear()
+        self._by_user.clear()
+        for char in self._characters:
+            self._by_owner[(char.guild, char.user)].append(char)
+            self._by_guild[char.guild].append(char)
+            self._by_user[char.user].append(char)
+        for guild_id in self._by_guild:
+            self._touch_roster(guild_id)
+
+    def _index_lists(self, character: VChar) -> tuple[list[VChar], ...]:
+        """The index lists a character belongs in."""
+        return (
+            self._by_owner[(character.guild, character.user)],
+            self._by_guild[character.guild],
+            self._by_user[character.user],
+        )
+
+    def _index(self, character: VChar):
+        """Add a character to the indexes."""
+        for chars in self._index_lists(character):
+            bisect.insort(chars, character)
+        self._touch_roster(character.guild)
+
+    def _unindex(self, character: VChar):
+        """Remove a character from the indexes, dropping emptied entries."""
+        keys = (
+            (self._by_owner, (character.guild, character.user)),
+            (self._by_guild, character.guild),
+            (self._by_user, character.user),
+        )
+        for index, key in keys:
+            chars = index[key]
+            chars.remove(character)
+            if not chars:
+                del index[key]
+        self._touch_roster(character.guild)
 
     def _validate(self, guild: discord.Guild, user: discord.Member, char: VChar):
         """Validate character ownership."""
@@ -284,4 +675,8 @@ class CharacterManager:
         return user.top_role.permissions.administrator or user.guild_permissions.administrator
 
 
-char_mgr = CharacterManager()
+char_mgr = CharacterManager(
+    settings.character_cache_limit,
+    settings.character_snapshot,
+    settings.character_write_delay,
+)
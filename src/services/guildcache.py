@@ -1,15 +1,42 @@
 """Guild/Member caching for cold start recovery."""
 
+import asyncio
 import functools
+from collections.abc import Iterable
 
 import aiosqlite
 import discord
 from loguru import logger
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from config import settings
 from utils.discord_helpers import get_avatar
 
+# Guilds chunked at once. Discord rate-limits member requests anyway, so more
+# than a handful doesn't help.
+CHUNK_CONCURRENCY = 4
+PROGRESS_INTERVAL = 100
+
+# Statements are kept as constants so sqlite3's statement cache reuses the
+# compiled statements across calls
+UPSERT_GUILD = """
+    INSERT INTO guilds VALUES (?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    icon = excluded.icon
+"""
+UPSERT_MEMBER = """
+    INSERT INTO members VALUES (?, ?, ?, ?)
+    ON CONFLICT (guild, id) DO UPDATE SET
+    name = excluded.name,
+    icon = excluded.icon
+"""
+DELETE_GUILD = "DELETE FROM guilds WHERE id=?"
+DELETE_MEMBER = "DELETE FROM members WHERE guild=? AND id=?"
+
+type GuildRow = tuple[int, str, str | None]
+type MemberRow = tuple[int, int, str, str]
+
 
 class CachedMember(BaseModel):
     """A cached member object with minimal values. For use with web routes."""
@@ -27,13 +54,44 @@ class CachedGuild(BaseModel):
     name: str
     icon: str | None
     members: list[CachedMember] = Field(default_factory=list)
+    _member_index: tuple[list[CachedMember], dict[int, int]] | None = PrivateAttr(default=None)
 
     def get_member(self, id: int) -> CachedMember | None:
         """Get a member, if it exists."""
-        try:
-            return next(m for m in self.members if m.id == id)
-        except StopIteration:
-            return None
+        position = self._positions().get(id)
+        return self.members[position] if position is not None else None
+
+    def _positions(self) -> dict[int, int]:
+        """The members' positions in the list, keyed by ID. Rebuilt if the
+        list was replaced or resized."""
+        if self._member_index is not None:
+            members, index = self._member_index
+            if members is self.members and len(index) == len(members):
+                return index
+
+        index = {m.id: position for position, m in enumerate(self.members)}
+        self._member_index = (self.members, index)
+        return index
+
+    def _put_member(self, member: CachedMember):
+        """Add a member or replace the one with the same ID."""
+        index = self._positions()
+        if (position := index.get(member.id)) is not None:
+            self.members[position] = member
+        else:
+            index[member.id] = len(self.members)
+            self.members.append(member)
+
+    def _drop_member(self, id: int):
+        """Remove a member, if it exists. The last member takes its place, so
+        that removal doesn't shift the rest."""
+        index = self._positions()
+        if (position := index.pop(id, None)) is None:
+            return
+        last = self.members.pop()
+        if position < len(self.members):
+            self.members[position] = last
+            index[last.id] = position
 
 
 def validate(func):
@@ -49,12 +107,22 @@ def validate(func):
 
 
 class GuildCache:
-    """SQLite-backed cache of Guilds and Members."""
+    """SQLite-backed cache of Guilds and Members. Reads are served from an
+    in-memory index that mirrors the database, so the objects returned are
+    shared and must not be modified. Writes share one connection, so they
+    take turns; otherwise one could commit in the middle of a refresh."""
 
     def __init__(self, loc: str):
         self.location = loc
+        self._write_lock = asyncio.Lock()
         self._initialized = False
         self._refreshed = False
+        self._guilds: dict[int, CachedGuild] = {}
+
+        # Each guild's revision is the clock reading at its last change, so a
+        # revision is never reused, even for a guild that leaves and returns
+        self._clock = 0
+        self._revisions: dict[int, int] = {}
 
     @property
     def initialized(self) -> bool:
@@ -86,6 +154,14 @@ class GuildCache:
         self.db.row_factory = aiosqlite.Row
 
         await self.db.execute("PRAGMA foreign_keys = ON")
+        # WAL makes commits to a file-backed cache cheaper. With WAL, NORMAL
+        # is still safe against corruption; it can only lose the last commits
+        # on power loss, which the next refresh restores. In-memory databases
+        # can't use WAL and keep their memory journal.
+        async with self.db.execute("PRAGMA journal_mode = WAL") as cur:
+            journal = await cur.fetchone()
+        if journal is not None and journal[0] == "wal":
+            await self.db.execute("PRAGMA synchronous = NORMAL")
         await self.db.execute(
             """
                 CREATE TABLE IF NOT EXISTS guilds (
@@ -112,12 +188,65 @@ class GuildCache:
         )
 
         await self.db.commit()
+        await self._load_index()
         self._initialized = True
         logger.info("Guild cache initialized at {}", self.location)
 
+    def revision(self, guild_id: int) -> int:
+        """A number that changes whenever the guild or its members change in
+        the cache. Revisions are only comparable within a process."""
+        return self._revisions.get(guild_id, 0)
+
+    def _touch(self, guild_id: int):
+        """Mark a guild as changed."""
+        self._clock += 1
+        self._revisions[guild_id] = self._clock
+
+    async def _load_index(self):
+        """Mirror the database in memory."""
+        self._guilds = {}
+        async with self.db.execute("SELECT id, name, icon FROM guilds") as cur:
+            async for row in cur:
+                self._index_guild(tuple(row))
+        async with self.db.execute("SELECT guild, id, name, icon FROM members") as cur:
+            async for row in cur:
+                self._index_member(tuple(row))
+
+    def _index_guild(self, row: GuildRow):
+        """Add or update a guild in the index. Its members are kept."""
+        gid, name, icon = row
+        if (guild := self._guilds.get(gid)) is not None:
+            if (guild.name, guild.icon) == (name, icon):
+                return
+            guild.name = name
+            guild.icon = icon
+        else:
+            self._guilds[gid] = CachedGuild.model_construct(
+                id=gid, name=name, icon=icon, members=[]
+            )
+        self._touch(gid)
+
+    def _index_member(self, row: MemberRow):
+        """Add or update a member in the index."""
+        gid, mid, name, icon = row
+        if (guild := self._guilds.get(gid)) is None:
+            return
+        if (old := guild.get_member(mid)) is not None and (old.name, old.icon) == (name, icon):
+            return
+        guild._put_member(CachedMember.model_construct(id=mid, name=name, icon=icon, guild=guild))
+        self._touch(gid)
+
+    def _unindex_member(self, guild_id: int, member_id: int):
+        """Remove a member from the index."""
+        if (guild := self._guilds.get(guild_id)) is not None:
+            guild._drop_member(member_id)
+            self._touch(guild_id)
+
     async def close(self):
         """Close the database."""
         await self.db.close()
+        self._guilds = {}
+        self._revisions = {}
         self._initialized = False
         self._refreshed = False
         logger.info("Guild cache closed ({})", self.location)
@@ -128,78 +257,60 @@ class GuildCache:
         if isinstance(guilds, discord.Guild):
             guilds = [guilds]
 
-        # We need to wait for the guilds' caches to be populated. Since we
-        # aren't going to proceed until they're all finished, and since the
-        # fetchers are already running, we can just wait in a for loop. No
-        # need to add complexity with futures etc.
-        for guild in guilds:
-            if not guild.chunked:
-                await guild.chunk()
+        await self._chunk(guilds)
+        guild_rows = [_guild_row(g) for g in guilds]
+        member_rows = [_member_row(m) for g in guilds for m in g.members]
+        async with self._write_lock:
+            await self.db.executemany(UPSERT_GUILD, guild_rows)
+            await self.db.executemany(UPSERT_MEMBER, member_rows)
+            await self.db.commit()
+
+        for row in guild_rows:
+            self._index_guild(row)
+        for row in member_rows:
+            self._index_member(row)
+
+    @staticmethod
+    async def _chunk(guilds: list[discord.Guild]):
+        """Wait for the guilds' member caches to be populated, a few at a time."""
+        pending = [g for g in guilds if not g.chunked]
+        if not pending:
+            return
 
-        data = [(g.id, g.name, g.icon.url if g.icon else None) for g in guilds]
-        await self.db.executemany(
-            """
-                INSERT INTO guilds VALUES (?, ?, ?)
-                ON CONFLICT (id) DO UPDATE SET 
-                name = excluded.name,
-                icon = excluded.icon
-            """,
-            data,
-        )
-        await self.db.commit()
+        semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+        done = 0
 
-        members = [m for g in guilds for m in g.members]
-        await self.upsert_members(members)
+        async def chunk(guild: discord.Guild):
+            nonlocal done
+            async with semaphore:
+                await guild.chunk()
+            done += 1
+            if done % PROGRESS_INTERVAL == 0 or done == len(pending):
+                logger.info("GUILD CACHE: Chunked {}/{} guilds", done, len(pending))
+
+        await asyncio.gather(*map(chunk, pending))
 
     @validate
     async def delete_guild(self, guild: discord.Guild):
         """Delete a guild."""
-        await self.db.execute("DELETE FROM guilds WHERE id=?", (guild.id,))
-        await self.db.commit()
+        async with self._write_lock:
+            await self.db.execute(DELETE_GUILD, (guild.id,))
+            await self.db.commit()
+        self._guilds.pop(guild.id, None)
+        self._touch(guild.id)
 
     @validate
     async def fetchguild(self, guild_id: int, members=True) -> CachedGuild | None:
         """Fetch a guild."""
-        async with self.db.execute("SELECT * FROM guilds WHERE id=?", (guild_id,)) as cur:
-            row = await cur.fetchone()
-            if row is None:
-                return None
-
-            guild = CachedGuild.model_validate(dict(row))
-            if members:
-                guild.members = await self.fetchmembers(guild.id)
+        guild = self._guilds.get(guild_id)
+        if guild is None or members:
             return guild
+        return CachedGuild(id=guild.id, name=guild.name, icon=guild.icon)
 
     @validate
     async def fetchguilds(self, user_id: int) -> list[CachedGuild]:
         """Fetch the guilds a specific user belongs to, with members populated."""
-        guilds: dict[int, CachedGuild] = {}
-
-        query = (
-            "SELECT "
-            "g.id AS guild_id, g.name AS guild_name, g.icon AS guild_icon, "
-            "m.id AS member_id, m.name AS member_name, m.icon AS member_icon "
-            "FROM guilds g "
-            "JOIN members m ON g.id = m.guild "
-            "WHERE g.id IN (SELECT guild FROM members WHERE id = ?)"
-        )
-        async with self.db.execute(query, (user_id,)) as cur:
-            async for row in cur:
-                gid = row["guild_id"]
-                if gid not in guilds:
-                    guilds[gid] = CachedGuild(
-                        id=gid, name=row["guild_name"], icon=row["guild_icon"]
-                    )
-                guild = guilds[gid]
-                member = CachedMember(
-                    id=row["member_id"],
-                    name=row["member_name"],
-                    icon=row["member_icon"],
-                    guild=guild,
-                )
-                guild.members.append(member)
-
-        return list(guilds.values())
+        return [g for g in self._guilds.values() if g.get_member(user_id) is not None]
 
     @validate
     async def upsert_members(self, members: discord.Member | list[discord.Member]):
@@ -209,71 +320,117 @@ class GuildCache:
         if not members:
             return
 
-        data = [(m.guild.id, m.id, m.display_name, get_avatar(m).url) for m in members]
-        await self.db.executemany(
-            """
-                INSERT INTO members VALUES (?, ?, ?, ?)
-                ON CONFLICT (guild, id) DO UPDATE SET
-                name = excluded.name,
-                icon = excluded.icon
-            """,
-            data,
-        )
-        await self.db.commit()
+        rows = [_member_row(m) for m in members]
+        async with self._write_lock:
+            await self.db.executemany(UPSERT_MEMBER, rows)
+            await self.db.commit()
+
+        for row in rows:
+            self._index_member(row)
 
     @validate
     async def delete_member(self, member: discord.Member):
         """Delete a member if it exists."""
-        await self.db.execute(
-            "DELETE FROM members WHERE guild=? AND id=?", (member.guild.id, member.id)
-        )
-        await self.db.commit()
+        async with self._write_lock:
+            await self.db.execute(DELETE_MEMBER, (member.guild.id, member.id))
+            await self.db.commit()
+        self._unindex_member(member.guild.id, member.id)
 
     @validate
     async def fetchmember(self, guild_id: int, member_id: int) -> CachedMember | None:
         """Fetch a cached member."""
-        cguild = await self.fetchguild(guild_id)
-        if cguild is None:
+        guild = self._guilds.get(guild_id)
+        if guild is None:
             return None
-
-        async with self.db.execute(
-            "SELECT * FROM members WHERE guild=? AND id=?", (guild_id, member_id)
-        ) as cur:
-            row = await cur.fetchone()
-            if row is None:
-                return None
-
-            data = dict(row)
-            data["guild"] = cguild
-            return CachedMember.model_validate(data)
+        return guild.get_member(member_id)
 
     @validate
     async def fetchmembers(self, guild: int | CachedGuild | discord.Guild) -> list[CachedMember]:
-        """Fetch a cached member."""
+        """Fetch a guild's cached members."""
         guild_id = guild if isinstance(guild, int) else guild.id
-        if isinstance(guild, CachedGuild):
-            cguild = guild
-        else:
-            cguild = await self.fetchguild(guild_id, members=False)
-            if cguild is None:
-                return []
-
-        async with self.db.execute("SELECT * FROM members WHERE guild=?", (guild_id,)) as cur:
-            members = []
-            async for row in cur:
-                data = dict(row)
-                data["guild"] = cguild
-                members.append(CachedMember.model_validate(data))
+        cguild = self._guilds.get(guild_id)
+        if cguild is None:
+            return []
+        return list(cguild.members)
 
-            return members
+    @validate
+    async def fetchmembers_by_ids(
+        self, guild_id: int, member_ids: Iterable[int]
+    ) -> dict[int, CachedMember]:
+        """Fetch the given members of a guild, keyed by ID. Members who aren't
+        cached are left out."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return {}
+
+        index = guild._positions()
+        return {mid: guild.members[index[mid]] for mid in set(member_ids) if mid in index}
 
     @validate
     async def refresh(self, guilds: list[discord.Guild]):
-        """Clear all data and insert new guilds. For use in bot on_ready()."""
-        await self.db.execute("DELETE FROM guilds")
-        await self.upsert_guilds(guilds)
-        logger.info("Guild cache {} refreshed!", self.location)
+        """Bring the cache in line with the bot's guilds. For use in bot
+        on_ready(). Only changed rows are written, in a single transaction,
+        so readers see either the old cache or the new one."""
+        await self._chunk(guilds)
+
+        guild_rows = {row[0]: row for row in map(_guild_row, guilds)}
+        member_rows = {row[:2]: row for row in (_member_row(m) for g in guilds for m in g.members)}
+
+        async with self._write_lock:
+            await self.db.execute("BEGIN IMMEDIATE")
+            try:
+                async with self.db.execute("SELECT id, name, icon FROM guilds") as cur:
+                    old_guilds = {row[0]: tuple(row) async for row in cur}
+                async with self.db.execute("SELECT guild, id, name, icon FROM members") as cur:
+                    old_members = {(row[0], row[1]): tuple(row) async for row in cur}
+
+                changed_guilds = [r for k, r in guild_rows.items() if old_guilds.get(k) != r]
+                changed_members = [r for k, r in member_rows.items() if old_members.get(k) != r]
+                gone_guilds = [(k,) for k in old_guilds.keys() - guild_rows.keys()]
+                # Members of departed guilds go with them by cascade
+                gone_members = [
+                    k for k in old_members.keys() - member_rows.keys() if k[0] in guild_rows
+                ]
+
+                await self.db.executemany(DELETE_GUILD, gone_guilds)
+                await self.db.executemany(DELETE_MEMBER, gone_members)
+                await self.db.executemany(UPSERT_GUILD, changed_guilds)
+                await self.db.executemany(UPSERT_MEMBER, changed_members)
+                await self.db.commit()
+            except BaseException:
+                await self.db.rollback()
+                raise
+
+            for (gid,) in gone_guilds:
+                del self._guilds[gid]
+                self._touch(gid)
+            for gid, mid in gone_members:
+                self._unindex_member(gid, mid)
+            for row in changed_guilds:
+                self._index_guild(row)
+            for row in changed_members:
+                self._index_member(row)
+
+        logger.info(
+            "Guild cache {} refreshed! Guilds: {} written, {} removed. "
+            "Members: {} written, {} removed.",
+            self.location,
+            len(changed_guilds),
+            len(gone_guilds),
+            len(changed_members),
+            len(gone_members),
+        )
         self._refreshed = True
 
 
+def _guild_row(guild: discord.Guild) -> GuildRow:
+    """The guilds table row for a guild."""
+    return (guild.id, guild.name, guild.icon.url if guild.icon else None)
+
+
+def _member_row(member: discord.Member) -> MemberRow:
+    """The members table row for a member."""
+    return (member.guild.id, member.id, member.display_name, get_avatar(member).url)
+
+
 guild_cache = GuildCache(settings.guild_cache_loc)
@@ -0,0 +1,315 @@
+"""services/rolllog.py - Batched, write-behind roll logging.
+
+Alongside the rolls themselves, roll statistics are kept as rollups, counting
+only rolls used in statistics:
+
+    roll_stats: Rolls per character, UTC day, final outcome, and whether the
+        roll was rerolled.
+    trait_stats: Successes per character, trait key, and UTC day.
+
+Buckets also remember the last few roll log batches that changed them, so
+that a batch can be retried without counting twice."""
+
+from collections import Counter, defaultdict
+from datetime import UTC, datetime
+from itertools import islice
+from typing import Any, NamedTuple
+
+from bson import ObjectId
+from loguru import logger
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import db
+from services.batchwriter import DUPLICATE_KEY, BatchWriter
+from services.spool import spool
+
+# The fields needed to find what a logged roll counts toward
+ROLLUP_FIELDS = {
+    "charid": 1,
+    "date": 1,
+    "difficulty": 1,
+    "margin": 1,
+    "outcome": 1,
+    "reroll.margin": 1,
+    "reroll.outcome": 1,
+    "traits": 1,
+    "use_in_stats": 1,
+}
+
+# The fields needed to find what a reroll moves a logged roll out of
+REROLL_FIELDS = {field: 1 for field in ROLLUP_FIELDS if not field.startswith("reroll.")} | {
+    "reroll": 1
+}
+
+# Batches remembered per bucket. A failed batch is retried before any of the
+# writer's later batches are sent, so only the latest matter.
+RECENT_BATCHES = 10
+
+
+class RollupKey(NamedTuple):
+    """A roll_stats bucket."""
+
+    charid: ObjectId
+    day: datetime
+    outcome: str
+    rerolled: bool
+
+    collection = "roll_stats"
+    counter = "count"
+
+
+class TraitKey(NamedTuple):
+    """A trait_stats bucket."""
+
+    charid: ObjectId
+    trait: str
+    day: datetime
+
+    collection = "trait_stats"
+    counter = "successes"
+
+
+class RollTally(NamedTuple):
+    """What a logged roll counts toward."""
+
+    charid: ObjectId
+    day: datetime
+    outcome: str
+    margin: int
+    difficulty: int
+    rerolled: bool
+    traits: tuple[str, ...]
+
+    @classmethod
+    def of(cls, roll: dict[str, Any]) -> "RollTally | None":
+        """The tally for a logged roll, or None if it isn't counted."""
+        if roll.get("charid") is None or not roll.get("use_in_stats"):
+            return None
+
+        reroll = roll.get("reroll")
+        final = reroll or roll
+        return cls(
+            roll["charid"],
+            day_of(roll["date"]),
+            final["outcome"],
+            final["margin"],
+            roll["difficulty"],
+            reroll is not None,
+            tuple(roll.get("traits") or ()),
+        )
+
+    @property
+    def successes(self) -> int:
+        """The roll's total successes."""
+        return self.margin + self.difficulty
+
+    def rerolled_to(self, reroll: dict[str, Any]) -> "RollTally":
+        """The tally after a reroll."""
+        return self._replace(outcome=reroll["outcome"], margin=reroll["margin"], rerolled=True)
+
+    def counts(self) -> Counter[RollupKey | TraitKey]:
+        """The roll's contribution to each bucket."""
+        counts = Counter({RollupKey(self.charid, self.day, self.outcome, self.rerolled): 1})
+        for trait in self.traits:
+            counts[TraitKey(self.charid, trait, self.day)] += self.successes
+        return counts
+
+
+def day_of(date: datetime) -> datetime:
+    """The start of the date's day."""
+    return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _encode_counts(counts: Counter[RollupKey | TraitKey]) -> list[dict[str, Any]]:
+    """Rollup changes as BSON-encodable documents, so they can be spooled."""
+    return [
+        {"collection": key.collection, "bucket": key._asdict(), "delta": delta}
+        for key, delta in counts.items()
+        if delta
+    ]
+
+
+def _decode_counts(counts: list[dict[str, Any]]) -> Counter[RollupKey | TraitKey]:
+    """Rollup changes from _encode_counts(). Days are read as naive UTC, the
+    way they come back from the database, so that equal buckets merge."""
+    keys = {RollupKey.collection: RollupKey, TraitKey.collection: TraitKey}
+    decoded = Counter()
+    for count in counts:
+        bucket = dict(count["bucket"])
+        if (day := bucket["day"]).tzinfo is not None:
+            bucket["day"] = day.astimezone(UTC).replace(tzinfo=None)
+        decoded[keys[count["collection"]](**bucket)] += count["delta"]
+    return decoded
+
+
+async def update_rollups(deltas: Counter[RollupKey | TraitKey], batch: ObjectId | None = None):
+    """Apply changes to the rollup counters. Changes made on behalf of a
+    batch are applied at most once, however often they're retried."""
+    requests = defaultdict(list)
+    created = defaultdict(list)
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        bucket = key._asdict()
+        if batch is None:
+            update = {"$inc": {key.counter: delta}}
+            requests[key.collection].append(UpdateOne(bucket, update, upsert=True))
+            continue
+
+        # The bucket has to exist before the batch's change can be guarded
+        created[key.collection].append(
+            UpdateOne(bucket, {"$setOnInsert": {key.counter: 0}}, upsert=True)
+        )
+        update = {
+            "$inc": {key.counter: delta},
+            "$push": {"batches": {"$each": [batch], "$slice": -RECENT_BATCHES}},
+        }
+        requests[key.collection].append(UpdateOne(bucket | {"batches": {"$ne": batch}}, update))
+
+    for collection, upserts in created.items():
+        await getattr(db, collection).bulk_write(upserts, ordered=False)
+    for collection, updates in requests.items():
+        await getattr(db, collection).bulk_write(updates, ordered=False)
+
+
+class RollLog(BatchWriter):
+    """Queues roll log writes and sends them to the database in batches, so
+    that rolls don't wait on the database.
+
+    New rolls are inserted. A reroll updates its roll by ID, or is folded
+    into the roll if that hasn't been written yet. What a reroll moves the
+    roll out of is read from the roll when the batch is sent, since the roll
+    may have left statistics meanwhile. Each batch's rollup changes are
+    written after the batch, for the writes that succeeded.
+
+    The rollup changes are kept in the batch's items as they're worked out,
+    along with the batch's ID, so a batch that's spooled partway through is
+    retried with the same changes, and they're only counted once."""
+
+    label = "ROLL LOG"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._inserts: dict[ObjectId, dict[str, Any]] = {}
+        self._rerolls: dict[ObjectId, dict[str, Any]] = {}
+
+    @property
+    def pending(self) -> int:
+        """The number of writes waiting to be sent."""
+        return len(self._inserts) + len(self._rerolls)
+
+    def insert(self, roll: dict[str, Any]):
+        """Queue a new roll."""
+        if self._full():
+            return
+        self._inserts[roll["_id"]] = roll
+        self._schedule()
+
+    def reroll(self, roll_id: ObjectId, reroll: dict[str, Any]):
+        """Queue a reroll of a logged roll. A later reroll of the same roll
+        replaces it."""
+        if (roll := self._inserts.get(roll_id)) is not None:
+            roll["reroll"] = reroll
+            return
+        if roll_id not in self._rerolls and self._full():
+            return
+        self._rerolls[roll_id] = reroll
+        self._schedule()
+
+    def _take(self) -> list[dict[str, Any]]:
+        """Remove up to max_batch waiting writes, new rolls first."""
+        items: list[dict[str, Any]] = []
+        for roll_id in list(islice(self._inserts, self.max_batch)):
+            items.append({"roll": self._inserts.pop(roll_id)})
+
+        for roll_id in list(islice(self._rerolls, self.max_batch - len(items))):
+            items.append({"_id": roll_id, "reroll": self._rerolls.pop(roll_id)})
+
+        return items
+
+    async def _send(self, items: list[dict[str, Any]]):
+        """Find what the rerolls change, insert the new rolls, then apply the
+        rerolls, then the rollup changes for the writes that took effect.
+
+        All of it is safe to repeat: a roll that was already inserted isn't
+        an error, a reroll only applies to a roll that doesn't have it yet,
+        and the rollups remember the batch. On a retry, a roll that turns
+        out to be inserted already is still counted, since the earlier
+        attempt may have inserted it before failing."""
+        retry = "batch" in items[0]
+        batch = items[0]["batch"] if retry else ObjectId()
+        for item in items:
+            item["batch"] = batch
+
+        rolls = [item for item in items if "roll" in item]
+        rerolls = [item for item in items if "reroll" in item]
+        await self._count_rerolls([item for item in rerolls if "counts" not in item])
+
+        if rolls:
+            failed, duplicates = set(), set()
+            try:
+                requests = [InsertOne(item["roll"]) for item in rolls]
+                await db.rolls.bulk_write(requests, ordered=False)
+            except BulkWriteError as err:
+                errors = err.details["writeErrors"]
+                duplicates = {e["index"] for e in errors if e["code"] == DUPLICATE_KEY}
+                failed = {e["index"] for e in errors} - duplicates
+                if failed:
+                    self.failed += len(failed)
+                    logger.error("ROLL LOG: {} of {} writes failed", len(failed), len(rolls))
+
+            for index, item in enumerate(rolls):
+                if "counts" in item:
+                    continue
+                counted = index not in failed and (retry or index not in duplicates)
+                if counted and (tally := RollTally.of(item["roll"])) is not None:
+                    item["counts"] = _encode_counts(tally.counts())
+                else:
+                    item["counts"] = []
+
+        if rerolls:
+            requests = [
+                UpdateOne(
+                    {"_id": item["_id"], "reroll": {"$ne": item["reroll"]}},
+                    {"$set": {"reroll": item["reroll"]}},
+                )
+                for item in rerolls
+            ]
+            try:
+                await db.rolls.bulk_write(requests, ordered=False)
+            except BulkWriteError as err:
+                failed = {e["index"] for e in err.details["writeErrors"]}
+                self.failed += len(failed)
+                logger.error("ROLL LOG: {} of {} rerolls failed", len(failed), len(rerolls))
+                for index in failed:
+                    rerolls[index]["counts"] = []
+
+        deltas = Counter()
+        for item in items:
+            deltas.update(_decode_counts(item["counts"]))
+        await update_rollups(deltas, batch)
+
+    @staticmethod
+    async def _count_rerolls(rerolls: list[dict[str, Any]]):
+        """Work out what each reroll changes in the rollups, from the roll as
+        it's stored, before anything is written."""
+        if not rerolls:
+            return
+
+        ids = [item["_id"] for item in rerolls]
+        stored = {
+            roll["_id"]: roll
+            async for roll in db.rolls.find({"_id": {"$in": ids}}, projection=REROLL_FIELDS)
+        }
+        for item in rerolls:
+            counts = Counter()
+            before = stored.get(item["_id"])
+            applied = before is None or before.get("reroll") == item["reroll"]
+            if not applied and (tally := RollTally.of(before)) is not None:
+                counts.update(tally.rerolled_to(item["reroll"]).counts())
+                counts.subtract(tally.counts())
+            item["counts"] = _encode_counts(counts)
+
+
+roll_log = RollLog(spool=spool)
@@ -0,0 +1,60 @@
+"""services/snapshot.py - Local BSON snapshots of the character cache."""
+
+import os
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.errors import BSONError
+from loguru import logger
+
+FORMAT = "inconnu-characters"
+VERSION = 1
+
+_CODEC = CodecOptions(tz_aware=True)
+
+type Snapshot = tuple[datetime, list[dict[str, Any]]]
+
+
+def write(path: str | Path, watermark: datetime, docs: Iterable[dict[str, Any]]):
+    """Write the documents after a header holding the watermark. Every
+    document modified at or after the watermark may be stale."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+
+    count = 0
+    with open(tmp, "wb") as f:
+        f.write(bson.encode({"format": FORMAT, "version": VERSION, "watermark": watermark}))
+        for doc in docs:
+            f.write(bson.encode(doc))
+            count += 1
+    os.replace(tmp, path)
+
+    logger.info("SNAPSHOT: Wrote {} characters to {}", count, path)
+
+
+def read(path: str | Path) -> Snapshot | None:
+    """Read a snapshot. Returns None if it's missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            docs = bson.decode_all(f.read(), _CODEC)
+    except FileNotFoundError:
+        logger.info("SNAPSHOT: No snapshot at {}", path)
+        return None
+    except (OSError, BSONError) as err:
+        logger.warning("SNAPSHOT: Unable to read {}: {}", path, err)
+        return None
+
+    if not docs:
+        logger.warning("SNAPSHOT: {} is empty", path)
+        return None
+
+    header, *docs = docs
+    if header.get("format") != FORMAT or header.get("version") != VERSION:
+        logger.warning("SNAPSHOT: {} has an unknown format", path)
+        return None
+
+    return header["watermark"], docs
@@ -0,0 +1,164 @@
+"""services/spool.py - A local, durable spool for writes MongoDB can't take."""
+
+import asyncio
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+import aiosqlite
+import bson
+from loguru import logger
+from pymongo.errors import PyMongoError
+
+from config import settings
+
+if TYPE_CHECKING:
+    from services.batchwriter import BatchWriter
+
+# Spooled batches replayed at a time
+REPLAY_BATCH = 20
+
+
+class Spool:
+    """Holds batches of non-critical writes in SQLite while MongoDB is
+    unreachable or slow, and replays them once it recovers.
+
+    Batches are kept per writer and replayed in the order they were spooled,
+    through the writer that spooled them. While a writer has batches in the
+    spool, its new batches join them, so that its writes stay in order.
+    Writers make their writes idempotent, so a batch replayed twice (say, if
+    the bot stops mid-replay) does no harm. Writers may note their progress
+    in a batch's items; a batch that fails again is kept as they left it."""
+
+    def __init__(self, location: str, retry_interval: float = 5):
+        self.location = location
+        self.retry_interval = retry_interval
+        self.db: aiosqlite.Connection | None = None
+
+        self._writers: dict[str, BatchWriter] = {}
+        self._sizes: Counter[str] = Counter()  # Spooled writes per writer
+        self._replayer: asyncio.Task | None = None
+
+    @property
+    def initialized(self) -> bool:
+        """Whether the spool is ready to hold writes."""
+        return self.db is not None
+
+    @property
+    def size(self) -> int:
+        """The number of spooled writes."""
+        return self._sizes.total()
+
+    def sizes(self) -> dict[str, int]:
+        """The number of spooled writes per writer."""
+        return {name: size for name, size in self._sizes.items() if size}
+
+    def register(self, name: str, writer: "BatchWriter"):
+        """Register a writer so that its spooled batches can be replayed."""
+        self._writers[name] = writer
+
+    def holding(self, name: str) -> bool:
+        """Whether the writer has batches waiting in the spool."""
+        return self._sizes[name] > 0
+
+    async def initialize(self):
+        """Open the spool. Replays anything left from the last run."""
+        if self.initialized:
+            logger.warning("SPOOL: Already initialized! ({})", self.location)
+            return
+
+        self.db = await aiosqlite.connect(self.location)
+        await self.db.execute("PRAGMA journal_mode = WAL")
+        await self.db.execute(
+            """
+                CREATE TABLE IF NOT EXISTS batches (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    writer TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    payload BLOB NOT NULL
+                )
+            """
+        )
+        await self.db.commit()
+
+        async with self.db.execute(
+            "SELECT writer, SUM(count) FROM batches GROUP BY writer"
+        ) as cursor:
+            async for writer, count in cursor:
+                self._sizes[writer] = count
+
+        logger.info("SPOOL: Initialized at {} ({} writes spooled)", self.location, self.size)
+        if self.size:
+            self._schedule()
+
+    async def append(self, name: str, items: list[dict[str, Any]]):
+        """Spool a writer's batch."""
+        assert self.db is not None
+        payload = bson.encode({"items": items})
+        await self.db.execute(
+            "INSERT INTO batches (writer, count, payload) VALUES (?, ?, ?)",
+            (name, len(items), payload),
+        )
+        await self.db.commit()
+
+        self._sizes[name] += len(items)
+        self._schedule()
+
+    async def replay(self) -> bool:
+        """Replay the spooled batches in order. Stops at the first batch that
+        can't be written yet. Returns True if the spool was emptied."""
+        assert self.db is not None
+        while self.size:
+            async with self.db.execute(
+                "SELECT seq, writer, count, payload FROM batches ORDER BY seq LIMIT ?",
+                (REPLAY_BATCH,),
+            ) as cursor:
+                rows = await cursor.fetchall()
+
+            for seq, name, count, payload in rows:
+                if (writer := self._writers.get(name)) is not None:
+                    items = bson.decode(payload)["items"]
+                    try:
+                        await writer.send(items)
+                    except PyMongoError:
+                        await self.db.execute(
+                            "UPDATE batches SET payload = ? WHERE seq = ?",
+                            (bson.encode({"items": items}), seq),
+                        )
+                        await self.db.commit()
+                        logger.info("SPOOL: Database still unavailable; {} spooled", self.size)
+                        return False
+                else:
+                    logger.error("SPOOL: Discarding {} writes for unknown writer {}", count, name)
+
+                await self.db.execute("DELETE FROM batches WHERE seq = ?", (seq,))
+                await self.db.commit()
+                self._sizes[name] -= count
+
+        logger.info("SPOOL: Replayed all spooled writes")
+        return True
+
+    async def close(self):
+        """Stop replaying and close the spool. Spooled writes are kept for the
+        next run."""
+        if self._replayer is not None:
+            self._replayer.cancel()
+            self._replayer = None
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+        logger.info("SPOOL: Closed ({} writes spooled)", self.size)
+
+    def _schedule(self):
+        """Make sure the spool will be replayed."""
+        if self._replayer is None or self._replayer.done():
+            self._replayer = asyncio.create_task(self._replay_periodically())
+
+    async def _replay_periodically(self):
+        """Retry the spool until it's empty."""
+        while True:
+            await asyncio.sleep(self.retry_interval)
+            if await self.replay():
+                return
+
+
+spool = Spool(settings.spool_loc)
@@ -0,0 +1,67 @@
+"""services/telemetry.py - Batched, write-behind usage logging."""
+
+from collections import defaultdict, deque
+from typing import Any
+
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import BulkWriteError
+
+import db
+from services.batchwriter import DUPLICATE_KEY, BatchWriter
+from services.spool import spool
+
+
+class Telemetry(BatchWriter):
+    """Queues documents nothing waits on, such as interaction and command
+    logs, and inserts them in batches. Documents are only ever inserted, so a
+    batch is grouped by collection and sent with insert_many().
+
+    Each document gets its ID when it's queued, so inserting it again is
+    harmless."""
+
+    label = "TELEMETRY"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._queue: deque[dict[str, Any]] = deque()
+
+    @property
+    def pending(self) -> int:
+        """The number of writes waiting to be sent."""
+        return len(self._queue)
+
+    def log(self, collection: str, document: dict[str, Any]):
+        """Queue a document for insertion into the named collection."""
+        if self._full():
+            return
+        document.setdefault("_id", ObjectId())
+        self._queue.append({"collection": collection, "document": document})
+        self._schedule()
+
+    def _take(self) -> list[dict[str, Any]]:
+        """Remove up to max_batch waiting documents."""
+        return [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+    async def _send(self, items: list[dict[str, Any]]):
+        """Insert the documents, grouped by collection."""
+        batch = defaultdict(list)
+        for item in items:
+            batch[item["collection"]].append(item["document"])
+
+        for collection, documents in batch.items():
+            try:
+                await getattr(db, collection).insert_many(documents, ordered=False)
+            except BulkWriteError as err:
+                errors = [e for e in err.details["writeErrors"] if e["code"] != DUPLICATE_KEY]
+                if errors:
+                    self.failed += len(errors)
+                    logger.error(
+                        "TELEMETRY: {} of {} {} writes failed",
+                        len(errors),
+                        len(documents),
+                        collection,
+                    )
+
+
+telemetry = Telemetry(spool=spool)
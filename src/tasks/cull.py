@@ -35,11 +35,14 @@ async def cull(days=30):
         {"$or": [{"guild": {"$in": removed_guilds}}, {"log.left": {"$lt": past}}]}
     )
 
+    culled = []
     async for character in characters:
-        await api.delete_character_faceclaims(character)
-        if await services.char_mgr.remove(character):
-            logger.info("Culling {}", character.name)
-        else:
-            logger.info("Unable to cull {}", character.name)
+        await api.delete_character_faceclaims(character, commit=False)
+        logger.info("Culling {}", character.name)
+        culled.append(character)
+
+    if culled:
+        count = await services.char_mgr.bulk_write(delete=culled)
+        logger.info("Culled {} of {} characters", count, len(culled))
 
     logger.info("Done culling")
@@ -18,6 +18,8 @@ async def remove_expired_images():
     expiration = discord.utils.utcnow() - timedelta(days=7)
     expired_user_ids = []
     api_tasks = []
+    owners = []
+    characters = []
     async for supporter in db.supporters.find({"discontinued": {"$lt": expiration}}):
         user_id = supporter["_id"]
         expired_user_ids.append(user_id)
@@ -25,13 +27,31 @@ async def remove_expired_images():
 
         for char in await services.char_mgr.fetchuser(user_id):
             logger.info("TASK: Removing images from {}", char.name)
-            api_tasks.append(api.delete_character_faceclaims(char))
+            api_tasks.append(api.delete_character_faceclaims(char, commit=False))
+            owners.append(user_id)
+            characters.append(char)
 
     logger.info(
         "TASK: Removing images from {} characters due to expired supporter status",
         len(api_tasks),
     )
     if api_tasks:
-        await asyncio.gather(*api_tasks)
+        results = await asyncio.gather(*api_tasks, return_exceptions=True)
+
+        # Supporters with a failed deletion stay on the list, so their images
+        # are retried on the next run
+        cleared = []
+        failed_users = set()
+        for owner, char, result in zip(owners, characters, results, strict=True):
+            if isinstance(result, Exception):
+                logger.error("TASK: Unable to remove {}'s images: {}", char.name, result)
+                failed_users.add(owner)
+            else:
+                cleared.append(char)
+
+        if cleared:
+            await services.char_mgr.bulk_write(cleared, lambda c: c.profile.images.clear())
+        expired_user_ids = [user_id for user_id in expired_user_ids if user_id not in failed_users]
+
     if expired_user_ids:
         await db.supporters.delete_many({"_id": {"$in": expired_user_ids}})
@@ -242,3 +242,57 @@ def test_update_trait(vampire: VChar):
     vampire.assign_traits({trait: 5})
     assert vampire.traits[0].rating == 5
     assert vampire.find_trait(trait).rating == 5
+
+
+def test_traits_read_only(vampire: VChar):
+    with pytest.raises(TypeError):
+        vampire.traits[0] = VCharTrait(name="Fakeo", rating=1, type=VCharTrait.Type.CUSTOM)
+    assert vampire.traits == vampire.raw_traits
+
+
+def test_trait_index_invalidated(empty_vampire: VChar):
+    empty_vampire.assign_traits({"Brawl": 2})
+    assert empty_vampire.find_trait("bra").name == "Brawl"
+
+    # Adding a trait that shares the prefix must be seen immediately
+    empty_vampire.assign_traits({"Bravado": 1})
+    with pytest.raises(errors.AmbiguousTraitError):
+        empty_vampire.find_trait("bra")
+
+    empty_vampire.delete_trait("Brawl")
+    assert empty_vampire.find_trait("bra").name == "Bravado"
+
+    empty_vampire.traits = []
+    with pytest.raises(errors.TraitNotFound):
+        empty_vampire.find_trait("bra")
+
+
+def test_trait_index_inherent(empty_vampire: VChar):
+    empty_vampire.assign_traits({"Humor": 2})
+    with pytest.raises(errors.AmbiguousTraitError):
+        empty_vampire.find_trait("hum")
+    assert empty_vampire.find_trait("huma").name == "Humanity"
+    assert not empty_vampire.has_trait("Humanity")
+
+
+def test_trait_lookup_casefolds(empty_vampire: VChar):
+    empty_vampire.assign_traits({"Straße": 2})
+    assert empty_vampire.find_trait("STRASSE", exact=True).name == "Straße"
+    assert empty_vampire.find_trait("stras").name == "Straße"
+    assert empty_vampire.has_trait("strasse")
+
+
+def test_trait_index_sees_in_place_changes(empty_vampire: VChar):
+    empty_vampire.assign_traits({"Brawl": 2, "Melee": 3})
+    assert empty_vampire.find_trait("bra").name == "Brawl"
+
+    empty_vampire.raw_traits[0].name = "Archery"
+    empty_vampire.raw_traits.sort(key=lambda t: t.name.casefold())
+    empty_vampire._traits_changed()
+    assert empty_vampire.find_trait("arch").name == "Archery"
+    with pytest.raises(errors.TraitNotFound):
+        empty_vampire.find_trait("bra")
+
+    empty_vampire.raw_traits[1] = VCharTrait(name="Mettle", rating=1, type=VCharTrait.Type.CUSTOM)
+    empty_vampire._traits_changed()
+    assert empty_vampire.find_trait("met").name == "Mettle"
@@ -21,6 +21,16 @@ def _patched_list_collection_names(self, filter=None, session=None, **kwargs):
 
 
 mongomock.Database.list_collection_names = _patched_list_collection_names
+
+# pymongo 4.11+ passes a sort kwarg to bulk updates that mongomock doesn't support
+_orig_add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+
+def _patched_add_update(self, *args, sort=None, **kwargs):
+    return _orig_add_update(self, *args, **kwargs)
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _patched_add_update
 os.environ["ADMIN_SERVER"] = "09876"
 os.environ["SUPPORTER_ROLE"] = "12345"
 os.environ["SUPPORTER_GUILD"] = "54321"
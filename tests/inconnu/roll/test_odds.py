@@ -0,0 +1,196 @@
+"""Tests for inconnu/roll/odds.py."""
+
+import itertools
+from collections import defaultdict
+from unittest.mock import patch
+
+import pytest
+
+import inconnu
+from inconnu.roll import odds
+from inconnu.roll.dicethrow import DiceThrow
+from inconnu.roll.odds import OUTCOMES, STRATEGIES, OddsTable, calculate
+
+# Every face within a bucket behaves identically for outcomes and rerolls, so
+# one representative face per bucket lets us enumerate rolls exhaustively.
+_FACES = {1: 0.1, 3: 0.4, 7: 0.4, 10: 0.1}
+
+
+def _can_reroll(roll: inconnu.Roll, strategy: str) -> bool:
+    """Whether the strategy applies, as /probability decides it."""
+    match strategy:
+        case "reroll_failures":
+            return roll.can_reroll_failures
+        case "maximize_criticals":
+            return roll.can_maximize_criticals
+        case "avoid_messy":
+            return roll.can_avoid_messy_critical
+        case _:
+            return roll.can_risky_messy_critical
+
+
+def _make_roll(pool, hunger, difficulty, normal, hungry) -> inconnu.Roll:
+    """Create a roll with fixed dice."""
+    roll = inconnu.Roll(pool, hunger, difficulty)
+    roll.normal = DiceThrow(list(normal))
+    roll.hunger = DiceThrow(list(hungry))
+    return roll
+
+
+def _enumerate(pool, hunger, difficulty, strategy) -> dict[str, float]:
+    """Exhaustively calculate the probabilities using Roll itself."""
+    probs = defaultdict(float)
+    normal_count = max(0, pool - hunger)
+
+    for faces in itertools.product(_FACES, repeat=pool):
+        chance = 1.0
+        for face in faces:
+            chance *= _FACES[face]
+        normal, hungry = faces[:normal_count], faces[normal_count:]
+
+        roll = _make_roll(pool, hunger, difficulty, normal, hungry)
+        if strategy is None or not _can_reroll(roll, strategy):
+            outcomes = [(roll, 1.0)]
+        else:
+            # Count the rerolled dice, then try every result for them
+            with patch("inconnu.d10", return_value=1) as d10:
+                roll.reroll(strategy)
+            outcomes = []
+            for rerolls in itertools.product(_FACES, repeat=d10.call_count):
+                roll = _make_roll(pool, hunger, difficulty, normal, hungry)
+                with patch("inconnu.d10", side_effect=rerolls):
+                    roll.reroll(strategy)
+                weight = 1.0
+                for face in rerolls:
+                    weight *= _FACES[face]
+                outcomes.append((roll, weight))
+
+        for roll, weight in outcomes:
+            probs[roll.outcome] += chance * weight
+            probs["total_successes"] += chance * weight * roll.total_successes
+            probs["margin"] += chance * weight * roll.margin
+
+    return probs
+
+
+@pytest.mark.parametrize("strategy", [None, *STRATEGIES])
+@pytest.mark.parametrize(
+    "pool,hunger,difficulty",
+    [
+        (1, 0, 0),
+        (1, 1, 1),
+        (2, 0, 2),
+        (2, 1, 1),
+        (2, 2, 3),
+        (3, 1, 2),
+        (3, 2, 4),
+        (4, 1, 3),
+        (4, 2, 5),
+        (4, 3, 2),
+    ],
+)
+def test_matches_exhaustive_enumeration(pool, hunger, difficulty, strategy):
+    """The analytic engine should match every possible roll exactly."""
+    expected = _enumerate(pool, hunger, difficulty, strategy)
+    probs = calculate(pool, hunger, difficulty, strategy)
+
+    for key in [*OUTCOMES, "total_successes", "margin"]:
+        assert probs[key] == pytest.approx(expected[key], abs=1e-12), key
+
+
+@pytest.mark.parametrize("strategy", [None, *STRATEGIES])
+def test_large_pool_sums_to_one(strategy):
+    """Outcomes are exhaustive and mutually exclusive."""
+    probs = calculate(100, 10, 40, strategy, max_hunger=10)
+    assert sum(probs[outcome] for outcome in OUTCOMES) == pytest.approx(1)
+
+
+def test_impossible_outcomes_are_zero():
+    """Outcomes that can't happen should be exactly zero."""
+    probs = calculate(1, 0, 1)
+    assert probs["messy"] == 0
+    assert probs["critical"] == 0
+    assert probs["bestial"] == 0
+    assert probs["fail"] == 0
+    assert probs["total_fail"] == pytest.approx(0.5)
+
+
+def test_hunger_exceeding_pool():
+    """Hunger dice can't exceed the pool."""
+    assert calculate(2, 4, 1) == calculate(2, 2, 1)
+
+
+@pytest.mark.parametrize(
+    "pool,hunger,difficulty,strategy",
+    [
+        (101, 0, 0, None),
+        (5, 6, 0, None),
+        (5, -1, 0, None),
+        (5, 0, -1, None),
+        (5, 0, 0, "fake"),
+    ],
+)
+def test_invalid_input(pool, hunger, difficulty, strategy):
+    """Invalid rolls raise the same errors as Roll."""
+    with pytest.raises(ValueError):
+        calculate(pool, hunger, difficulty, strategy)
+
+
+# Precalculated table
+
+
+@pytest.fixture
+def table(tmp_path):
+    """A small table covering pools 1-4, Hunger 0-2, and difficulties 0-3."""
+    path = tmp_path / "odds.bin"
+    odds.write_table(path, (odds.table_rows(pool, 2, 3) for pool in range(1, 5)), 4, 2, 3)
+
+    table = OddsTable.load(path)
+    yield table
+    table.close()
+
+
+def test_table_matches_calculation(table):
+    """Table entries should match the engine to float32 precision."""
+    assert len(table) == 4 * 3 * 4 * 5
+
+    for pool, hunger, difficulty in itertools.product(range(1, 5), range(3), range(4)):
+        for strategy in [None, *STRATEGIES]:
+            expected = calculate(pool, hunger, difficulty, strategy)
+            probs = table.get(pool, hunger, difficulty, strategy)
+            assert probs is not None
+            assert probs == pytest.approx(expected, abs=1e-6)
+
+
+@pytest.mark.parametrize("pool,hunger,difficulty", [(5, 0, 0), (1, 3, 0), (1, 0, 4)])
+def test_table_out_of_range(table, pool, hunger, difficulty):
+    """Rolls the table doesn't cover aren't looked up."""
+    assert table.get(pool, hunger, difficulty, None) is None
+
+
+def test_calculate_uses_table(table, monkeypatch):
+    """calculate() should answer from the table when it can."""
+    monkeypatch.setattr(odds, "_table", table)
+    with patch("inconnu.roll.odds._calculate") as mock_calculate:
+        calculate(3, 1, 2, "risky")
+        mock_calculate.assert_not_called()
+
+        calculate(10, 1, 2, "risky")
+        mock_calculate.assert_called_once()
+
+
+def test_load_table_missing(tmp_path, monkeypatch):
+    """A missing table falls back to calculating."""
+    monkeypatch.setattr(odds, "_table", None)
+    assert not odds.load_table(tmp_path / "missing.bin")
+    assert odds._table is None
+
+
+def test_load_table_invalid(tmp_path, monkeypatch):
+    """A corrupt table is ignored."""
+    path = tmp_path / "odds.bin"
+    path.write_bytes(b"not a table")
+
+    monkeypatch.setattr(odds, "_table", None)
+    assert not odds.load_table(path)
+    assert odds._table is None
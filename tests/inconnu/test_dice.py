@@ -0,0 +1,60 @@
+"""Tests for inconnu/dice.py."""
+
+from array import array
+
+import pytest
+
+from inconnu.dice import d10, d10_array, fill_d10, histogram
+
+
+def test_d10_single():
+    """A single d10 is an int from 1-10."""
+    for _ in range(100):
+        assert 1 <= d10() <= 10
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 100, 10_000])
+def test_d10_list(count: int):
+    """Bulk d10s are a list of the right size with valid faces."""
+    dice = d10(count)
+    assert isinstance(dice, list)
+    assert len(dice) == count
+    assert all(1 <= die <= 10 for die in dice)
+
+
+def test_d10_array():
+    """d10_array() returns a uint8 array."""
+    dice = d10_array(50)
+    assert dice.typecode == "B"
+    assert len(dice) == 50
+    assert set(dice) <= set(range(1, 11))
+
+
+@pytest.mark.parametrize("buffer", [bytearray(20), array("B", bytes(20))])
+def test_fill_d10(buffer):
+    """fill_d10() fills the given buffer in place."""
+    result = fill_d10(buffer)
+    assert result is buffer
+    assert all(1 <= die <= 10 for die in buffer)
+
+
+def test_d10_distribution():
+    """Every face should come up about equally often."""
+    counts = histogram(d10_array(100_000))
+    assert sum(counts) == 100_000
+    for count in counts:
+        assert 9_000 < count < 11_000
+
+
+@pytest.mark.parametrize(
+    "dice,expected",
+    [
+        ([], [0] * 10),
+        ([1, 10, 10, 3], [1, 0, 1, 0, 0, 0, 0, 0, 0, 2]),
+        (array("B", [5, 5, 6]), [0, 0, 0, 0, 2, 1, 0, 0, 0, 0]),
+        (bytes([7, 8, 9]), [0, 0, 0, 0, 0, 0, 1, 1, 1, 0]),
+    ],
+)
+def test_histogram(dice, expected):
+    """histogram() counts faces from lists and buffers alike."""
+    assert histogram(dice) == expected
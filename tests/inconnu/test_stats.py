@@ -0,0 +1,128 @@
+"""Tests for inconnu/stats.py roll statistics."""
+
+from collections.abc import AsyncGenerator
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import db
+import inconnu
+import services
+from services.rolllog import RollLog
+
+DAY = datetime(2026, 3, 14)
+
+
+@pytest.fixture
+async def database() -> AsyncGenerator[Any, None]:
+    """Mock rolls and roll_stats collections, and an empty roll log."""
+    database = AsyncMongoMockClient().test
+    with (
+        patch.object(db, "rolls", database.rolls),
+        patch.object(db, "roll_stats", database.roll_stats),
+        patch.object(db, "trait_stats", database.trait_stats),
+        patch("services.roll_log", RollLog()),
+    ):
+        yield database
+
+
+async def add_roll(database, charid, message: int, channel=1, **fields) -> dict:
+    roll = {
+        "_id": ObjectId(),
+        "date": DAY.replace(hour=12),
+        "channel": channel,
+        "message": message,
+        "charid": charid,
+        "difficulty": 2,
+        "margin": 1,
+        "outcome": "success",
+        "traits": ["Wits"],
+        "reroll": None,
+        "use_in_stats": True,
+    } | fields
+    await database.rolls.insert_one(roll)
+    counted = 1 if roll["use_in_stats"] else 0
+    await database.roll_stats.update_one(
+        {"charid": charid, "day": DAY, "outcome": roll["outcome"], "rerolled": False},
+        {"$inc": {"count": counted}},
+        upsert=True,
+    )
+    await database.trait_stats.update_one(
+        {"charid": charid, "trait": "Wits", "day": DAY},
+        {"$inc": {"successes": counted * 3}},
+        upsert=True,
+    )
+    return roll
+
+
+async def counts(database) -> dict[str, int]:
+    """Rolls per outcome, and successes for the Wits trait."""
+    counts = {bucket["outcome"]: bucket["count"] async for bucket in database.roll_stats.find()}
+    async for bucket in database.trait_stats.find():
+        counts[bucket["trait"]] = bucket["successes"]
+    return counts
+
+
+async def test_toggle_roll_stats(database):
+    charid = ObjectId()
+    await add_roll(database, charid, 1)
+
+    assert await inconnu.stats.toggle_roll_stats(1) is False
+    assert await counts(database) == {"success": 0, "Wits": 0}
+
+    assert await inconnu.stats.toggle_roll_stats(1) is True
+    assert await counts(database) == {"success": 1, "Wits": 3}
+
+    assert await inconnu.stats.toggle_roll_stats(2) is None
+
+
+async def test_reroll_after_toggle_off(database):
+    """A roll taken out of statistics stays out when it's rerolled."""
+    charid = ObjectId()
+    roll = await add_roll(database, charid, 1)
+    assert await inconnu.stats.toggle_roll_stats(1) is False
+
+    outcome = SimpleNamespace(
+        id=roll["_id"],
+        strategy="criticals",
+        normal=SimpleNamespace(dice=[10, 10]),
+        margin=4,
+        outcome="critical",
+    )
+    inconnu.stats.log_roll(1, 1, 1, 1, SimpleNamespace(id=charid), outcome, "")
+    await services.roll_log.flush()
+    assert await counts(database) == {"success": 0, "Wits": 0}
+
+    # Back in, it counts as rerolled
+    assert await inconnu.stats.toggle_roll_stats(1) is True
+    assert await counts(database) == {"success": 0, "critical": 1, "Wits": 6}
+
+
+async def test_roll_message_deleted(database):
+    charid = ObjectId()
+    await add_roll(database, charid, 1)
+    await add_roll(database, charid, 2, outcome="fail")
+    await add_roll(database, charid, 3, outcome="fail")
+    await add_roll(database, charid, 4, outcome="messy", use_in_stats=False)
+
+    # Already removed rolls aren't removed again
+    await inconnu.stats.roll_message_deleted(1, 2, 4)
+    await inconnu.stats.roll_message_deleted(2)
+
+    assert await counts(database) == {"success": 0, "fail": 1, "messy": 0, "Wits": 3}
+    assert await database.rolls.count_documents({"use_in_stats": True}) == 1
+
+
+async def test_delete_rolls_in_channel(database):
+    charid = ObjectId()
+    await add_roll(database, charid, 1, channel=10)
+    await add_roll(database, charid, 2, channel=10)
+    await add_roll(database, charid, 3, channel=20)
+
+    await inconnu.stats.delete_rolls_in_channel(SimpleNamespace(id=10))
+    assert await counts(database) == {"success": 1, "Wits": 3}
@@ -0,0 +1,136 @@
+"""Tests for inconnu/reference/statistics.py."""
+
+import sys
+from collections.abc import AsyncGenerator
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import db
+import inconnu.reference.statistics  # noqa: F401
+
+# The package re-exports the command under the module's name
+_statistics = sys.modules["inconnu.reference.statistics"]
+tally_outcomes = getattr(_statistics, "__tally_outcomes")
+tally_successes = getattr(_statistics, "__tally_successes")
+
+
+@pytest.fixture
+async def database() -> AsyncGenerator[Any, None]:
+    """Mock rolls and roll_stats collections."""
+    database = AsyncMongoMockClient().test
+    with (
+        patch.object(db, "rolls", database.rolls),
+        patch.object(db, "roll_stats", database.roll_stats),
+        patch.object(db, "trait_stats", database.trait_stats),
+    ):
+        yield database
+
+
+def char(name: str) -> SimpleNamespace:
+    return SimpleNamespace(id=ObjectId(), raw_name=name)
+
+
+async def add_bucket(database, charid, day: datetime, outcome: str, rerolled=False, count=1):
+    await database.roll_stats.insert_one(
+        {"charid": charid, "day": day, "outcome": outcome, "rerolled": rerolled, "count": count}
+    )
+
+
+async def add_roll(database, charid, date: datetime, outcome: str, **fields):
+    await database.rolls.insert_one(
+        {
+            "charid": charid,
+            "date": date,
+            "difficulty": 2,
+            "margin": 0,
+            "outcome": outcome,
+            "traits": [],
+            "reroll": None,
+            "use_in_stats": True,
+        }
+        | fields
+    )
+
+
+async def test_no_characters(database):
+    assert await tally_outcomes([], datetime(2020, 1, 1)) == []
+
+
+async def test_lifetime(database):
+    nadea, abigail, idle = char("Nadea"), char("Abigail"), char("Idle")
+    await add_bucket(database, nadea.id, datetime(2024, 5, 1), "success", count=3)
+    await add_bucket(database, nadea.id, datetime(2025, 5, 1), "success", count=2)
+    await add_bucket(database, nadea.id, datetime(2025, 5, 1), "critical", rerolled=True)
+    await add_bucket(database, abigail.id, datetime(2025, 5, 1), "bestial", count=0)
+    await add_bucket(database, abigail.id, datetime(2025, 5, 2), "messy")
+    await add_bucket(database, ObjectId(), datetime(2025, 5, 2), "messy")
+
+    results = await tally_outcomes([nadea, abigail, idle], datetime(2020, 1, 1))
+    assert results == [
+        {"_id": abigail.id, "name": "Abigail", "rerolls": 0, "outcomes": {"messy": 1}},
+        {
+            "_id": nadea.id,
+            "name": "Nadea",
+            "rerolls": 1,
+            "outcomes": {"success": 5, "critical": 1},
+        },
+    ]
+
+
+async def test_partial_first_day(database):
+    """The first day is counted from the rolls after the cutoff."""
+    nadea = char("Nadea")
+    cutoff = datetime(2025, 5, 1, 19)
+
+    # Before the cutoff's day and within it; the rollups aren't used for it
+    await add_bucket(database, nadea.id, datetime(2025, 4, 30), "fail")
+    await add_bucket(database, nadea.id, datetime(2025, 5, 1), "fail", count=2)
+    await add_roll(database, nadea.id, datetime(2025, 5, 1, 18), "fail")
+    await add_roll(database, nadea.id, datetime(2025, 5, 1, 20), "fail")
+    await add_roll(database, nadea.id, datetime(2025, 5, 1, 21), "fail", use_in_stats=False)
+    await add_roll(
+        database,
+        nadea.id,
+        datetime(2025, 5, 1, 22),
+        "fail",
+        reroll={"outcome": "success", "margin": 1},
+    )
+    await add_bucket(database, nadea.id, datetime(2025, 5, 2), "success", count=4)
+
+    results = await tally_outcomes([nadea], cutoff)
+    assert results == [
+        {
+            "_id": nadea.id,
+            "name": "Nadea",
+            "rerolls": 1,
+            "outcomes": {"fail": 1, "success": 5},
+        }
+    ]
+
+
+async def test_tally_successes(database):
+    nadea = char("Nadea")
+    cutoff = datetime(2025, 5, 1, 19)
+
+    async def add_trait(trait: str, day: datetime, successes: int, charid=nadea.id):
+        await database.trait_stats.insert_one(
+            {"charid": charid, "trait": trait, "day": day, "successes": successes}
+        )
+
+    await add_trait("Wits", datetime(2025, 5, 1), 10)  # Covered by the rolls
+    await add_trait("Wits", datetime(2025, 5, 2), 3)
+    await add_trait("Brawl.Grappling", datetime(2025, 5, 3), 2)
+    await add_trait("Brawl", datetime(2025, 5, 3), 1)
+    await add_trait("Wits", datetime(2025, 5, 3), 7, charid=ObjectId())
+    await add_roll(database, nadea.id, datetime(2025, 5, 1, 18), "fail", traits=["Wits"])
+    await add_roll(database, nadea.id, datetime(2025, 5, 1, 20), "success", traits=["Wits"])
+
+    assert await tally_successes(nadea, cutoff) == {"Wits": 5, "Brawl": 3}
+    assert await tally_successes(nadea, datetime(2025, 5, 3)) == {"Brawl": 3}
+    assert await tally_successes(nadea, datetime(2025, 5, 4)) == {}
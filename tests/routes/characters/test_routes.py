@@ -1,5 +1,6 @@
 """Tests for character API routes."""
 
+import json
 from typing import cast
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -11,11 +12,13 @@ from mongomock_motor import AsyncMongoMockClient
 from pymongo import AsyncMongoClient
 
 import db as database
+import services
 from config import settings
 from constants import Damage
 from errors import DuplicateCharacterError
 from models import VChar
 from models.vchardocs import VCharSplat, VCharTrait
+from routes import botdata
 from routes.characters.models import OwnerData
 from server import app
 from services import guild_cache
@@ -155,7 +158,7 @@ def mock_bot():
     # Mock get_or_fetch_guild for premium checks (returns None by default)
     bot.get_or_fetch_guild = AsyncMock(return_value=None)
 
-    with patch("routes.characters.routes.inconnu.bot", bot):
+    with patch("routes.botdata.inconnu.bot", bot):
         yield bot
 
 
@@ -163,8 +166,8 @@ def mock_bot():
 def mock_wizard_cache_pop():
     """Mock wizard_cache.get and delete for character creation tests."""
     with (
-        patch("routes.characters.routes.wizard_cache.get") as mock_get,
-        patch("routes.characters.routes.wizard_cache.delete") as mock_delete,
+        patch("services.wizard_cache.get") as mock_get,
+        patch("services.wizard_cache.delete") as mock_delete,
     ):
         yield mock_get, mock_delete
 
@@ -172,28 +175,28 @@ def mock_wizard_cache_pop():
 @pytest.fixture
 def mock_wizard_cache_get():
     """Mock wizard_cache.get for wizard endpoint tests."""
-    with patch("routes.characters.routes.wizard_cache.get") as mock:
+    with patch("services.wizard_cache.get") as mock:
         yield mock
 
 
 @pytest.fixture
 def mock_char_mgr_register():
     """Mock char_mgr.register for character creation tests."""
-    with patch("routes.characters.routes.char_mgr.register", new_callable=AsyncMock) as mock:
+    with patch("services.char_mgr.register", new_callable=AsyncMock) as mock:
         yield mock
 
 
 @pytest.fixture
 def mock_char_mgr_fetchuser():
     """Mock char_mgr.fetchuser for character list tests."""
-    with patch("routes.characters.routes.char_mgr.fetchuser", new_callable=AsyncMock) as mock:
+    with patch("services.char_mgr.fetchuser", new_callable=AsyncMock) as mock:
         yield mock
 
 
 @pytest.fixture
 def mock_char_mgr_fetchid():
     """Mock char_mgr.fetchid for character fetch tests."""
-    with patch("routes.characters.routes.char_mgr.fetchid", new_callable=AsyncMock) as mock:
+    with patch("services.char_mgr.fetchid", new_callable=AsyncMock) as mock:
         yield mock
 
 
@@ -206,23 +209,31 @@ def mock_guild_fetch():
 
 @pytest.fixture
 def mock_char_mgr_fetchguild():
-    """Mock char_mgr.fetchguild for guild character tests."""
-    with patch("routes.characters.routes.char_mgr.fetchguild", new_callable=AsyncMock) as mock:
+    """Mock char_mgr.fetchguild for guild character tests. Rosters' pages
+    look their characters up by ID, so fetchid() finds the same ones."""
+
+    def fetchid(oid):
+        return next((char for char in mock.return_value if char.id_str == str(oid)), None)
+
+    with (
+        patch("services.char_mgr.fetchguild", new_callable=AsyncMock) as mock,
+        patch("services.char_mgr.fetchid", new=AsyncMock(side_effect=fetchid)),
+    ):
         yield mock
 
 
 @pytest.fixture
-def mock_owner_data_create():
-    """Mock OwnerData.fetch for guild character tests."""
-    with patch("routes.characters.models.OwnerData.fetch", new_callable=AsyncMock) as mock:
+def mock_owner_data_fetch_many():
+    """Mock OwnerData.fetch_many for guild character tests."""
+    with patch("routes.characters.models.OwnerData.fetch_many", new_callable=AsyncMock) as mock:
         yield mock
 
 
 @pytest.fixture
-def mock_char_mgr_countguild():
-    """Mock char_mgr.countguild for character list tests."""
-    with patch("routes.characters.routes.char_mgr.countguild", new_callable=AsyncMock) as mock:
-        mock.return_value = 0
+def mock_char_mgr_countguilds():
+    """Mock char_mgr.countguilds for character list tests."""
+    with patch("services.char_mgr.countguilds", new_callable=AsyncMock) as mock:
+        mock.side_effect = lambda guild_ids: dict.fromkeys(guild_ids, 0)
         yield mock
 
 
@@ -1175,7 +1186,7 @@ async def test_get_wizard_missing_api_key():
 
 
 async def test_get_character_list_success(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """User in multiple guilds with characters and SPCs."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1214,7 +1225,7 @@ async def test_get_character_list_success(
 
 
 async def test_get_character_list_user_in_guilds_without_characters(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """User in multiple guilds but only has characters in one."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1243,7 +1254,7 @@ async def test_get_character_list_user_in_guilds_without_characters(
 
 
 async def test_get_character_list_filters_left_guilds(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """Characters in guilds user has left are not returned."""
     guild1 = make_mock_guild(1, "Current Guild", user_is_member=True)
@@ -1268,7 +1279,7 @@ async def test_get_character_list_filters_left_guilds(
 
 
 async def test_get_character_list_no_guilds(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """User not in any guilds returns empty lists."""
     # Bot is in guilds, but user is not a member of any
@@ -1286,7 +1297,7 @@ async def test_get_character_list_no_guilds(
 
 
 async def test_get_character_list_no_characters(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """User in guilds but has no characters, SPC exists."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1308,7 +1319,7 @@ async def test_get_character_list_no_characters(
 
 
 async def test_get_character_list_multiple_characters_same_guild(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """Multiple characters in same guild, guild not duplicated."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1333,8 +1344,30 @@ async def test_get_character_list_multiple_characters_same_guild(
             assert char["guild"]["id"] == "1"
 
 
+async def test_get_character_list_pages(
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
+):
+    """Characters cross from the bot a page at a time, in order."""
+    await populate_guild_cache([make_mock_guild(1, "Guild 1")])
+    chars = [make_mock_char(1, TEST_USER_ID, f"Character {n}") for n in range(5)]
+    mock_char_mgr_fetchuser.return_value = chars
+
+    page = AsyncMock(wraps=botdata.user_character_page)
+    with (
+        patch("routes.characters.routes.CHARACTER_PAGE_SIZE", 2),
+        patch.object(botdata, "user_character_page", page),
+    ):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/characters", headers=auth_headers)
+
+    assert response.status_code == 200
+    names = [char["character"]["name"] for char in response.json()["characters"]]
+    assert names == [char.name for char in chars]
+    assert [len(call.args[1]) for call in page.await_args_list] == [2, 2, 1]
+
+
 async def test_get_character_list_filters_left_characters(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """Characters marked as left are filtered out."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1356,7 +1389,7 @@ async def test_get_character_list_filters_left_characters(
 
 
 async def test_get_character_list_guild_counts(
-    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguild
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
 ):
     """Guild character counts are included in the response."""
     guild1 = make_mock_guild(1, "Guild 1")
@@ -1364,10 +1397,8 @@ async def test_get_character_list_guild_counts(
     await populate_guild_cache([guild1, guild2])
 
     # Return different counts per guild
-    async def countguild(guild_id):
-        return {1: 5, 2: 12}.get(guild_id, 0)
-
-    mock_char_mgr_countguild.side_effect = countguild
+    mock_char_mgr_countguilds.side_effect = None
+    mock_char_mgr_countguilds.return_value = {1: 5, 2: 12}
 
     char1 = make_mock_char(1, TEST_USER_ID, "Character 1")
     char2 = make_mock_char(2, TEST_USER_ID, "Character 2")
@@ -1430,11 +1461,9 @@ async def test_get_character_profile_success_non_spc(mock_char_mgr_fetchid, char
     owner = OwnerData(id=str(TEST_USER_ID), name="Test User", icon="http://avatar.png")
 
     with (
+        patch("services.wizard.CharacterGuild.fetch", new_callable=AsyncMock) as mock_guild_fetch,
         patch(
-            "routes.characters.routes.CharacterGuild.fetch", new_callable=AsyncMock
-        ) as mock_guild_fetch,
-        patch(
-            "routes.characters.routes.OwnerData.fetch", new_callable=AsyncMock
+            "routes.characters.models.OwnerData.fetch", new_callable=AsyncMock
         ) as mock_owner_create,
     ):
         mock_guild_fetch.return_value = character_guild
@@ -1487,9 +1516,7 @@ async def test_get_character_profile_success_spc(mock_char_mgr_fetchid, characte
     mock_char_mgr_fetchid.return_value = mock_char
 
     # Mock CharacterGuild.fetch
-    with patch(
-        "routes.characters.routes.CharacterGuild.fetch", new_callable=AsyncMock
-    ) as mock_guild_fetch:
+    with patch("services.wizard.CharacterGuild.fetch", new_callable=AsyncMock) as mock_guild_fetch:
         mock_guild_fetch.return_value = character_guild
 
         async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
@@ -1615,7 +1642,7 @@ async def test_get_guild_characters_user_not_member(auth_headers):
 
 
 async def test_get_guild_characters_success(
-    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_create
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
 ):
     """Returns all active characters with owner data."""
     guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
@@ -1629,7 +1656,7 @@ async def test_get_guild_characters_success(
     # Mock owner data creation
     owner1 = OwnerData(id=str(TEST_USER_ID), name="User1", icon="http://icon1.png")
     owner2 = OwnerData(id="111111", name="User2", icon="http://icon2.png")
-    mock_owner_data_create.side_effect = [owner1, owner2]
+    mock_owner_data_fetch_many.return_value = {TEST_USER_ID: owner1, 111111: owner2}
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         response = await client.get(f"/characters/guild/{TEST_GUILD_ID}", headers=auth_headers)
@@ -1665,6 +1692,12 @@ async def test_get_guild_characters_success(
         assert chars[2]["spc"] is True
         assert chars[2]["owner"] is None
 
+    # Owners are resolved in one batch, without the SPC owner
+    mock_owner_data_fetch_many.assert_awaited_once()
+    guild_id, user_ids = mock_owner_data_fetch_many.await_args.args
+    assert guild_id == TEST_GUILD_ID
+    assert list(user_ids) == [TEST_USER_ID, 111111]
+
 
 async def test_get_guild_characters_empty_guild(auth_headers, mock_char_mgr_fetchguild):
     """Empty guild returns empty list."""
@@ -1685,7 +1718,7 @@ async def test_get_guild_characters_empty_guild(auth_headers, mock_char_mgr_fetc
 
 
 async def test_get_guild_characters_multiple_owners(
-    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_create
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
 ):
     """Guild with characters from different users."""
     guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
@@ -1699,7 +1732,7 @@ async def test_get_guild_characters_multiple_owners(
     owner1 = OwnerData(id="100", name="User1", icon="http://icon1.png")
     owner2 = OwnerData(id="200", name="User2", icon="http://icon2.png")
     owner3 = OwnerData(id="300", name="User3", icon="http://icon3.png")
-    mock_owner_data_create.side_effect = [owner1, owner2, owner3]
+    mock_owner_data_fetch_many.return_value = {100: owner1, 200: owner2, 300: owner3}
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         response = await client.get(f"/characters/guild/{TEST_GUILD_ID}", headers=auth_headers)
@@ -1719,7 +1752,7 @@ async def test_get_guild_characters_multiple_owners(
 
 
 async def test_get_guild_characters_filters_left(
-    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_create
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
 ):
     """Characters marked as left are excluded."""
     guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
@@ -1731,7 +1764,7 @@ async def test_get_guild_characters_filters_left(
     mock_char_mgr_fetchguild.return_value = [char_active, char_left, char_active2]
 
     owner = OwnerData(id=str(TEST_USER_ID), name="User", icon="http://icon.png")
-    mock_owner_data_create.side_effect = [owner, owner]
+    mock_owner_data_fetch_many.return_value = {TEST_USER_ID: owner}
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         response = await client.get(f"/characters/guild/{TEST_GUILD_ID}", headers=auth_headers)
@@ -1746,7 +1779,7 @@ async def test_get_guild_characters_filters_left(
 
 
 async def test_get_guild_characters_filters_missing_owners(
-    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_create
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
 ):
     """Characters whose owners can't be found are excluded."""
     guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
@@ -1759,8 +1792,8 @@ async def test_get_guild_characters_filters_missing_owners(
 
     owner1 = OwnerData(id="100", name="User1", icon="http://icon1.png")
     owner3 = OwnerData(id="300", name="User3", icon="http://icon3.png")
-    # char2's owner returns None (can't be found)
-    mock_owner_data_create.side_effect = [owner1, None, owner3]
+    # char2's owner can't be found
+    mock_owner_data_fetch_many.return_value = {100: owner1, 300: owner3}
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         response = await client.get(f"/characters/guild/{TEST_GUILD_ID}", headers=auth_headers)
@@ -1775,7 +1808,7 @@ async def test_get_guild_characters_filters_missing_owners(
 
 
 async def test_get_guild_characters_mixed_filtering(
-    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_create
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
 ):
     """Guild with active chars, left chars, and chars with missing owners."""
     guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
@@ -1797,8 +1830,8 @@ async def test_get_guild_characters_mixed_filtering(
     owner1 = OwnerData(id="100", name="User1", icon="http://icon1.png")
     owner4 = OwnerData(id="400", name="User4", icon="http://icon4.png")
     # char_left is filtered before owner creation
-    # char_missing_owner's owner returns None
-    mock_owner_data_create.side_effect = [owner1, None, owner4]
+    # char_missing_owner's owner can't be found
+    mock_owner_data_fetch_many.return_value = {100: owner1, 400: owner4}
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         response = await client.get(f"/characters/guild/{TEST_GUILD_ID}", headers=auth_headers)
@@ -1858,3 +1891,254 @@ async def test_get_guild_characters_only_spcs(auth_headers, mock_char_mgr_fetchg
             assert char["type"] == "public"
             assert char["owner"] is None
             assert "spc" not in char["character"]  # PublicCharacter doesn't have spc
+
+
+# Conditional GET tests
+
+
+async def test_get_character_not_modified(auth_headers, mock_char_mgr_fetchid, owner_data):
+    """A client with the current ETag gets a 304 without the response being
+    built."""
+    mock_char = make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "Test Character")
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test Guild")])
+    mock_char_mgr_fetchid.return_value = mock_char
+
+    with patch(
+        "routes.characters.models.OwnerData.fetch", new_callable=AsyncMock
+    ) as mock_owner_fetch:
+        mock_owner_fetch.return_value = owner_data
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(f"/characters/{mock_char.id}", headers=auth_headers)
+            assert response.status_code == 200
+            etag = response.headers["ETag"]
+            assert etag.startswith('"') and etag.endswith('"')
+            body = response.json()
+
+            conditional = auth_headers | {"If-None-Match": etag}
+            response = await client.get(f"/characters/{mock_char.id}", headers=conditional)
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+            assert response.content == b""
+            mock_owner_fetch.assert_awaited_once()
+
+            # Other clients get the memoized body
+            response = await client.get(f"/characters/{mock_char.id}", headers=auth_headers)
+            assert response.status_code == 200
+            assert response.json() == body
+            mock_owner_fetch.assert_awaited_once()
+
+            # Once the character is updated, the old ETag is stale
+            mock_char.pre_update()
+            response = await client.get(f"/characters/{mock_char.id}", headers=conditional)
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+            assert mock_owner_fetch.await_count == 2
+
+
+async def test_get_character_etag_depends_on_view(
+    auth_headers, mock_bot, mock_char_mgr_fetchid, owner_data
+):
+    """The owner's full view and a member's public view have different ETags."""
+    owner = MagicMock(spec=discord.Member)
+    owner.id = 111111
+    owner.display_name = "Owner"
+    owner.guild_avatar = None
+    owner.display_avatar.url = "http://owner.png"
+    guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
+    owner.guild = guild
+    guild.members.append(owner)
+    await populate_guild_cache([guild])
+
+    mock_char = make_mock_char(TEST_GUILD_ID, owner.id, "Test Character")
+    mock_char_mgr_fetchid.return_value = mock_char
+
+    with patch("routes.characters.models.OwnerData.fetch", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = owner_data
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            public = await client.get(f"/characters/{mock_char.id}", headers=auth_headers)
+            owner_headers = auth_headers | {"X-Discord-User-ID": str(owner.id)}
+            full = await client.get(f"/characters/{mock_char.id}", headers=owner_headers)
+
+            # The public ETag doesn't unlock the full view
+            owner_headers["If-None-Match"] = public.headers["ETag"]
+            response = await client.get(f"/characters/{mock_char.id}", headers=owner_headers)
+
+    assert public.json()["type"] == "public"
+    assert full.json()["type"] == "full"
+    assert public.headers["ETag"] != full.headers["ETag"]
+    assert response.status_code == 200
+    assert response.json()["type"] == "full"
+
+
+async def test_get_character_not_modified_requires_access(auth_headers, mock_char_mgr_fetchid):
+    """A stale ETag doesn't get a non-member past the membership check."""
+    mock_char = make_mock_char(TEST_GUILD_ID, 999999, "Test Character")
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test", user_is_member=False)])
+    mock_char_mgr_fetchid.return_value = mock_char
+
+    headers = auth_headers | {"If-None-Match": "*"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/characters/{mock_char.id}", headers=headers)
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+async def test_get_guild_characters_etag(
+    auth_headers, mock_char_mgr_fetchguild, mock_owner_data_fetch_many
+):
+    """The roster's ETag changes with its characters and members."""
+    guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
+    await populate_guild_cache([guild])
+
+    char = make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "Character 1")
+    mock_char_mgr_fetchguild.return_value = [char]
+    owner = OwnerData(id=str(TEST_USER_ID), name="User1", icon="http://icon1.png")
+    mock_owner_data_fetch_many.return_value = {TEST_USER_ID: owner}
+
+    url = f"/characters/guild/{TEST_GUILD_ID}"
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+
+        async def etag_changed(etag: str) -> bool:
+            response = await client.get(url, headers=auth_headers | {"If-None-Match": etag})
+            return response.status_code == 200
+
+        etag = (await client.get(url, headers=auth_headers)).headers["ETag"]
+        assert not await etag_changed(etag)
+
+        char.pre_update()
+        assert await etag_changed(etag)
+        etag = (await client.get(url, headers=auth_headers)).headers["ETag"]
+
+        mock_char_mgr_fetchguild.return_value = [
+            char,
+            make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "Character 2"),
+        ]
+        assert await etag_changed(etag)
+        etag = (await client.get(url, headers=auth_headers)).headers["ETag"]
+
+        # The owner's display name is part of the response
+        guild.members[0].display_name = "Renamed"
+        await guild_cache.upsert_members(guild.members[0])
+        assert await etag_changed(etag)
+
+
+async def test_get_character_list_etag(
+    auth_headers, mock_char_mgr_fetchuser, mock_char_mgr_countguilds
+):
+    """The character list's ETag changes when a guild's roster does."""
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test Guild")])
+    char = make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "Character 1")
+    mock_char_mgr_fetchuser.return_value = [char]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/characters", headers=auth_headers)
+        etag = response.headers["ETag"]
+        headers = auth_headers | {"If-None-Match": f'W/"other", {etag}'}
+
+        response = await client.get("/characters", headers=headers)
+        assert response.status_code == 304
+
+        # Someone else's new character changes the guild's count
+        services.char_mgr._touch_roster(TEST_GUILD_ID)
+        response = await client.get("/characters", headers=headers)
+        assert response.status_code == 200
+
+
+# Streaming roster tests
+
+
+async def test_stream_guild_characters(auth_headers, mock_char_mgr_fetchguild):
+    """The stream has the same entries as the roster, fetched a page at a time."""
+    guild = make_mock_guild(TEST_GUILD_ID, "Test Guild")
+    members = guild.members = []
+    for user_id in (TEST_USER_ID, 111111, 222222):
+        member = MagicMock(spec=discord.Member)
+        member.id = user_id
+        member.guild = guild
+        member.display_name = f"User {user_id}"
+        member.display_avatar.url = f"http://{user_id}.png"
+        member.guild_avatar = None
+        members.append(member)
+    await populate_guild_cache([guild])
+
+    mock_char_mgr_fetchguild.return_value = [
+        make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "Character 1"),
+        make_mock_char(TEST_GUILD_ID, 111111, "Character 2", has_left=True),
+        make_mock_char(TEST_GUILD_ID, 222222, "Character 3"),
+        make_mock_char(TEST_GUILD_ID, 333333, "Ownerless"),
+        make_mock_char(TEST_GUILD_ID, TEST_USER_ID, "SPC", is_spc=True),
+    ]
+
+    with (
+        patch("routes.characters.routes.ROSTER_PAGE_SIZE", 2),
+        patch("routes.botdata.guild_profile_page", wraps=botdata.guild_profile_page) as pages,
+    ):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            url = f"/characters/guild/{TEST_GUILD_ID}"
+            roster = await client.get(url, headers=auth_headers)
+            stream = await client.get(f"{url}/stream", headers=auth_headers)
+
+    assert stream.status_code == 200
+    assert stream.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in stream.text.splitlines()]
+    assert lines == roster.json()["characters"]
+    assert [line["character"]["name"] for line in lines] == ["Character 1", "Character 3", "SPC"]
+    assert [len(call.args[1]) for call in pages.await_args_list] == [2, 2, 1] * 2
+
+
+async def test_stream_follows_the_starting_roster(auth_headers, mock_char_mgr_fetchguild):
+    """Characters added or removed mid-stream don't shift the later pages."""
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test Guild")])
+    chars = [
+        make_mock_char(TEST_GUILD_ID, VChar.SPC_OWNER, f"Character {n}", is_spc=True)
+        for n in range(1, 6)
+    ]
+    mock_char_mgr_fetchguild.return_value = chars.copy()
+
+    async def page(guild_id, ids):
+        result = await real_page(guild_id, ids)
+        # After the first page, one character arrives ahead and one is deleted
+        roster = mock_char_mgr_fetchguild.return_value
+        if roster[0] is chars[0]:
+            roster.insert(0, make_mock_char(TEST_GUILD_ID, 1, "Arrival", is_spc=True))
+            roster.remove(chars[3])
+        return result
+
+    real_page = botdata.guild_profile_page
+    with (
+        patch("routes.characters.routes.ROSTER_PAGE_SIZE", 2),
+        patch("routes.botdata.guild_profile_page", side_effect=page),
+    ):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            stream = await client.get(
+                f"/characters/guild/{TEST_GUILD_ID}/stream", headers=auth_headers
+            )
+
+    names = [json.loads(line)["character"]["name"] for line in stream.text.splitlines()]
+    assert names == ["Character 1", "Character 2", "Character 3", "Character 5"]
+
+
+async def test_stream_guild_characters_empty(auth_headers, mock_char_mgr_fetchguild):
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test Guild")])
+    mock_char_mgr_fetchguild.return_value = []
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(
+            f"/characters/guild/{TEST_GUILD_ID}/stream", headers=auth_headers
+        )
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+async def test_stream_guild_characters_user_not_member(auth_headers):
+    await populate_guild_cache([make_mock_guild(TEST_GUILD_ID, "Test", user_is_member=False)])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(
+            f"/characters/guild/{TEST_GUILD_ID}/stream", headers=auth_headers
+        )
+
+    assert response.status_code == 403
@@ -4,9 +4,18 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from routes import conditional
+
 
 @pytest.fixture(autouse=True)
 def _ensure_inconnu_bot():
     """Ensure inconnu.bot exists so patch() targets can resolve it."""
     with patch("inconnu.bot", MagicMock(), create=True):
         yield
+
+
+@pytest.fixture(autouse=True)
+def _clear_bodies():
+    """Keep memoized response bodies from leaking between tests."""
+    yield
+    conditional._bodies.clear()
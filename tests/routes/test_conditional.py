@@ -0,0 +1,74 @@
+"""Tests for conditional GET responses."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from routes import conditional
+
+
+class Body(BaseModel):
+    value: int
+
+
+def request(if_none_match: str | None = None) -> MagicMock:
+    """A request with the given If-None-Match header."""
+    headers = {} if if_none_match is None else {"If-None-Match": if_none_match}
+    return MagicMock(headers=headers)
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('"abd"', False),
+        ('W/"abc"', True),
+        ('"x", "abc"', True),
+        ('"x",W/"abc" ', True),
+        ("*", True),
+        ("abc", False),
+    ],
+)
+def test_matches(header: str | None, expected: bool):
+    assert conditional.matches(request(header), '"abc"') is expected
+
+
+async def test_respond_untagged():
+    build = AsyncMock(return_value=Body(value=1))
+    response = await conditional.respond(request('"abc"'), None, build)
+
+    assert response.status_code == 200
+    assert response.body == b'{"value":1}'
+    assert "ETag" not in response.headers
+    build.assert_awaited_once()
+
+
+async def test_respond_not_modified():
+    build = AsyncMock(return_value=Body(value=1))
+    response = await conditional.respond(request('"abc"'), "abc", build)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+    build.assert_not_awaited()
+
+
+async def test_respond_memoizes():
+    build = AsyncMock(return_value=Body(value=1))
+    first = await conditional.respond(request(), "abc", build)
+    second = await conditional.respond(request('"old"'), "abc", build)
+
+    assert first.body == second.body == b'{"value":1}'
+    assert second.headers["ETag"] == '"abc"'
+    build.assert_awaited_once()
+
+
+async def test_memo_is_bounded():
+    build = AsyncMock(return_value=Body(value=1))
+    with patch.object(conditional, "MEMO_SIZE", 2):
+        for tag in ("a", "b", "a", "c"):
+            await conditional.respond(request(), tag, build)
+
+        # "b" was least recently used
+        assert list(conditional._bodies) == ['"a"', '"c"']
@@ -0,0 +1,326 @@
+"""Tests for services/bridge.py."""
+
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from beanie import PydanticObjectId
+from pydantic import BaseModel
+
+import errors
+from models import VChar
+from models.vchardocs import VCharSplat
+from routes.characters import routes
+from services import bridge
+from services.bridge import BridgeServer, RemoteError
+
+SRC = Path(__file__).parents[2] / "src"
+
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+
+@bridge.bridged
+async def add(a: int, b: int) -> int:
+    return a + b
+
+
+@bridge.bridged
+async def midpoint(points: list[Point]) -> Point | None:
+    if not points:
+        return None
+    return Point(
+        x=sum(p.x for p in points) // len(points),
+        y=sum(p.y for p in points) // len(points),
+    )
+
+
+@bridge.bridged
+async def keyed(keys: list[int]) -> dict[int, str]:
+    return {key: str(key) for key in keys}
+
+
+@bridge.bridged
+async def nap(seconds: float) -> float:
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+@bridge.bridged
+async def duplicate() -> None:
+    raise errors.DuplicateCharacterError("You already have a character named `Nadea`.")
+
+
+@bridge.bridged
+async def broken() -> None:
+    raise ValueError("Oops")
+
+
+@bridge.bridged
+async def buggy() -> None:
+    raise RuntimeError("Unexpected")
+
+
+@pytest.fixture
+async def socket_path() -> AsyncGenerator[str, None]:
+    # Unix socket paths are short, so avoid pytest's long tmp_path
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "bridge.sock")
+
+
+@pytest.fixture
+async def server(socket_path: str) -> AsyncGenerator[BridgeServer, None]:
+    server = BridgeServer(socket_path)
+    await server.start()
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def connected(server: BridgeServer) -> AsyncGenerator[None, None]:
+    """Bridged calls go through the socket, served by this same process."""
+    await bridge.connect(server.path)
+    yield
+    await bridge.disconnect()
+
+
+async def test_local_without_connection():
+    assert bridge._client is None
+    assert await add(2, 3) == 5
+
+
+async def test_round_trip(connected):
+    assert await add(2, 3) == 5
+    assert await midpoint([Point(x=0, y=0), Point(x=4, y=2)]) == Point(x=2, y=1)
+    assert await midpoint([]) is None
+
+    # JSON object keys are strings, but the result is rebuilt as annotated
+    assert await keyed([1, 2]) == {1: "1", 2: "2"}
+
+
+async def test_concurrent_calls(connected):
+    """Calls are answered as they finish, not in order."""
+    start = time.perf_counter()
+    results = await asyncio.gather(nap(0.2), nap(0.1), nap(0.2))
+    assert results == [0.2, 0.1, 0.2]
+    assert time.perf_counter() - start < 0.35
+
+
+async def test_inconnu_errors_keep_type(connected):
+    with pytest.raises(errors.DuplicateCharacterError, match="named `Nadea`"):
+        await duplicate()
+
+
+async def test_other_errors(connected):
+    with pytest.raises(RemoteError, match="ValueError: Oops"):
+        await broken()
+
+
+async def test_unexpected_errors(connected):
+    """The worker still gets an answer, though the error isn't described."""
+    with pytest.raises(RemoteError, match="buggy failed"):
+        await asyncio.wait_for(buggy(), 1)
+
+
+async def test_unknown_method(connected):
+    with pytest.raises(RemoteError, match="KeyError"):
+        await bridge._client.call("nonexistent", [])
+
+
+async def test_lost_connection(server: BridgeServer, connected):
+    call = asyncio.create_task(nap(5))
+    await asyncio.sleep(0.05)
+    await server.close()
+
+    with pytest.raises(ConnectionError):
+        await call
+    with pytest.raises(ConnectionError):
+        await add(1, 1)
+
+
+async def test_reconnects(server: BridgeServer, connected):
+    """A worker recovers once the bot is back."""
+    await server.close()
+    with pytest.raises(ConnectionError):
+        await add(1, 1)
+
+    await server.start()
+    assert await add(1, 1) == 2
+
+
+@bridge.bridged
+async def sized(size: int) -> str:
+    return "x" * size
+
+
+async def test_large_response(connected, monkeypatch):
+    """A response over the limit fails its call, but not the connection."""
+    monkeypatch.setattr(bridge, "MESSAGE_LIMIT", 1000)
+    with pytest.raises(RemoteError, match="too large"):
+        await sized(2000)
+    assert await sized(10) == "x" * 10
+
+
+async def test_oversized_line(socket_path: str):
+    """The client skips a line over its limit and fails only that call."""
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while line := await reader.readline():
+            request = json.loads(line)
+            size = request["args"][0]
+            response = {"id": request["id"], "result": "x" * size}
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    server = await asyncio.start_unix_server(serve, socket_path, limit=2**20)
+    client = bridge.BridgeClient(socket_path)
+    with patch.object(bridge, "MESSAGE_LIMIT", 1000):
+        await client.connect()
+    try:
+        results = await asyncio.gather(
+            client.call("sized", [5000]), client.call("sized", [10]), return_exceptions=True
+        )
+        assert isinstance(results[0], bridge.ResponseTooLarge)
+        assert results[1] == "x" * 10
+        assert await client.call("sized", [10]) == "x" * 10
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+# Isolation
+
+WORKER = textwrap.dedent(
+    """
+    import asyncio, json, sys, time
+    from routes.characters import routes
+    from services import bridge
+
+    async def main(path, guild_id, seconds):
+        await bridge.connect(path)
+        print("ready", flush=True)
+        rosters = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            json.dumps(await roster(guild_id))
+            rosters += 1
+        await bridge.disconnect()
+        print(rosters, flush=True)
+
+    async def roster(guild_id):
+        chars = []
+        async for page in routes._profile_pages(guild_id):
+            chars.extend(char.model_dump(mode="json") for char, _ in page)
+        return chars
+
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]), float(sys.argv[3])))
+    """
+)
+
+ROSTER_SIZE = 5000
+
+
+def large_roster() -> list[VChar]:
+    """A guild's worth of characters with filled-out profiles."""
+    chars = []
+    for n in range(ROSTER_SIZE):
+        char = VChar(
+            guild=1,
+            user=n,
+            name=f"Character {n}",
+            splat=VCharSplat.VAMPIRE,
+            humanity=7,
+            health="//////",
+            willpower="/////",
+            potency=1,
+            traits=[],
+        )
+        char.id = PydanticObjectId()
+        char.profile.biography = "A long and storied unlife. " * 20
+        char.profile.description = "Tall, dark, and brooding. " * 10
+        char.profile.images = [f"https://example.com/{n}/{i}.webp" for i in range(3)]
+        chars.append(char)
+    return chars
+
+
+async def loop_lag(seconds: float) -> float:
+    """The longest the loop was late to wake a sleeper, over the period."""
+    worst = 0.0
+    interval = 0.01
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def in_loop_roster(guild_id: int):
+    """Build and serialize the roster in this loop, as an in-loop API would."""
+    chars = []
+    async for page in routes._profile_pages(guild_id):
+        chars.extend(char.model_dump(mode="json") for char, _ in page)
+    json.dumps(chars)
+
+
+async def test_worker_load_spares_the_loop(server: BridgeServer):
+    """A worker fetching large rosters through the bridge doesn't delay the
+    bot's loop, where building them in the loop would. Heartbeats and
+    interaction acks are scheduled on that loop."""
+    env = os.environ | {"PYTHONPATH": str(SRC)}
+    roster = large_roster()
+    by_id = {char.id_str: char for char in roster}
+
+    # Full collections of the test session's heap would show up as lag
+    gc.collect()
+    gc.freeze()
+    try:
+        with (
+            patch("services.char_mgr.fetchguild", new=AsyncMock(return_value=roster)) as fetchguild,
+            patch("services.char_mgr.fetchid", new=AsyncMock(side_effect=by_id.get)) as fetchid,
+        ):
+            worker = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-c",
+                WORKER,
+                server.path,
+                "1",
+                "1.5",
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+            )
+            try:
+                # Measure while the worker is pulling rosters from this loop
+                assert worker.stdout is not None
+                assert await worker.stdout.readline() == b"ready\n"
+                worker_lag = await loop_lag(1.0)
+                rosters = int(await worker.stdout.readline())
+            finally:
+                assert await worker.wait() == 0
+            assert fetchguild.await_count == rosters
+            assert fetchid.await_count == rosters * ROSTER_SIZE
+
+            # The same work, done in the loop: a few rosters back to back
+            measuring = asyncio.create_task(loop_lag(1.0))
+            await asyncio.sleep(0.05)
+            for _ in range(3):
+                await in_loop_roster(1)
+            in_loop_lag = await measuring
+    finally:
+        gc.unfreeze()
+
+    assert rosters > 0
+    assert worker_lag < 0.1
+    assert in_loop_lag > 0.25
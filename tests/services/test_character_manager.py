@@ -1,13 +1,18 @@
 """Tests for services.characters.CharacterManager."""
 
 import asyncio
-from typing import AsyncGenerator, Generator, cast
+from collections.abc import AsyncGenerator, Generator
+from typing import cast
 from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
+from beanie import PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+from bson import ObjectId
 from discord import Guild, Member
 from mongomock_motor import AsyncMongoMockClient
 from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError
 
 from db import init_beanie
 from errors import (
@@ -19,6 +24,7 @@ from errors import (
 )
 from models import VChar
 from services import CharacterManager
+from services.characters import StripedLock
 from tests.characters import gen_char
 
 VCHAR_SAVE = "models.vchar.VChar.save"
@@ -200,6 +206,12 @@ def wrapped_find_all() -> Generator[AsyncMock, None]:
         yield mock
 
 
+def bulk_spy():
+    """Spy on the characters collection's bulk_write()."""
+    collection = VChar.get_pymongo_collection()
+    return patch.object(collection, "bulk_write", wraps=collection.bulk_write)
+
+
 # Tests
 
 
@@ -520,9 +532,10 @@ async def test_mark_inactive(
     g1: Guild,
     u11: Member,
 ):
-    with patch("models.vchar.VChar.save", new_callable=AsyncMock) as mock_save:
+    with bulk_spy() as bulk_write:
         await mgrf.mark_inactive(u11)
-        assert mock_save.await_count == 2
+        bulk_write.assert_awaited_once()
+        assert len(bulk_write.await_args.args[0]) == 2
         chars = await mgrf.fetchall(g1, u11)
         assert len(chars) == 2
 
@@ -546,9 +559,9 @@ async def test_mark_active(
     await mgrf.mark_inactive(u11)
     await mgrf.mark_inactive(u21)
 
-    with patch("models.vchar.VChar.save", new_callable=AsyncMock) as mock_save:
+    with bulk_spy() as bulk_write:
         await mgrf.mark_active(u21)
-        assert mock_save.await_count == 1
+        assert len(bulk_write.await_args.args[0]) == 1
 
         # The g1 characters must remain inactive
         for char in await mgrf.fetchall(g1, u11):
@@ -558,7 +571,8 @@ async def test_mark_active(
             assert "left" not in char.stat_log
 
         await mgrf.mark_active(u11)
-        assert mock_save.await_count == 3
+        assert bulk_write.await_count == 2
+        assert len(bulk_write.await_args.args[0]) == 2
         chars = await mgrf.fetchall(g1, u11)
         assert len(chars) == 2
 
@@ -721,6 +735,48 @@ async def test_sort_characters(mgrf: CharacterManager):
     assert mgrf._characters[-1].name == "zzzzzzz"
 
 
+async def test_sort_single_character(
+    mgrf: CharacterManager, g1: Guild, u11: Member, c111: VChar, c112: VChar
+):
+    """Renaming one character re-sorts every index holding it."""
+    c112.name = "Zelda"
+    await mgrf.sort_chars(c112)
+
+    assert await mgrf.fetchall(g1, u11) == [c111, c112]
+    assert (await mgrf.fetchguild(g1.id))[-1] == c112
+    assert (await mgrf.fetchuser(u11.id))[-1] == c112
+    assert mgrf._characters[-1] == c112
+
+
+async def test_transfer_updates_indexes(
+    mgrf: CharacterManager, g1: Guild, u11: Member, u12: Member, c111: VChar, c121: VChar
+):
+    await mgrf.transfer(c111, u11, u12)
+
+    assert c111 not in await mgrf.fetchall(g1, u11)
+    assert c111 not in await mgrf.fetchuser(u11.id)
+    assert await mgrf.fetchall(g1, u12) == [c121, c111]
+    assert await mgrf.fetchuser(u12.id) == [c121, c111]
+    assert await mgrf.countguild(g1.id) == 4
+
+
+async def test_remove_updates_indexes(mgrf: CharacterManager, g2: Guild, u21: Member, c211: VChar):
+    await mgrf.remove(c211)
+
+    assert await mgrf.fetchguild(g2.id) == []
+    assert c211 not in await mgrf.fetchuser(u21.id)
+    assert await mgrf.character_count(g2, u21) == 0
+    assert (g2.id, u21.id) not in mgrf._by_owner
+
+
+async def test_fetch_returns_copies(mgrf: CharacterManager, g1: Guild, u11: Member):
+    """Mutating a returned list mustn't corrupt the index."""
+    (await mgrf.fetchall(g1, u11)).clear()
+    (await mgrf.fetchguild(g1.id)).clear()
+    assert await mgrf.character_count(g1, u11) == 2
+    assert await mgrf.countguild(g1.id) == 4
+
+
 def test_validate_rejects_wrong_guild(mgrf: CharacterManager, g1: Guild, u21: Member, c211: VChar):
     with pytest.raises(LookupError):
         mgrf._validate(g1, u21, c211)
@@ -789,3 +845,356 @@ async def test_countguild(mgrf: CharacterManager, g1: Guild, g2: Guild):
 
     count = await mgrf.countguild(g2.id)
     assert count == 1
+
+
+async def test_countguilds(mgrf: CharacterManager, g1: Guild, g2: Guild):
+    assert await mgrf.countguilds([g1.id, g2.id, 999]) == {g1.id: 4, g2.id: 1, 999: 0}
+
+
+async def test_roster_revision(
+    mgrf: CharacterManager, g1: Guild, g2: Guild, u11: Member, u12: Member, c111: VChar
+):
+    r1, r2 = mgrf.roster_revision(g1.id), mgrf.roster_revision(g2.id)
+    assert r1 and r2
+    assert mgrf.roster_revision(999) == 0
+
+    # Changes to a character are tracked by its own revision
+    revision = c111.revision
+    await mgrf.save(c111)
+    assert c111.revision > revision
+    assert mgrf.roster_revision(g1.id) == r1
+
+    await mgrf.transfer(c111, u11, u12)
+    assert mgrf.roster_revision(g1.id) > r1
+
+    r1 = mgrf.roster_revision(g1.id)
+    await mgrf.remove(c111)
+    assert mgrf.roster_revision(g1.id) > r1
+    assert mgrf.roster_revision(g2.id) == r2
+
+
+# Lazy loading
+
+
+@pytest.fixture
+async def lazy(c111: VChar, c112: VChar, c121: VChar, c211: VChar) -> CharacterManager:
+    """A lazy CharacterManager with room for three characters."""
+    for char in (c111, c112, c121, c211):
+        await char.insert()
+    return CharacterManager(cache_limit=3)
+
+
+async def test_lazy_initialize_loads_nothing(lazy: CharacterManager, wrapped_find_all: AsyncMock):
+    await lazy.initialize()
+    assert lazy.initialized
+    assert not lazy._characters
+    wrapped_find_all.assert_not_called()
+
+
+async def test_lazy_loads_guild_once(lazy: CharacterManager, g1: Guild, u11: Member):
+    with patch("models.vchar.VChar.find", new_callable=Mock, wraps=VChar.find) as mock_find:
+        assert [c.name for c in await lazy.fetchall(g1, u11)] == ["Jimmy Maxwell", "Nadea Theron"]
+        assert await lazy.countguild(g1.id) == 3
+        assert await lazy.character_count(g1, u11) == 2
+        mock_find.assert_called_once()
+
+
+async def test_lazy_evicts_least_recent_guild(
+    lazy: CharacterManager, g1: Guild, g2: Guild, c111: VChar, c211: VChar
+):
+    await lazy.fetchguild(g1.id)
+    await lazy.fetchguild(g2.id)
+
+    # g1's three characters and g2's one exceed the limit
+    assert list(lazy._loaded) == [g2.id]
+    assert c111.id_str not in lazy._id_cache
+    assert lazy._characters == [c211]
+
+    # Coming back reloads the guild
+    assert await lazy.countguild(g1.id) == 3
+    assert list(lazy._loaded) == [g1.id]
+
+
+async def test_lazy_keeps_guilds_with_pending_saves(lazy: CharacterManager, g1: Guild, g2: Guild):
+    lazy._write_delay = 10
+    char = (await lazy.fetchguild(g1.id))[0]
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        await lazy.save(char)
+        await lazy.fetchguild(g2.id)
+
+        # g1 can't be dropped while its save is queued
+        assert list(lazy._loaded) == [g1.id, g2.id]
+        assert lazy._id_cache[char.id_str] is char
+
+        await lazy.flush()
+        mock_save.assert_awaited_once()
+
+    # Once flushed, it's evicted as usual
+    lazy._evict()
+    assert list(lazy._loaded) == [g2.id]
+
+
+async def test_lazy_countguilds_doesnt_load(lazy: CharacterManager, g1: Guild, g2: Guild):
+    """Unloaded guilds are counted in the database, loaded ones in memory."""
+    await lazy.fetchguild(g2.id)
+    with patch("models.vchar.VChar.find", new_callable=Mock, wraps=VChar.find) as mock_find:
+        assert await lazy.countguilds([g1.id, g2.id, 999]) == {g1.id: 3, g2.id: 1, 999: 0}
+        mock_find.assert_not_called()
+    assert list(lazy._loaded) == [g2.id]
+
+
+async def test_lazy_fetchid_falls_back(lazy: CharacterManager, g1: Guild, c121: VChar):
+    char = await lazy.fetchid(c121.id_str)
+    assert char == c121
+    assert char is lazy._id_cache[c121.id_str]
+    assert g1.id in lazy._loaded
+
+    assert await lazy.fetchid(str(ObjectId())) is None
+
+
+async def test_lazy_fetchuser_spans_guilds(lazy: CharacterManager, u11: Member):
+    chars = await lazy.fetchuser(u11.id)
+    assert [c.name for c in chars] == ["Jimmy Maxwell", "Nadea Theron", "Victoria Ransom"]
+
+
+async def test_lazy_register(lazy: CharacterManager, g1: Guild, u11: Member):
+    char = gen_char("vampire")
+    char.name = "Kim"
+    char.guild = g1.id
+    char.user = u11.id
+    await lazy.register(char)
+
+    assert [c.name for c in await lazy.fetchall(g1, u11)] == [
+        "Jimmy Maxwell",
+        "Kim",
+        "Nadea Theron",
+    ]
+
+
+# Snapshots
+
+
+async def test_snapshot_warm_start(
+    tmp_path, g1: Guild, u11: Member, c111: VChar, c112: VChar, c121: VChar, c211: VChar
+):
+    path = str(tmp_path / "chars.bson")
+    for char in (c111, c112, c121, c211):
+        await char.insert()
+
+    mgr = CharacterManager(snapshot_path=path)
+    await mgr.initialize()
+    await mgr.write_snapshot()
+
+    # Change the database behind the snapshot's back
+    c111.name = "Nadea Renamed"
+    await c111.save()
+    await c121.delete()
+    c311 = gen_char("vampire")
+    c311.id = PydanticObjectId()
+    c311.guild = g1.id
+    c311.user = u11.id
+    await VChar.get_pymongo_collection().insert_one(get_dict(c311, to_db=True))
+
+    warm = CharacterManager(snapshot_path=path)
+    with patch("models.vchar.VChar.find_all", new_callable=Mock) as mock_find_all:
+        await warm.initialize()
+        mock_find_all.assert_not_called()
+
+    assert {c.id for c in warm._characters} == {c111.id, c112.id, c211.id, c311.id}
+    char = await warm.fetchid(c111.id_str)
+    assert char is not None
+    assert char.name == "Nadea Renamed"
+
+
+async def test_snapshot_missing_falls_back(
+    tmp_path, mgrf: CharacterManager, wrapped_find_all: Mock
+):
+    mgr = CharacterManager(snapshot_path=str(tmp_path / "missing.bson"))
+    await mgr.initialize()
+    wrapped_find_all.assert_called_once()
+    assert len(mgr._characters) == len(mgrf._characters)
+
+
+# Write-behind
+
+
+async def test_save_immediate_by_default(mgrf: CharacterManager, c111: VChar):
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        await mgrf.save(c111)
+        mock_save.assert_awaited_once()
+
+
+async def test_write_behind_coalesces(mgrf: CharacterManager, c111: VChar):
+    mgrf._write_delay = 0.05
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        for _ in range(3):
+            await mgrf.save(c111)
+        mock_save.assert_not_awaited()
+
+        await asyncio.sleep(0.1)
+        mock_save.assert_awaited_once()
+
+        # A later save starts a new window
+        await mgrf.save(c111)
+        await asyncio.sleep(0.1)
+        assert mock_save.await_count == 2
+
+
+async def test_write_behind_flush(mgrf: CharacterManager, c111: VChar, c112: VChar):
+    mgrf._write_delay = 10
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        await mgrf.save(c111)
+        await mgrf.save(c112)
+
+        await mgrf.flush(c111)
+        mock_save.assert_awaited_once()
+        assert c112.id_str in mgrf._pending
+
+        await mgrf.flush()
+        assert mock_save.await_count == 2
+        assert not mgrf._pending
+
+
+async def test_write_behind_flush_unqueued(c111: VChar):
+    """Flushing a character with nothing queued still saves it."""
+    mgr = CharacterManager(write_delay=10)
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        await mgr.flush(c111)
+        mock_save.assert_awaited_once()
+
+
+async def test_write_behind_remove_cancels(mgrf: CharacterManager, c111: VChar):
+    mgrf._write_delay = 10
+    with patch(VCHAR_SAVE, new_callable=AsyncMock) as mock_save:
+        await mgrf.save(c111)
+        await mgrf.remove(c111)
+        await mgrf.flush()
+        mock_save.assert_not_awaited()
+
+
+# Locking
+
+
+async def test_striped_lock_counts_contention():
+    locks = StripedLock(stripes=4)
+    async with locks.hold("a"):
+        waiter = asyncio.create_task(_hold(locks, "a"))
+        await asyncio.sleep(0)
+        assert locks.contention == 1
+    await waiter
+
+
+async def test_striped_lock_overlapping_keys():
+    """Holders of overlapping key sets take stripes in the same order."""
+    locks = StripedLock(stripes=8)
+    await asyncio.wait_for(
+        asyncio.gather(*(_hold(locks, "a", "b") for _ in range(5)), _hold(locks, "b", "a")),
+        timeout=1,
+    )
+
+
+async def _hold(locks: StripedLock, *keys):
+    async with locks.hold(*keys):
+        await asyncio.sleep(0.01)
+
+
+async def test_independent_guilds_proceed_in_parallel(
+    mgre: CharacterManager, u11: Member, u21: Member
+):
+    """A slow write for one guild doesn't hold up another guild."""
+    await mgre.initialize()
+    blocker = asyncio.Event()
+
+    async def blocked_insert(self, *args, **kwargs):
+        if self.guild == u11.guild.id:
+            await blocker.wait()
+        self.id = PydanticObjectId()
+        return self
+
+    with patch.object(VChar, "insert", blocked_insert):
+        slow = []
+        for i in range(10):
+            char = gen_char("vampire")
+            char.name = f"Slow {i}"
+            char.guild = u11.guild.id
+            char.user = u11.id
+            slow.append(asyncio.create_task(mgre.register(char)))
+        await asyncio.sleep(0)
+
+        fast = gen_char("vampire")
+        fast.guild = u21.guild.id
+        fast.user = u21.id + 1  # A different owner
+        await asyncio.wait_for(mgre.register(fast), timeout=1)
+        assert await mgre.countguild(u21.guild.id) == 1
+
+        blocker.set()
+        await asyncio.gather(*slow)
+
+    assert await mgre.countguild(u11.guild.id) == 10
+    assert mgre.lock_contention >= 9
+
+
+# Bulk writes
+
+
+async def test_bulk_write_updates_and_deletes(
+    mgrf: CharacterManager, g1: Guild, u11: Member, c111: VChar, c112: VChar, c211: VChar
+):
+    with bulk_spy() as bulk_write:
+        count = await mgrf.bulk_write(
+            [c111, c112], lambda c: setattr(c, "hunger", 4), delete=[c211]
+        )
+    assert count == 3
+    bulk_write.assert_awaited_once()
+
+    assert all(c.hunger == 4 for c in await mgrf.fetchall(g1, u11))
+    assert await mgrf.fetchid(c211.id_str) is None
+    assert not c111.is_changed
+
+    fetched = await VChar.get(c111.id)
+    assert fetched is not None
+    assert fetched.hunger == 4
+    assert await VChar.get(c211.id) is None
+
+
+async def test_bulk_write_failure_leaves_cache(mgrf: CharacterManager, c111: VChar):
+    """The cached characters don't change if the write fails."""
+    collection = VChar.get_pymongo_collection()
+    error = BulkWriteError({"writeErrors": [{"index": 0}], "nInserted": 0})
+    with patch.object(collection, "bulk_write", side_effect=error):
+        count = await mgrf.bulk_write([c111], lambda c: setattr(c, "hunger", 4))
+
+    assert count == 0
+    assert c111.hunger == 1
+
+
+async def test_bulk_write_keeps_concurrent_changes(mgrf: CharacterManager, c111: VChar):
+    """Changes saved while the bulk write is in flight aren't undone."""
+    collection = VChar.get_pymongo_collection()
+    write = collection.bulk_write
+
+    async def slow_write(*args, **kwargs):
+        c111.hunger = 3
+        await c111.save()
+        return await write(*args, **kwargs)
+
+    with patch.object(collection, "bulk_write", side_effect=slow_write):
+        count = await mgrf.bulk_write([c111], lambda c: c.stat_log.update(left="then"))
+
+    assert count == 1
+    assert c111.hunger == 3
+    assert c111.stat_log["left"] == "then"
+    assert c111.get_saved_state()["hunger"] == 3
+
+    fetched = await VChar.get(c111.id)
+    assert fetched is not None
+    assert fetched.hunger == 3
+    assert fetched.stat_log["left"] == "then"
+
+
+async def test_bulk_write_nothing_to_do(mgrf: CharacterManager, c111: VChar):
+    with bulk_spy() as bulk_write:
+        # Only the modification time changes, which is still a write
+        assert await mgrf.bulk_write([c111], lambda c: None) == 1
+        assert await mgrf.bulk_write() == 0
+        bulk_write.assert_awaited_once()
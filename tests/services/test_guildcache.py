@@ -1,12 +1,16 @@
 """Guild cache tests."""
 
+import asyncio
+import os
+import sqlite3
+import tempfile
 from typing import AsyncGenerator
 from unittest.mock import MagicMock
 
 import pytest
 from discord import Guild, Member
 
-from services.guildcache import GuildCache
+from services.guildcache import CachedMember, GuildCache
 from utils.discord_helpers import get_avatar
 
 
@@ -279,3 +283,233 @@ async def test_reinitialize_existing_database(g1: Guild):
         await gc2.close()
     finally:
         os.unlink(path)
+
+
+async def test_refresh_writes_only_changes(gcf: GuildCache, g1: Guild, g2: Guild):
+    """Refreshing with unchanged guilds writes nothing."""
+    before = gcf.db.total_changes
+    await gcf.refresh([g1, g2])
+    assert gcf.db.total_changes == before
+
+    g2.members[1].display_name = "Renamed"
+    await gcf.refresh([g1, g2])
+    assert gcf.db.total_changes == before + 1
+
+    member = await gcf.fetchmember(g2.id, g2.members[1].id)
+    assert member is not None
+    assert member.name == "Renamed"
+
+
+async def test_refresh_removes_departed_members(gcf: GuildCache, g1: Guild, g2: Guild):
+    gone = g2.members.pop()
+    g2.members.append(make_member(g2, 10))
+    await gcf.refresh([g1, g2])
+
+    assert await gcf.fetchmember(g2.id, gone.id) is None
+    assert await gcf.fetchmember(g2.id, 10) is not None
+    assert len(await gcf.fetchmembers(g2.id)) == len(g2.members)
+
+
+async def test_refresh_rolls_back_on_error(gcf: GuildCache, g1: Guild, g2: Guild):
+    """A failed refresh leaves the cache as it was."""
+    g2.members[0].display_name = "Changed"
+    g2.members.append(make_member(make_guild(99), 20))  # Guild isn't cached
+
+    with pytest.raises(sqlite3.IntegrityError):
+        await gcf.refresh([g1, g2])
+
+    member = await gcf.fetchmember(g2.id, g2.members[0].id)
+    assert member is not None
+    assert member.name != "Changed"
+
+
+async def test_member_events_during_refresh(gcf: GuildCache, g1: Guild, g2: Guild):
+    """Member writes wait for a refresh rather than landing in its transaction."""
+    g2.members[0].display_name = "Renamed"
+    joined = make_member(g2, 10)
+    g2.members.append(joined)
+    left = g2.members[1]
+
+    refresh = asyncio.create_task(gcf.refresh([g1, g2]))
+    await asyncio.sleep(0)
+    await asyncio.gather(gcf.upsert_members(joined), gcf.delete_member(left), refresh)
+
+    member = await gcf.fetchmember(g2.id, g2.members[0].id)
+    assert member is not None
+    assert member.name == "Renamed"
+    assert await gcf.fetchmember(g2.id, joined.id) is not None
+
+    # The refresh ran first, so the departure stands
+    async with gcf.db.execute("SELECT id FROM members WHERE guild=?", (g2.id,)) as cur:
+        stored = {row[0] async for row in cur}
+    assert stored == {m.id for m in g2.members} - {left.id}
+    assert await gcf.fetchmember(g2.id, left.id) is None
+
+
+async def test_chunk_concurrency(gce: GuildCache, monkeypatch):
+    """Guilds are chunked concurrently, but only a few at a time."""
+    monkeypatch.setattr("services.guildcache.CHUNK_CONCURRENCY", 3)
+    running = peak = 0
+
+    async def chunk():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    guilds = [make_guild(n) for n in range(10)]
+    for guild in guilds:
+        guild.chunked = False
+        guild.chunk = chunk
+
+    await gce.refresh(guilds)
+    assert peak == 3
+    assert await gce.fetchguild(9) is not None
+
+
+async def test_wal_journal(g1: Guild):
+    """File-backed caches use WAL journaling."""
+    with tempfile.TemporaryDirectory() as tmp:
+        gc = GuildCache(os.path.join(tmp, "cache.db"))
+        await gc.initialize()
+        async with gc.db.execute("PRAGMA journal_mode") as cur:
+            row = await cur.fetchone()
+        await gc.close()
+
+    assert row is not None
+    assert row[0] == "wal"
+
+
+async def test_memory_journal(gce: GuildCache):
+    """In-memory caches can't use WAL, so they keep the memory journal."""
+    async with gce.db.execute("PRAGMA journal_mode") as cur:
+        row = await cur.fetchone()
+    assert row is not None
+    assert row[0] == "memory"
+
+
+async def test_index_tracks_writes(gcf: GuildCache, g2: Guild):
+    """Fetches see upserts and deletions through the member index."""
+    guild = await gcf.fetchguild(g2.id)
+    assert guild is not None
+
+    m1 = g2.members[0]
+    m1.display_name = "Billy"
+    await gcf.upsert_members(m1)
+    assert guild.get_member(m1.id).name == "Billy"  # type:ignore
+    assert len(guild.members) == g2.member_count
+
+    await gcf.delete_member(g2.members[1])
+    assert await gcf.fetchmember(g2.id, g2.members[1].id) is None
+    assert guild.get_member(g2.members[1].id) is None
+    assert len(await gcf.fetchmembers(g2.id)) == g2.member_count - 1
+
+    await gcf.delete_guild(g2)
+    assert await gcf.fetchguild(g2.id) is None
+    assert await gcf.fetchmember(g2.id, m1.id) is None
+
+
+async def test_fetchguild_without_members(gcf: GuildCache, g2: Guild):
+    guild = await gcf.fetchguild(g2.id, members=False)
+    assert guild is not None
+    assert guild.name == g2.name
+    assert not guild.members
+    assert guild.get_member(g2.members[0].id) is None
+
+
+async def test_member_index_follows_list(gcf: GuildCache, g2: Guild):
+    """A CachedGuild's member index is rebuilt when its list is replaced."""
+    guild = await gcf.fetchguild(g2.id)
+    assert guild is not None
+    assert guild.get_member(0) is not None
+
+    other = CachedMember(id=50, name="Other", icon="icon", guild=guild)
+    guild.members = [other] + guild.members[1:]
+    assert guild.get_member(0) is None
+    assert guild.get_member(50) is other
+
+
+async def test_member_index_survives_removals(gce: GuildCache):
+    """Removing members keeps every other member's lookup intact."""
+    guild = make_guild(3)
+    guild.members = [make_member(guild, n) for n in range(200)]
+    await gce.upsert_guilds(guild)
+
+    gone = guild.members[::3] + guild.members[100:110]
+    for member in gone:
+        await gce.delete_member(member)
+
+    cached = await gce.fetchguild(guild.id)
+    assert cached is not None
+    remaining = {m.id for m in guild.members} - {m.id for m in gone}
+    assert {m.id for m in cached.members} == remaining
+    assert all(cached.get_member(mid).id == mid for mid in remaining)  # type:ignore
+    assert all(cached.get_member(m.id) is None for m in gone)
+
+    # Rejoining takes a new place at the end
+    await gce.upsert_members(gone[0])
+    assert cached.members[-1].id == gone[0].id
+    assert cached.get_member(gone[0].id) is cached.members[-1]
+
+
+async def test_index_loaded_on_initialize(g2: Guild):
+    """A file-backed cache's index is rebuilt from disk."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        gc = GuildCache(path)
+        await gc.initialize()
+        await gc.upsert_guilds(g2)
+        await gc.close()
+
+        gc = GuildCache(path)
+        await gc.initialize()
+        member = await gc.fetchmember(g2.id, g2.members[2].id)
+        guilds = await gc.fetchguilds(g2.members[2].id)
+        await gc.close()
+
+    assert member is not None
+    assert member.name == g2.members[2].display_name
+    assert member.guild.id == g2.id
+    assert [g.id for g in guilds] == [g2.id]
+
+
+async def test_fetchmembers_by_ids(gcf: GuildCache, g1: Guild, g2: Guild):
+    ids = [m.id for m in g2.members[:2]]
+    members = await gcf.fetchmembers_by_ids(g2.id, ids + ids + [999])
+    assert sorted(members) == ids
+    assert all(members[mid].id == mid for mid in ids)
+
+    assert await gcf.fetchmembers_by_ids(g1.id, ids) == {}
+    assert await gcf.fetchmembers_by_ids(999, ids) == {}
+
+
+async def test_revisions(gcf: GuildCache, g1: Guild, g2: Guild):
+    r1, r2 = gcf.revision(g1.id), gcf.revision(g2.id)
+    assert r1 and r2
+    assert gcf.revision(999) == 0
+
+    # Rewriting the same data isn't a change
+    await gcf.upsert_guilds([g1, g2])
+    await gcf.refresh([g1, g2])
+    assert (gcf.revision(g1.id), gcf.revision(g2.id)) == (r1, r2)
+
+    m1 = g2.members[0]
+    m1.display_name = "Billy"
+    await gcf.upsert_members(m1)
+    assert gcf.revision(g2.id) > r2
+    assert gcf.revision(g1.id) == r1
+
+    r2 = gcf.revision(g2.id)
+    await gcf.delete_member(m1)
+    assert gcf.revision(g2.id) > r2
+
+    g1.name = "Foo"
+    await gcf.upsert_guilds(g1)
+    assert gcf.revision(g1.id) > r1
+
+    # A guild that leaves and returns never gets an old revision back
+    r1 = gcf.revision(g1.id)
+    await gcf.delete_guild(g1)
+    await gcf.upsert_guilds(g1)
+    assert gcf.revision(g1.id) > r1
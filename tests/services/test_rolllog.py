@@ -0,0 +1,341 @@
+"""Tests for services/rolllog.py."""
+
+import asyncio
+from collections.abc import AsyncGenerator
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import db
+import inconnu
+from services.rolllog import RollLog, RollupKey, TraitKey
+
+DATE = datetime(2026, 3, 14, 15, 9, 26)
+DAY = datetime(2026, 3, 14)
+
+
+def make_roll(**fields) -> dict[str, Any]:
+    return {
+        "_id": ObjectId(),
+        "date": DATE,
+        "charid": None,
+        "difficulty": 2,
+        "margin": 1,
+        "outcome": "success",
+        "traits": [],
+        "reroll": None,
+        "use_in_stats": True,
+    } | fields
+
+
+@pytest.fixture
+async def rolls() -> AsyncGenerator[Any, None]:
+    """Mock rolls and roll_stats collections."""
+    database = AsyncMongoMockClient().test
+    collection = database.rolls
+    with (
+        patch.object(db, "rolls", collection),
+        patch.object(db, "roll_stats", database.roll_stats),
+        patch.object(db, "trait_stats", database.trait_stats),
+    ):
+        yield collection
+
+
+async def rollups() -> dict[RollupKey | TraitKey, int]:
+    """The rollup counters, keyed by bucket."""
+    buckets = {}
+    async for bucket in db.roll_stats.find():
+        key = RollupKey(bucket["charid"], bucket["day"], bucket["outcome"], bucket["rerolled"])
+        buckets[key] = bucket["count"]
+    async for bucket in db.trait_stats.find():
+        buckets[TraitKey(bucket["charid"], bucket["trait"], bucket["day"])] = bucket["successes"]
+    return buckets
+
+
+@pytest.fixture
+async def log(rolls) -> AsyncGenerator[RollLog, None]:
+    log = RollLog(max_batch=3, interval=30)
+    yield log
+    await log.close()
+
+
+async def test_flush(rolls, log: RollLog):
+    roll = make_roll()
+    log.insert(roll)
+    assert log.pending == 1
+    assert await rolls.count_documents({}) == 0
+
+    await log.flush()
+    assert log.pending == 0
+    assert await rolls.find_one({"_id": roll["_id"]}) == roll
+
+
+async def test_reroll_folded_into_pending_roll(rolls, log: RollLog):
+    roll = make_roll()
+    log.insert(roll)
+    log.reroll(roll["_id"], {"strategy": "failures", "outcome": "fail"})
+    assert log.pending == 1
+
+    with patch.object(rolls, "bulk_write", wraps=rolls.bulk_write) as bulk_write:
+        await log.flush()
+
+    bulk_write.assert_awaited_once()
+    written = await rolls.find_one({"_id": roll["_id"]})
+    assert written["reroll"] == {"strategy": "failures", "outcome": "fail"}
+
+
+async def test_reroll_written_roll(rolls, log: RollLog):
+    roll = make_roll()
+    log.insert(roll)
+    await log.flush()
+
+    # No existence check; the update goes straight to the roll's ID
+    with patch.object(rolls, "find_one", wraps=rolls.find_one) as find_one:
+        log.reroll(roll["_id"], {"strategy": "criticals", "outcome": "critical"})
+        await log.flush()
+    find_one.assert_not_called()
+
+    written = await rolls.find_one({"_id": roll["_id"]})
+    assert written["reroll"] == {"strategy": "criticals", "outcome": "critical"}
+
+
+async def test_rerolls_are_batched(rolls, log: RollLog):
+    """A batch's rerolls are read with one query and written with one bulk write."""
+    logged = [make_roll(charid=ObjectId()) for _ in range(3)]
+    for roll in logged:
+        log.insert(roll)
+    await log.flush()
+
+    for roll in logged:
+        log.reroll(roll["_id"], {"strategy": "failures", "outcome": "critical", "margin": 3})
+    with (
+        patch.object(rolls, "find", wraps=rolls.find) as find,
+        patch.object(rolls, "bulk_write", wraps=rolls.bulk_write) as bulk_write,
+    ):
+        await log.flush()
+
+    find.assert_called_once()
+    bulk_write.assert_awaited_once()
+    assert len(bulk_write.await_args.args[0]) == 3
+    assert await rolls.count_documents({"reroll.outcome": "critical"}) == 3
+
+
+async def test_full_batch_flushes_early(rolls, log: RollLog):
+    for _ in range(3):
+        log.insert(make_roll())
+
+    await asyncio.sleep(0.05)
+    assert log.pending == 0
+    assert await rolls.count_documents({}) == 3
+
+
+async def test_interval_flushes(rolls):
+    log = RollLog(max_batch=100, interval=0.05)
+    log.insert(make_roll())
+
+    await asyncio.sleep(0.01)
+    assert log.pending == 1
+    await asyncio.sleep(0.1)
+    assert log.pending == 0
+    assert await rolls.count_documents({}) == 1
+
+
+async def test_batches_are_bounded(rolls, log: RollLog):
+    for _ in range(7):
+        log.insert(make_roll())
+
+    with patch.object(rolls, "bulk_write", wraps=rolls.bulk_write) as bulk_write:
+        await log.flush()
+
+    assert [len(call.args[0]) for call in bulk_write.await_args_list] == [3, 3, 1]
+
+
+async def test_queue_is_bounded(rolls):
+    log = RollLog(max_batch=100, interval=30, max_pending=2)
+    first, second = make_roll(), make_roll()
+    log.insert(first)
+    log.insert(second)
+    log.insert(make_roll())
+    log.reroll(ObjectId(), {})
+    assert log.pending == 2
+    assert log.dropped == 2
+
+    # A reroll of a queued roll doesn't take another slot
+    log.reroll(first["_id"], {"strategy": "messy"})
+    assert log.dropped == 2
+
+    await log.close()
+    assert await rolls.count_documents({}) == 2
+
+
+async def test_close_drains(rolls):
+    log = RollLog(max_batch=100, interval=30)
+    for _ in range(5):
+        log.insert(make_roll())
+
+    await log.close()
+    assert log.pending == 0
+    assert await rolls.count_documents({}) == 5
+
+
+async def test_duplicate_insert_isnt_a_failure(rolls, log: RollLog):
+    roll = make_roll()
+    await rolls.insert_one(dict(roll))
+
+    log.insert(roll)
+    log.insert(make_roll())
+    await log.flush()
+
+    assert log.failed == 0
+    assert await rolls.count_documents({}) == 2
+
+
+async def test_database_errors_are_counted(rolls, log: RollLog):
+    error = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+    with patch.object(rolls, "bulk_write", error):
+        log.insert(make_roll())
+        log.insert(make_roll())
+        await log.flush()
+
+    assert log.failed == 2
+    assert log.pending == 0
+
+    # The writer keeps going
+    log.insert(make_roll())
+    await log.flush()
+    assert await rolls.count_documents({}) == 1
+
+
+async def test_log_roll_doesnt_wait(rolls):
+    """Logging a roll queues it without touching the database."""
+    outcome = SimpleNamespace(
+        id=ObjectId(),
+        syntax="3 2 3",
+        normal=SimpleNamespace(dice=[1, 6, 10]),
+        hunger=SimpleNamespace(dice=[2, 9]),
+        difficulty=3,
+        margin=0,
+        outcome="success",
+        pool_str="3",
+        strategy=None,
+        date=DATE,
+        traits=[],
+    )
+    log = RollLog(max_batch=100, interval=30)
+
+    with (
+        patch("services.roll_log", log),
+        patch.object(rolls, "bulk_write", wraps=rolls.bulk_write) as bulk_write,
+    ):
+        inconnu.stats.log_roll(1, 2, 3, 4, None, outcome, "comment")
+        outcome.strategy = "failures"
+        outcome.normal.dice = [6, 6, 10]
+        inconnu.stats.log_roll(1, 2, 3, None, None, outcome, "comment")
+        bulk_write.assert_not_called()
+
+        await log.close()
+
+    roll = await rolls.find_one({"_id": outcome.id})
+    assert roll["normal"] == [1, 6, 10]
+    assert roll["message"] == 4
+    assert roll["reroll"]["strategy"] == "failures"
+    assert roll["reroll"]["dice"] == [6, 6, 10]
+
+
+async def test_rollups(rolls, log: RollLog):
+    charid = ObjectId()
+    log.insert(make_roll(charid=charid))
+    log.insert(make_roll(charid=charid, traits=["Wits"]))
+    log.insert(
+        make_roll(charid=charid, traits=["Wits"], reroll={"outcome": "critical", "margin": 3})
+    )
+    log.insert(make_roll(charid=charid, traits=["Wits"], use_in_stats=False))
+    log.insert(make_roll(traits=["Wits"]))  # No character
+    await log.flush()
+
+    assert await rollups() == {
+        RollupKey(charid, DAY, "success", False): 2,
+        RollupKey(charid, DAY, "critical", True): 1,
+        TraitKey(charid, "Wits", DAY): 8,
+    }
+
+
+async def test_reroll_moves_rollup(rolls, log: RollLog):
+    charid = ObjectId()
+    roll = make_roll(charid=charid, outcome="fail", margin=-1, traits=["Wits", "Brawl.Grappling"])
+    log.insert(roll)
+    await log.flush()
+
+    # Rerolled twice before the first reroll is written
+    log.reroll(roll["_id"], {"outcome": "success", "margin": 0})
+    log.reroll(roll["_id"], {"outcome": "messy", "margin": 2})
+    await log.flush()
+
+    assert await rollups() == {
+        RollupKey(charid, DAY, "fail", False): 0,
+        RollupKey(charid, DAY, "messy", True): 1,
+        TraitKey(charid, "Wits", DAY): 4,
+        TraitKey(charid, "Brawl.Grappling", DAY): 4,
+    }
+
+
+async def test_duplicate_insert_isnt_counted_twice(rolls, log: RollLog):
+    roll = make_roll(charid=ObjectId())
+    log.insert(dict(roll))
+    await log.flush()
+    log.insert(dict(roll))
+    await log.flush()
+
+    assert list((await rollups()).values()) == [1]
+
+
+async def test_failed_writes_arent_counted(rolls, log: RollLog):
+    error = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+    with patch.object(rolls, "bulk_write", error):
+        log.insert(make_roll(charid=ObjectId()))
+        await log.flush()
+
+    assert await rollups() == {}
+
+
+async def test_log_roll_moves_rollup(rolls):
+    """A reroll of a character's roll moves it between buckets and updates
+    its traits' successes."""
+    char = SimpleNamespace(id=ObjectId())
+    outcome = SimpleNamespace(
+        id=ObjectId(),
+        syntax="3 2 3",
+        normal=SimpleNamespace(dice=[1, 6, 10]),
+        hunger=SimpleNamespace(dice=[2, 9]),
+        difficulty=3,
+        margin=0,
+        outcome="success",
+        pool_str="Strength Brawl",
+        strategy=None,
+        date=DATE.replace(tzinfo=UTC),
+        traits=["Strength", "Brawl"],
+    )
+    log = RollLog(max_batch=100, interval=30)
+
+    with patch("services.roll_log", log):
+        inconnu.stats.log_roll(1, 2, 3, 4, char, outcome, "comment")
+        await log.flush()
+
+        outcome.strategy = "failures"
+        outcome.outcome = "critical"
+        outcome.margin = 2
+        inconnu.stats.log_roll(1, 2, 3, 4, char, outcome, "comment")
+        await log.close()
+
+    assert await rollups() == {
+        RollupKey(char.id, DAY, "success", False): 0,
+        RollupKey(char.id, DAY, "critical", True): 1,
+        TraitKey(char.id, "Strength", DAY): 5,
+        TraitKey(char.id, "Brawl", DAY): 5,
+    }
@@ -0,0 +1,35 @@
+"""Tests for services/snapshot.py."""
+
+from datetime import UTC, datetime
+
+from bson import ObjectId
+
+from services import snapshot
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "chars.bson"
+    watermark = datetime(2025, 1, 2, 3, 4, 5, tzinfo=UTC)
+    docs = [{"_id": ObjectId(), "name": "Nadea"}, {"_id": ObjectId(), "name": "Jimmy"}]
+
+    snapshot.write(path, watermark, docs)
+    loaded = snapshot.read(path)
+
+    assert loaded == (watermark, docs)
+    assert not (tmp_path / "chars.bson.tmp").exists()
+
+
+def test_missing(tmp_path):
+    assert snapshot.read(tmp_path / "missing.bson") is None
+
+
+def test_corrupt(tmp_path):
+    path = tmp_path / "chars.bson"
+    path.write_bytes(b"not a snapshot")
+    assert snapshot.read(path) is None
+
+
+def test_wrong_format(tmp_path):
+    path = tmp_path / "chars.bson"
+    path.write_bytes(snapshot.bson.encode({"format": "something-else"}))
+    assert snapshot.read(path) is None
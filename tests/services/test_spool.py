@@ -0,0 +1,271 @@
+"""Tests for services/spool.py."""
+
+from collections.abc import AsyncGenerator
+from datetime import datetime
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect, NetworkTimeout, OperationFailure
+
+import db
+from services.rolllog import RollLog
+from services.spool import Spool
+from services.telemetry import Telemetry
+
+DATE = datetime(2026, 3, 14, 15, 9, 26)
+
+
+def make_roll(**fields) -> dict[str, Any]:
+    return {
+        "_id": ObjectId(),
+        "date": DATE,
+        "charid": ObjectId(),
+        "difficulty": 2,
+        "margin": 1,
+        "outcome": "success",
+        "traits": ["Wits"],
+        "reroll": None,
+        "use_in_stats": True,
+    } | fields
+
+
+@pytest.fixture
+async def database() -> AsyncGenerator[Any, None]:
+    """Mock collections for the writers."""
+    database = AsyncMongoMockClient().test
+    collections = {
+        name: getattr(database, name)
+        for name in ("rolls", "roll_stats", "trait_stats", "interactions", "command_log")
+    }
+    with patch.multiple(db, **collections):
+        yield database
+
+
+@pytest.fixture
+async def spool(tmp_path) -> AsyncGenerator[Spool, None]:
+    spool = Spool(str(tmp_path / "spool.db"), retry_interval=30)
+    await spool.initialize()
+    yield spool
+    await spool.close()
+
+
+def fails_on(collection, method: str, failing: int = 1) -> Any:
+    """Make one call of a collection's method fail as if the database went
+    away. The others go through."""
+    original = getattr(collection, method)
+    calls = 0
+
+    async def call(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == failing:
+            raise AutoReconnect("down")
+        return await original(*args, **kwargs)
+
+    return patch.object(collection, method, side_effect=call)
+
+
+async def rollup_counts(database) -> tuple[dict[tuple[str, bool], int], int]:
+    """The roll_stats counts by outcome and whether they were rerolled, and
+    the total trait_stats successes."""
+    outcomes = {(b["outcome"], b["rerolled"]): b["count"] async for b in database.roll_stats.find()}
+    successes = sum([b["successes"] async for b in database.trait_stats.find()])
+    return outcomes, successes
+
+
+def down(collection) -> Any:
+    """Make a collection's writes fail as if the database were unreachable."""
+    error = AsyncMock(side_effect=AutoReconnect("down"))
+    return patch.multiple(collection, insert_many=error, bulk_write=error)
+
+
+async def test_spools_while_down(database, spool: Spool):
+    telemetry = Telemetry(interval=30, spool=spool)
+    with down(db.interactions):
+        telemetry.log("interactions", {"n": 1})
+        await telemetry.flush()
+
+    assert spool.size == 1
+    assert spool.sizes() == {"TELEMETRY": 1}
+    assert telemetry.failed == 0
+
+    # Later writes wait behind the spooled ones, even once the database is up
+    telemetry.log("interactions", {"n": 2})
+    await telemetry.flush()
+    assert spool.size == 2
+    assert await database.interactions.count_documents({}) == 0
+
+    assert await spool.replay()
+    assert spool.size == 0
+    assert [doc["n"] async for doc in database.interactions.find()] == [1, 2]
+
+    # Once the spool is empty, writes go straight to the database
+    telemetry.log("interactions", {"n": 3})
+    await telemetry.flush()
+    assert spool.size == 0
+    assert await database.interactions.count_documents({}) == 3
+
+
+async def test_slow_writes_are_spooled(database, spool: Spool):
+    telemetry = Telemetry(interval=30, spool=spool)
+    error = AsyncMock(side_effect=NetworkTimeout("timed out"))
+    with patch.object(db.command_log, "insert_many", error):
+        telemetry.log("command_log", {})
+        await telemetry.flush()
+
+    assert spool.size == 1
+
+
+async def test_rejected_writes_arent_spooled(database, spool: Spool):
+    telemetry = Telemetry(interval=30, spool=spool)
+    error = AsyncMock(side_effect=OperationFailure("bad"))
+    with patch.object(db.command_log, "insert_many", error):
+        telemetry.log("command_log", {})
+        await telemetry.flush()
+
+    assert spool.size == 0
+    assert telemetry.failed == 1
+
+
+async def test_replay_stops_while_down(database, spool: Spool):
+    telemetry = Telemetry(interval=30, spool=spool)
+    with down(db.interactions):
+        telemetry.log("interactions", {})
+        await telemetry.flush()
+        assert not await spool.replay()
+
+    assert spool.size == 1
+    assert await spool.replay()
+
+
+async def test_spool_is_durable(database, tmp_path):
+    location = str(tmp_path / "spool.db")
+    spool = Spool(location, retry_interval=30)
+    await spool.initialize()
+    telemetry = Telemetry(interval=30, spool=spool)
+    with down(db.interactions):
+        telemetry.log("interactions", {"n": 1})
+        await telemetry.close()
+    await spool.close()
+
+    # A new run picks up where the last left off
+    spool = Spool(location, retry_interval=30)
+    Telemetry(spool=spool)
+    await spool.initialize()
+    assert spool.size == 1
+
+    assert await spool.replay()
+    await spool.close()
+    assert await database.interactions.count_documents({"n": 1}) == 1
+
+
+async def test_unknown_writers_are_discarded(database, spool: Spool):
+    await spool.append("GONE", [{}])
+    assert await spool.replay()
+    assert spool.size == 0
+
+
+async def test_roll_log_replay_is_idempotent(database, spool: Spool):
+    """Replaying a batch that already reached the database changes nothing."""
+    log = RollLog(interval=30, spool=spool)
+    roll = make_roll(outcome="fail", margin=-1)
+    log.insert(roll)
+    await log.flush()
+
+    reroll = {"strategy": "failures", "outcome": "success", "margin": 0}
+    log.reroll(roll["_id"], reroll)
+    items = log._take()
+    await log.send(items)
+    await log.send(items)
+
+    roll_stats = {
+        b["outcome"]: b["count"] async for b in database.roll_stats.find({"charid": roll["charid"]})
+    }
+    trait_stats = await database.trait_stats.find_one({"charid": roll["charid"]})
+    assert roll_stats == {"fail": 0, "success": 1}
+    assert trait_stats["successes"] == 2
+
+    await log.send([{"roll": roll}])
+    assert await database.rolls.count_documents({}) == 1
+    assert (await database.roll_stats.find_one({"outcome": "fail"}))["count"] == 0
+
+
+async def test_roll_log_spools_in_order(database, spool: Spool):
+    log = RollLog(interval=30, spool=spool)
+    roll = make_roll()
+    with down(db.rolls):
+        log.insert(roll)
+        await log.flush()
+
+    # The reroll can't overtake the roll it updates
+    reroll = {"strategy": "failures", "outcome": "critical", "margin": 2}
+    log.reroll(roll["_id"], reroll)
+    await log.flush()
+    assert spool.size == 2
+
+    assert await spool.replay()
+    written = await database.rolls.find_one({"_id": roll["_id"]})
+    assert written["reroll"] == reroll
+    assert written["date"] == DATE
+
+    outcomes = {b["outcome"]: b["count"] async for b in database.roll_stats.find()}
+    assert outcomes == {"success": 0, "critical": 1}
+
+
+async def test_roll_log_counts_rolls_when_a_reroll_fails(database, spool: Spool):
+    """Rolls inserted before a batch's rerolls fail are counted on replay."""
+    log = RollLog(interval=30, spool=spool)
+    charid = ObjectId()
+    rerolled = make_roll(charid=charid, outcome="fail", margin=-1)
+    log.insert(rerolled)
+    await log.flush()
+
+    log.insert(make_roll(charid=charid))
+    log.reroll(rerolled["_id"], {"strategy": "failures", "outcome": "success", "margin": 0})
+    with fails_on(db.rolls, "bulk_write", failing=2):
+        await log.flush()
+    assert spool.size == 2
+    assert await database.rolls.count_documents({}) == 2
+
+    assert await spool.replay()
+    outcomes = {("fail", False): 0, ("success", False): 1, ("success", True): 1}
+    assert await rollup_counts(database) == (outcomes, 5)
+
+
+async def test_roll_log_rollups_are_spooled(database, spool: Spool):
+    """Rollup changes that fail partway are retried, and counted once."""
+    log = RollLog(interval=30, spool=spool)
+    log.insert(make_roll())
+    with fails_on(db.trait_stats, "bulk_write", failing=2):
+        await log.flush()
+    assert spool.size == 1
+
+    # The roll_stats change went through; the retry doesn't repeat it
+    assert await rollup_counts(database) == ({("success", False): 1}, 0)
+    assert await spool.replay()
+    assert await rollup_counts(database) == ({("success", False): 1}, 3)
+
+
+async def test_roll_log_replay_keeps_progress(database, spool: Spool):
+    """A replay that fails partway is retried with what it already worked out."""
+    log = RollLog(interval=30, spool=spool)
+    charid = ObjectId()
+    with down(db.rolls):
+        log.insert(make_roll(charid=charid))
+        await log.flush()
+
+    # This batch joins the spool without being tried
+    log.insert(make_roll(charid=charid))
+    await log.flush()
+    assert spool.size == 2
+
+    # Its roll is inserted, but its rollups fail
+    with fails_on(db.roll_stats, "bulk_write", failing=3):
+        assert not await spool.replay()
+    assert await database.rolls.count_documents({}) == 2
+
+    assert await spool.replay()
+    assert await rollup_counts(database) == ({("success", False): 2}, 6)
@@ -0,0 +1,118 @@
+"""Tests for services/telemetry.py."""
+
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import db
+from services.telemetry import Telemetry
+
+
+@pytest.fixture
+async def database() -> AsyncGenerator[Any, None]:
+    """Mock interactions and command_log collections."""
+    database = AsyncMongoMockClient().test
+    interactions = database.interactions
+    command_log = database.command_log
+    with (
+        patch.object(db, "interactions", interactions),
+        patch.object(db, "command_log", command_log),
+    ):
+        yield database
+
+
+@pytest.fixture
+async def telemetry(database) -> AsyncGenerator[Telemetry, None]:
+    telemetry = Telemetry(max_batch=3, interval=30)
+    yield telemetry
+    await telemetry.close()
+
+
+async def test_flush_groups_by_collection(database, telemetry: Telemetry):
+    telemetry.log("interactions", {"n": 1})
+    telemetry.log("command_log", {"n": 2})
+    assert telemetry.pending == 2
+    assert await database.interactions.count_documents({}) == 0
+
+    with patch.object(db.interactions, "insert_many", wraps=db.interactions.insert_many) as im:
+        await telemetry.flush()
+
+    im.assert_awaited_once()
+    assert telemetry.pending == 0
+    assert await database.interactions.count_documents({"n": 1}) == 1
+    assert await database.command_log.count_documents({"n": 2}) == 1
+
+
+async def test_full_batch_flushes_early(database, telemetry: Telemetry):
+    for n in range(3):
+        telemetry.log("interactions", {"n": n})
+
+    await asyncio.sleep(0.05)
+    assert telemetry.pending == 0
+    assert await database.interactions.count_documents({}) == 3
+
+
+async def test_interval_flushes(database):
+    telemetry = Telemetry(max_batch=100, interval=0.05)
+    telemetry.log("command_log", {})
+
+    await asyncio.sleep(0.01)
+    assert telemetry.pending == 1
+    await asyncio.sleep(0.1)
+    assert telemetry.pending == 0
+    assert await database.command_log.count_documents({}) == 1
+
+
+async def test_batches_are_bounded(database, telemetry: Telemetry):
+    for n in range(7):
+        telemetry.log("interactions", {"n": n})
+
+    with patch.object(db.interactions, "insert_many", wraps=db.interactions.insert_many) as im:
+        await telemetry.flush()
+
+    assert [len(call.args[0]) for call in im.await_args_list] == [3, 3, 1]
+    assert [doc["n"] async for doc in database.interactions.find()] == list(range(7))
+
+
+async def test_queue_is_bounded(database):
+    telemetry = Telemetry(max_batch=100, interval=30, max_pending=2)
+    for n in range(5):
+        telemetry.log("interactions", {"n": n})
+
+    assert telemetry.pending == 2
+    assert telemetry.dropped == 3
+
+    await telemetry.close()
+    assert [doc["n"] async for doc in database.interactions.find()] == [0, 1]
+
+
+async def test_close_drains(database):
+    telemetry = Telemetry(max_batch=2, interval=30)
+    for _ in range(5):
+        telemetry.log("command_log", {})
+
+    await telemetry.close()
+    assert telemetry.pending == 0
+    assert await database.command_log.count_documents({}) == 5
+
+
+async def test_database_errors_are_counted(database, telemetry: Telemetry):
+    error = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+    with patch.object(db.interactions, "insert_many", error):
+        telemetry.log("interactions", {})
+        telemetry.log("interactions", {})
+        telemetry.log("command_log", {})
+        await telemetry.flush()
+
+    # Without a spool, the whole batch is lost
+    assert telemetry.failed == 3
+    assert await database.command_log.count_documents({}) == 0
+
+    telemetry.log("interactions", {})
+    await telemetry.flush()
+    assert await database.interactions.count_documents({}) == 1
@@ -0,0 +1 @@
+"""Task tests."""
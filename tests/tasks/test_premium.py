@@ -0,0 +1,70 @@
+"""Tests for tasks/premium.py."""
+
+from collections.abc import AsyncGenerator
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import discord
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import db
+import services
+from api import ApiError
+from tasks import premium
+
+CHARACTERS = {
+    1: [SimpleNamespace(name="Nadea"), SimpleNamespace(name="Jimmy")],
+    2: [SimpleNamespace(name="John")],
+}
+
+
+@pytest.fixture
+async def supporters() -> AsyncGenerator[Any, None]:
+    """Two expired supporters and a current one."""
+    supporters = AsyncMongoMockClient().test.supporters
+    expired = discord.utils.utcnow() - timedelta(days=8)
+    await supporters.insert_many(
+        [
+            {"_id": 1, "discontinued": expired},
+            {"_id": 2, "discontinued": expired},
+            {"_id": 3, "discontinued": discord.utils.utcnow()},
+        ]
+    )
+    with (
+        patch.object(db, "supporters", supporters),
+        patch.object(
+            services.char_mgr, "fetchuser", AsyncMock(side_effect=lambda u: CHARACTERS.get(u, []))
+        ),
+    ):
+        yield supporters
+
+
+async def test_removes_expired_images(supporters):
+    with (
+        patch("api.delete_character_faceclaims", AsyncMock()) as delete,
+        patch.object(services.char_mgr, "bulk_write", AsyncMock()) as bulk_write,
+    ):
+        await premium.remove_expired_images()
+
+    assert delete.await_count == 3
+    assert bulk_write.await_args.args[0] == [*CHARACTERS[1], *CHARACTERS[2]]
+    assert [s["_id"] async for s in supporters.find()] == [3]
+
+
+async def test_failed_deletion_doesnt_block_others(supporters):
+    async def delete(char, commit):
+        if char.name == "Jimmy":
+            raise ApiError("Timed out")
+
+    with (
+        patch("api.delete_character_faceclaims", AsyncMock(side_effect=delete)),
+        patch.object(services.char_mgr, "bulk_write", AsyncMock()) as bulk_write,
+    ):
+        await premium.remove_expired_images()
+
+    # Everyone else is cleared, and the failed supporter is kept for a retry
+    assert bulk_write.await_args.args[0] == [CHARACTERS[1][0], *CHARACTERS[2]]
+    assert [s["_id"] async for s in supporters.find()] == [1, 3]
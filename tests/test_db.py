@@ -0,0 +1,165 @@
+"""Tests for the declared indexes and their hot queries."""
+
+import os
+from collections.abc import AsyncGenerator
+from datetime import UTC, datetime
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import DESCENDING, AsyncMongoClient, IndexModel
+from pymongo.errors import OperationFailure
+
+import db
+
+# Explain tests need a real server, as the mock doesn't plan queries. Point
+# this at a scratch database; the tests create and drop their own.
+TEST_MONGO = os.getenv("INCONNU_TEST_MONGO")
+
+DATE = datetime(2025, 5, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+def database() -> Any:
+    database = AsyncMongoMockClient().test
+    with patch.object(db, "_db", database):
+        yield database
+
+
+async def test_ensure_indexes(database):
+    diff = await db.ensure_indexes()
+    assert diff.missing.keys() == db.declared_indexes().keys()
+    assert diff.undeclared == {}
+
+    diff = await db.index_diff()
+    assert diff.missing == {}
+    assert diff.undeclared == {}
+
+
+async def test_conflicting_indexes(database):
+    """A collection whose indexes conflict is skipped, and the rest built."""
+    rolls = database.rolls
+    conflict = OperationFailure("Index already exists with a different name", code=85)
+    with (
+        patch.object(rolls, "create_indexes", side_effect=conflict),
+        patch.object(db, "_db") as mock,
+    ):
+        mock.__getitem__.side_effect = lambda name: rolls if name == "rolls" else database[name]
+        await db.ensure_indexes()
+
+    diff = await db.index_diff()
+    assert diff.missing.keys() == {"rolls"}
+
+
+async def test_init_without_indexes(database):
+    """API workers leave the indexes to the bot."""
+    with patch.object(db, "init_beanie"):
+        await db.init(indexes=False)
+    assert await database.list_collection_names() == []
+
+
+async def test_dry_run(database):
+    await database.rolls.create_index([("message", 1)], name="message")
+    await database.rolls.create_index([("channel", 1)], name="channel")
+
+    diff = await db.ensure_indexes(dry_run=True)
+    assert [index.document["name"] for index in diff.missing["rolls"]] == ["charid_stats_date"]
+    assert diff.undeclared == {"rolls": ["channel"]}
+
+    # Nothing was created or dropped
+    assert set(await database.rolls.index_information()) == {"_id_", "message", "channel"}
+    assert "rp_posts" not in await database.list_collection_names()
+
+
+async def test_indexes_match_by_key(database):
+    """An existing index with another name isn't missing."""
+    await database.headers.create_index([("message", 1)], name="message_1")
+    diff = await db.index_diff()
+
+    assert "headers" not in diff.missing
+    assert "headers" not in diff.undeclared
+
+
+def test_text_index_key():
+    """The server reports text indexes by their weights."""
+    declared = IndexModel([("content", "text")], name="content_text")
+    existing = {"key": [("_fts", "text"), ("_ftsx", 1)], "weights": {"content": 1}}
+
+    assert db._index_key(declared.document) == db._index_key(existing)
+
+
+def test_models_declare_indexes():
+    assert "rp_posts" in db.declared_indexes()
+
+
+# Explain plans
+
+
+def _stages(plan: dict[str, Any]) -> set[str]:
+    """Every stage in a query plan."""
+    stages = {plan["stage"]}
+    for child in plan.get("inputStages", []) + [plan.get("inputStage")]:
+        if child:
+            stages |= _stages(child)
+    return stages
+
+
+def _hot_queries() -> list[tuple[str, dict[str, Any], Any]]:
+    """The collection, filter, and sort of each hot query."""
+    charid = ObjectId()
+    return [
+        # Roll statistics
+        (
+            "rolls",
+            {"charid": {"$in": [charid]}, "use_in_stats": True, "date": {"$gte": DATE}},
+            None,
+        ),
+        ("rolls", {"message": 1}, None),
+        ("rolls", {"message": {"$in": [1, 2]}, "use_in_stats": True}, None),
+        ("roll_stats", {"charid": {"$in": [charid]}, "day": {"$gte": DATE}}, None),
+        ("trait_stats", {"charid": charid, "day": {"$gte": DATE}}, None),
+        # Roleposts
+        ("rp_posts", {"deleted": False, "guild": 1, "user": 2}, [("date", DESCENDING)]),
+        ("rp_posts", {"deleted": False, "guild": 1, "user": 2, "$text": {"$search": "x"}}, None),
+        ("rp_posts", {"deleted": False, "guild": 1, "user": 2, "tags": {"$all": ["x"]}}, None),
+        ("rp_posts", {"message_id": 1}, None),
+        ("rp_posts", {"id_chain": 1}, None),
+        # Headers and supporters
+        ("headers", {"message": 1}, None),
+        ("supporters", {"discontinued": {"$lt": DATE}}, None),
+    ]
+
+
+@pytest.fixture
+async def server_db() -> AsyncGenerator[Any, None]:
+    """A scratch database on a real server, with the declared indexes."""
+    if TEST_MONGO is None:
+        if os.getenv("CI"):
+            pytest.fail("INCONNU_TEST_MONGO must be set in CI")
+        pytest.skip("INCONNU_TEST_MONGO not set")
+
+    client = AsyncMongoClient(TEST_MONGO)
+    database = client[f"inconnu_explain_{ObjectId()}"]
+    try:
+        with patch.object(db, "_db", database):
+            await db.ensure_indexes()
+            yield database
+    finally:
+        await client.drop_database(database.name)
+        await client.close()
+
+
+@pytest.mark.parametrize("index", range(len(_hot_queries())))
+async def test_hot_query_uses_index(server_db, index: int):
+    name, query, sort = _hot_queries()[index]
+    cursor = server_db[name].find(query)
+    if sort is not None:
+        cursor = cursor.sort(sort)
+
+    plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+    # Newer servers wrap the plan for the slot-based engine
+    plan = plan.get("queryPlan", plan)
+
+    assert "COLLSCAN" not in _stages(plan), f"{name}: {query}"
@@ -0,0 +1,60 @@
+"""Tests for models/delta.py."""
+
+from models.delta import apply_operators, update_operators
+
+
+def test_no_changes():
+    doc = {"_id": 1, "name": "Nadea", "log": {"rouse": 2}, "macros": [1, 2]}
+    assert update_operators(doc, dict(doc)) == {}
+
+
+def test_scalar_set():
+    ops = update_operators({"_id": 1, "hunger": 1}, {"_id": 1, "hunger": 3})
+    assert ops == {"$set": {"hunger": 3}}
+
+
+def test_nested_paths():
+    old = {"header": {"blush": 0, "location": "Bar"}}
+    new = {"header": {"blush": 1, "location": "Bar"}}
+    assert update_operators(old, new) == {"$set": {"header.blush": 1}}
+
+
+def test_log_counters_increment():
+    old = {"log": {"rouse": 2, "created": "then"}}
+    new = {"log": {"rouse": 5, "created": "then", "slake": 1}}
+    assert update_operators(old, new) == {"$inc": {"log.rouse": 3}, "$set": {"log.slake": 1}}
+
+
+def test_counters_only_under_log():
+    assert update_operators({"stains": 1}, {"stains": 2}) == {"$set": {"stains": 2}}
+
+
+def test_append_pushes():
+    old = {"experience": {"log": [1, 2]}}
+    new = {"experience": {"log": [1, 2, 3, 4]}}
+    assert update_operators(old, new) == {"$push": {"experience.log": {"$each": [3, 4]}}}
+
+
+def test_list_rewrite_sets():
+    old = {"macros": [1, 2, 3]}
+    new = {"macros": [1, 3]}
+    assert update_operators(old, new) == {"$set": {"macros": [1, 3]}}
+
+
+def test_removed_keys_unset():
+    old = {"log": {"left": "then", "rouse": 1}}
+    new = {"log": {"rouse": 1}}
+    assert update_operators(old, new) == {"$unset": {"log.left": ""}}
+
+
+def test_apply_round_trips():
+    old = {"_id": 1, "hunger": 1, "log": {"left": "then", "rouse": 2}, "macros": [1]}
+    new = {"_id": 1, "hunger": 3, "log": {"rouse": 4, "slake": 1}, "macros": [1, 2]}
+    assert apply_operators(old, update_operators(old, new)) == new
+    assert old["macros"] == [1]
+
+
+def test_apply_keeps_other_fields():
+    """Fields the update doesn't touch keep their values."""
+    ops = update_operators({"hunger": 1, "stains": 0}, {"hunger": 2, "stains": 0})
+    assert apply_operators({"hunger": 1, "stains": 3}, ops) == {"hunger": 2, "stains": 3}
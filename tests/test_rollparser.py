@@ -4,7 +4,7 @@ import pytest
 
 import errors
 from inconnu.vr.parse import needs_character
-from inconnu.vr.rollparser import RollParser
+from inconnu.vr.rollparser import RollParser, compile_syntax, compile_tokens, eval_stack
 from models.vchar import VChar
 from tests.characters import gen_char
 
@@ -48,6 +48,21 @@ def test_pool_creation(syntax: str, pool_str: str, value: int, character: VChar)
     assert p.pool == value
 
 
+@pytest.mark.parametrize(
+    "syntax,traits",
+    [
+        ("stren+br 2 wits", ["Strength", "Brawl"]),
+        ("stren+br.kin+stren", ["Strength", "Brawl.Kindred"]),
+        ("obl.shadow + 2", ["Oblivion.ShadowCloak"]),
+        ("3 + 2", []),
+    ],
+)
+def test_pool_traits(syntax: str, traits: list[str], character: VChar):
+    character.assign_traits({"Wits": 2})
+    p = RollParser(character, syntax)
+    assert p.pool_traits == traits
+
+
 def test_solo_semicolon():
     char = gen_char("vampire")
     char.assign_traits({"Brawl": 1})
@@ -156,3 +171,71 @@ def test_no_power_bonus(
 )
 def test_needs_character(syntax: str, needs: bool):
     assert needs_character(syntax) == needs
+
+
+@pytest.mark.parametrize(
+    "syntax,stacks",
+    [
+        ("7 3 2", (("7",), ("3",), ("2",))),
+        ("str+brawl . kin 3", (("str", "+", "brawl.kin"), ("3",))),
+        ("3 + - + - 2 -1", (("3", "+", "-", "+", "-", "2", "-", "1"),)),
+        ("- 3 hunger", (("-", "3"), ("hunger",))),
+    ],
+)
+def test_compile_syntax(syntax: str, stacks: tuple):
+    plan = compile_syntax(syntax)
+    assert plan.stacks == stacks
+    assert plan.tokens == sum(stacks, ())
+
+
+def test_compile_syntax_cached(character: VChar):
+    compile_syntax.cache_clear()
+    for _ in range(3):
+        _ = RollParser(character, "stren + br 2 3")
+    info = compile_syntax.cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+
+
+def test_compile_tokens_matches_syntax():
+    """Pre-tokenized input (e.g. from macros) compiles the same way."""
+    tokens = ("Strength", "+", "Brawl.Kindred", "current_hunger", "3")
+    assert compile_tokens(tokens) == compile_syntax(" ".join(tokens))
+
+
+def test_plan_shared_between_characters(character: VChar):
+    """Binding the same plan to different characters uses their own traits."""
+    other = gen_char("mortal")
+    other.assign_traits({"Strength": 1, "Brawl": 1})
+
+    assert RollParser(character, "str+brawl").pool == 7
+    assert RollParser(other, "str+brawl").pool == 2
+
+
+@pytest.mark.parametrize(
+    "stack,expected",
+    [
+        (["3"], 3),
+        (["3", "+", "2"], 5),
+        (["3", "-", "2"], 1),
+        (["-", "3"], -3),
+        (["3", "+", "-", "+", "-", "2"], 5),
+        (["3", "-", "-2"], 5),
+        (["0"], 0),
+        (["00"], 0),
+    ],
+)
+def test_eval_stack(stack: list[str], expected: int):
+    assert eval_stack(stack) == expected
+
+
+@pytest.mark.parametrize("stack", [[], ["+"], ["3", "-"], ["007"], ["3", "2"], ["²"]])
+def test_eval_stack_invalid(stack: list[str]):
+    with pytest.raises(SyntaxError):
+        eval_stack(stack)
+
+
+@pytest.mark.parametrize("syntax", ["3 +", "+", "007", "3 ²"])
+def test_invalid_syntax(syntax: str):
+    with pytest.raises(SyntaxError):
+        _ = RollParser(None, syntax)
@@ -1,5 +1,7 @@
 """Test basic roll logic."""
 
+from unittest.mock import patch
+
 import pytest
 
 import inconnu
@@ -285,3 +287,57 @@ def test_dicethrow_edge_cases():
     assert throw.failures == 3
     assert throw.successes == 0
     assert throw.tens == 0
+
+
+def test_dicethrow_histogram():
+    """The histogram tracks faces and follows reassigned dice."""
+    throw = DiceThrow([1, 10, 10, 6])
+    assert throw.histogram == (1, 0, 0, 0, 0, 1, 0, 0, 0, 2)
+
+    throw.dice = [5, 5]
+    assert throw.histogram == (0, 0, 0, 0, 2, 0, 0, 0, 0, 0)
+    assert throw.failures == 2
+    assert throw.successes == 0
+
+
+# Outcome caching
+
+
+def test_outcome_cached():
+    """Repeated queries reuse a single classification."""
+    roll = gen_roll(0, 1, 2, 0, 0, 0, 0, 3)
+    with patch.object(roll, "_classify", wraps=roll._classify) as classify:
+        assert roll.is_critical
+        assert roll.embed_color == 0x00FF00
+        assert roll.main_takeaway == "Critical"
+    assert classify.call_count >= 3
+    assert roll._result is not None
+
+    first = roll._result
+    assert roll.total_successes == 5
+    assert roll._result is first
+
+
+def test_outcome_follows_dice_changes():
+    """Changing the dice or difficulty reclassifies the roll."""
+    roll = gen_roll(0, 1, 2, 0, 0, 0, 0, 3)
+    assert roll.outcome == "critical"
+
+    roll.hunger.dice = [10]
+    assert roll.outcome == "messy"
+
+    roll.difficulty = 10
+    assert roll.outcome == "fail"
+
+
+def test_reroll_invalidates_outcome():
+    """Rerolling reclassifies the roll."""
+    roll = gen_roll(3, 0, 0, 0, 0, 0, 0, 2)
+    assert roll.outcome == "total_fail"
+
+    with patch("inconnu.d10", return_value=10):
+        roll.reroll("reroll_failures")
+
+    assert roll._result is None
+    assert roll.outcome == "critical"
+    assert roll.total_successes == 5
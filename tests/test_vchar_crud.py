@@ -1,6 +1,11 @@
 """Test VChar CRUD operations and database persistence."""
 
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pytest
 import pytest_asyncio
+from pydantic import ValidationError
 
 from constants import Damage
 from models import VChar
@@ -405,6 +410,20 @@ async def test_update_traits(vampire):
     assert fetched.find_trait("Brawl").rating == 4
 
 
+async def test_update_validates_nested_changes(vampire):
+    """In-place changes that bypass assignment validation are still checked."""
+    vampire.assign_traits({"Strength": 3})
+    await vampire.save()
+
+    vampire.raw_traits[0].rating = "lots"  # type: ignore[assignment]
+    with pytest.raises(ValidationError):
+        await vampire.save()
+
+    fetched = await VChar.get(vampire.id)
+    assert fetched is not None
+    assert fetched.find_trait("Strength").rating == 3
+
+
 async def test_update_damage_tracking(vampire):
     """Test updating health/willpower damage."""
     vampire.apply_damage("health", Damage.SUPERFICIAL, 3)
@@ -719,3 +738,65 @@ async def test_save_without_insert():
     assert fetched.name == "Save Test"
 
     await char.delete()
+
+
+async def test_save_sends_only_changes(vampire):
+    """Saving an existing character updates only what changed."""
+    vampire.log("rouse")
+    await vampire.save()
+
+    vampire.log("rouse", 2)
+    vampire.apply_experience(3, "lifetime", "Session", 1)
+    vampire.hunger = 3
+
+    collection = VChar.get_pymongo_collection()
+    with patch.object(collection, "update_one", wraps=collection.update_one) as update_one:
+        await vampire.save()
+
+    update_one.assert_awaited_once()
+    (query, update), _ = update_one.await_args
+    assert query == {"_id": vampire.id}
+    assert update["$inc"] == {"log.rouse": 2}
+    assert len(update["$push"]["experience.log"]["$each"]) == 1
+    assert update["$set"]["hunger"] == 3
+    assert "traits" not in update["$set"]
+
+    fetched = await VChar.get(vampire.id)
+    assert fetched is not None
+    assert fetched.stat_log["rouse"] == 3
+    assert fetched.hunger == 3
+    assert fetched.experience.lifetime == 3
+    assert len(fetched.experience.log) == 1
+
+
+async def test_save_unchanged_character(vampire):
+    """A save with nothing but the modification time and revision changed is
+    tiny."""
+    collection = VChar.get_pymongo_collection()
+    with patch.object(collection, "update_one", wraps=collection.update_one) as update_one:
+        await vampire.save()
+
+    (_, update), _ = update_one.await_args
+    assert update == {"$set": {"log.modified": vampire.stat_log["modified"], "revision": 1}}
+
+
+async def test_revision_increases(vampire):
+    assert vampire.revision == 0
+    await vampire.save()
+    await vampire.save()
+    assert vampire.revision == 2
+
+    fetched = await VChar.get(vampire.id)
+    assert fetched is not None
+    assert fetched.revision == 2
+
+
+async def test_save_removes_keys(vampire):
+    vampire.stat_log["left"] = datetime.now(UTC)
+    await vampire.save()
+    del vampire.stat_log["left"]
+    await vampire.save()
+
+    fetched = await VChar.get(vampire.id)
+    assert fetched is not None
+    assert "left" not in fetched.stat_log